@@ -0,0 +1,222 @@
+"""Almacén falso en memoria con la misma interfaz que GestorSheets (nucleo.py).
+
+Sirve para medir y probar sin credenciales ni red: imita las llamadas de gspread que
+usa el código (worksheet, add_worksheet, get_all_values, get_all_records, get,
+append_row(s), update, delete_rows, get_lastUpdateTime) y puede añadir latencia y
+errores 429 de cuota configurables.
+También trae un generador de registros sintéticos (1k a 1M filas).
+
+Para usarlo en el dashboard o el bot: FINANZAS_ALMACEN=memoria (ver nucleo.py).
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from nucleo import TAB_REGISTROS, TAB_ORCAMENTO, COLUMNAS_REGISTROS, hogar_actual
+
+CABECERA_REGISTROS = COLUMNAS_REGISTROS
+CABECERA_ORCAMENTO = ['Categoria', 'Limite']
+
+def error_cuota():
+    """APIError 429 idéntico al de Google (así lo reconoce nucleo.es_error_cuota)."""
+    import requests
+    from gspread.exceptions import APIError
+    respuesta = requests.Response()
+    respuesta.status_code = 429
+    respuesta._content = json.dumps({'error': {
+        'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+        'message': "Quota exceeded for quota metric 'Write requests' (simulado)"}}).encode()
+    return APIError(respuesta)
+
+class PerfilRed:
+    """Latencia y cuota simuladas. 'cuota_por_minuto' imita el límite por minuto de la API."""
+
+    def __init__(self, latencia=0.0, latencia_por_fila=0.0, prob_error_cuota=0.0, cuota_por_minuto=None, semilla=0):
+        self.latencia = latencia
+        self.latencia_por_fila = latencia_por_fila
+        self.prob_error_cuota = prob_error_cuota
+        self.cuota_por_minuto = cuota_por_minuto
+        self._azar = random.Random(semilla)
+        self._llamadas = []
+        self._lock = threading.Lock()
+        self.contadores = {'llamadas': 0, 'errores_cuota': 0, 'filas_leidas': 0, 'filas_escritas': 0}
+
+    def llamada(self, filas=0):
+        with self._lock:
+            ahora = time.monotonic()
+            self._llamadas = [t for t in self._llamadas if ahora - t < 60]
+            self.contadores['llamadas'] += 1
+            agotada = self.cuota_por_minuto is not None and len(self._llamadas) >= self.cuota_por_minuto
+            if agotada or self._azar.random() < self.prob_error_cuota:
+                self.contadores['errores_cuota'] += 1
+                raise error_cuota()
+            self._llamadas.append(ahora)
+        pausa = self.latencia + self.latencia_por_fila * filas
+        if pausa: time.sleep(pausa)
+
+class PestanaMemoria:
+    """Una pestaña: lista de filas (la fila 0 es la cabecera). Las celdas guardan lo que
+    se escribió (texto o número, como RAW en Sheets); se leen como texto salvo que se
+    pida value_render_option=UNFORMATTED_VALUE."""
+
+    def __init__(self, hoja, titulo, filas):
+        self.hoja = hoja
+        self.title = titulo
+        self._filas = [list(f) for f in filas]
+
+    @staticmethod
+    def _leer(filas, value_render_option=None):
+        if value_render_option == 'UNFORMATTED_VALUE': return [list(f) for f in filas]
+        return [[v if type(v) is str else str(v) for v in f] for f in filas]
+
+    def get_all_values(self, value_render_option=None, date_time_render_option=None):
+        self.hoja.red.llamada(len(self._filas))
+        self.hoja.red.contadores['filas_leidas'] += len(self._filas)
+        return self._leer(self._filas, value_render_option)
+
+    def get_all_records(self):
+        valores = self.get_all_values()
+        cabecera = valores[0] if valores else []
+        return [dict(zip(cabecera, f)) for f in valores[1:]]
+
+    def get(self, rango, value_render_option=None, date_time_render_option=None):
+        """Solo rangos 'A<fila>:<col>' (lo que pide EspejoHoja para leer la cola)."""
+        inicio = int(''.join(c for c in rango.split(':')[0] if c.isdigit()))
+        filas = self._leer(self._filas[inicio - 1:], value_render_option)
+        self.hoja.red.llamada(len(filas))
+        self.hoja.red.contadores['filas_leidas'] += len(filas)
+        return filas
+
+    def append_rows(self, filas, value_input_option='RAW'):
+        self.hoja.red.llamada(len(filas))
+        # Como Sheets: se anexa tras la última fila con datos (las vacías del final se ocupan)
+        while len(self._filas) > 1 and not any(v != '' for v in self._filas[-1]): self._filas.pop()
+        primera = len(self._filas) + 1
+        self._filas.extend(list(f) for f in filas)
+        self.hoja.red.contadores['filas_escritas'] += len(filas)
+        self.hoja.tocar()
+        return {'updates': {'updatedRange': f"{self.title}!A{primera}:J{len(self._filas)}",
+                            'updatedRows': len(filas)}}
+
+    def append_row(self, fila, value_input_option='RAW'):
+        return self.append_rows([fila], value_input_option)
+
+    def update(self, values=None, range_name=None, value_input_option='RAW'):
+        """Solo rangos 'A<fila>' (esquina superior izquierda), como los usa archivo.py."""
+        self.hoja.red.llamada(len(values))
+        inicio = int(''.join(c for c in range_name if c.isdigit())) - 1
+        faltan = inicio + len(values) - len(self._filas)
+        if faltan > 0: self._filas.extend([] for _ in range(faltan))
+        for i, fila in enumerate(values): self._filas[inicio + i] = list(fila)
+        self.hoja.red.contadores['filas_escritas'] += len(values)
+        self.hoja.tocar()
+        return {'updatedRows': len(values)}
+
+    def delete_rows(self, inicio, fin=None):
+        self.hoja.red.llamada()
+        del self._filas[inicio - 1:fin or inicio]
+        self.hoja.tocar()
+
+class HojaMemoria:
+    def __init__(self, red):
+        self.red = red
+        self.pestanas = {}
+        self._modificada = datetime.utcnow()
+
+    def worksheet(self, titulo):
+        self.red.llamada()
+        if titulo not in self.pestanas:
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(titulo)
+        return self.pestanas[titulo]
+
+    def worksheets(self):
+        self.red.llamada()
+        return list(self.pestanas.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        self.red.llamada()
+        self.pestanas[title] = PestanaMemoria(self, title, [])
+        self.tocar()
+        return self.pestanas[title]
+
+    def tocar(self):
+        self._modificada = max(self._modificada + timedelta(milliseconds=1), datetime.utcnow())
+
+    def get_lastUpdateTime(self):
+        self.red.llamada()
+        return self._modificada.isoformat() + "Z"
+
+class AlmacenMemoria:
+    """Sustituto de GestorSheets: mismas llamadas hoja(), worksheet(), invalidar()."""
+
+    def __init__(self, red=None):
+        self.red = red or PerfilRed()
+        self._hojas = {}
+
+    def crear_hoja(self, nombre_hoja, pestanas):
+        """pestanas: {titulo: [cabecera, fila, fila, ...]}"""
+        hoja = HojaMemoria(self.red)
+        hoja.pestanas = {t: PestanaMemoria(hoja, t, filas) for t, filas in pestanas.items()}
+        self._hojas[nombre_hoja] = hoja
+        return hoja
+
+    def hoja(self, nombre_hoja=None):
+        return self._hojas[nombre_hoja or hogar_actual().hoja]
+
+    def worksheet(self, nombre_tab, nombre_hoja=None):
+        # GestorSheets cachea las pestañas: aquí tampoco cuenta como llamada
+        pestanas = self.hoja(nombre_hoja).pestanas
+        if nombre_tab not in pestanas:
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(nombre_tab)
+        return pestanas[nombre_tab]
+
+    def invalidar(self):
+        pass
+
+# --- Datos Sintéticos ---
+def generar_registros(n_filas, semilla=0, meses=36, hasta=None):
+    """n_filas de Registros con el formato que escribe el bot ('50,00', '12-2025', ...),
+    con los bancos, miembros y categorías del hogar activo."""
+    hogar = hogar_actual()
+    azar = np.random.default_rng(semilla)
+    hasta = hasta or datetime.now()
+    ultimo = hasta.year * 12 + hasta.month - 1
+    indice_mes = ultimo - azar.integers(0, meses, n_filas)
+    parcelas = azar.choice([1, 1, 1, 2, 3, 6, 10, 12], n_filas)
+    actual = (azar.integers(0, 12, n_filas) % parcelas) + 1
+    centavos = azar.integers(500, 80000, n_filas)
+    bancos = np.array(hogar.bancos + ['PIX'])[azar.integers(0, len(hogar.bancos) + 1, n_filas)]
+    personas = np.array(hogar.personas)[azar.integers(0, len(hogar.personas), n_filas)]
+    categorias = np.array(hogar.categorias)[azar.integers(0, len(hogar.categorias), n_filas)]
+    dias = azar.integers(1, 29, n_filas)
+
+    filas = [CABECERA_REGISTROS]
+    for i in range(n_filas):
+        mes, anio = indice_mes[i] % 12 + 1, indice_mes[i] // 12
+        p, pa = int(parcelas[i]), int(actual[i])
+        filas.append([
+            f"{dias[i]:02d}/{mes:02d}/{anio}", f"{mes:02d}-{anio}", personas[i],
+            "Credito" if p > 1 else "Debito", bancos[i],
+            f"{centavos[i] // 100:,}".replace(',', '.') + f",{centavos[i] % 100:02d}",
+            str(p), str(pa), categorias[i], f"{categorias[i]} ({pa}/{p})",
+        ])
+    return filas
+
+def generar_orcamento(semilla=0):
+    azar = random.Random(semilla)
+    return [CABECERA_ORCAMENTO] + [[c, f"{azar.randrange(200, 3000)},00"] for c in hogar_actual().categorias]
+
+def almacen_sintetico(n_filas, red=None, semilla=0):
+    """AlmacenMemoria con la hoja del hogar activo poblada con datos sintéticos."""
+    almacen = AlmacenMemoria(red)
+    almacen.crear_hoja(hogar_actual().hoja, {
+        TAB_REGISTROS: generar_registros(n_filas, semilla),
+        TAB_ORCAMENTO: generar_orcamento(semilla),
+    })
+    return almacen
@@ -1,24 +1,22 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import numpy as np
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import plotly.express as px
-import plotly.graph_objects as go
-import base64
 import os
-import threading
 import time
-import telebot
-from telebot import types
-import matplotlib.pyplot as plt
+
+from metricas import METRICAS
+from nucleo import (
+    COLOR_MAP_BANCOS, COLOR_DEFAULT, MES_INVALIDO,
+    asegurar_credenciales, version_datos, cargar_tablas, cargar_resumen_archivo, leer_mes_archivado, CuboGastos,
+    indice_de_fecha, indice_a_mes, indice_primer_pago, dia_corte, abrir_hogar, obtener_hogares,
+)
+from proyeccion import HORIZONTE_PROYECCION, obtener_proyeccion
 
 # ==============================================================================
 # 1. CONFIGURACIÓN Y ESTILOS
 # ==============================================================================
 st.set_page_config(page_title="Controle Financeiro", layout="wide", page_icon="💰")
-plt.switch_backend('Agg') # Configuración segura para el bot
 
 st.markdown("""
 <style>
@@ -26,378 +24,87 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- GLOBALES (Compartidas entre Bot y Web) ---
-COLOR_MAP_BANCOS = {
-    'nubank': '#820AD1', 'bb': '#FFE600', 'inter': '#FF7A00', 'bradesco': "#CC092F",
-    'pix': '#00BFA5' # Color Verde para PIX
-}
-COLOR_DEFAULT = '#808080'
-
-TARJETAS_CONFIG = {
-    "nubank": 4, "bb": 2, "inter": 6, "bradesco": 20
-}
-
-LISTA_BANCOS = ["Nubank", "Inter", "BB", "Bradesco"]
-LISTA_CATEGORIAS = ["Alimentação", "Transporte", "Lazer", "Casa", "Serviços", "Saúde", "Educação", "Pets", "Outros"]
-LISTA_PERSONAS = ["Carlos", "Jessy"]
-
 # ==============================================================================
 # 2. SEGURIDAD BLINDADA (CREACIÓN DE CREDENCIALES)
 # ==============================================================================
-if not os.path.exists("credentials.json"):
-    try:
-        if "credenciales_seguras" in st.secrets:
-            decoded = base64.b64decode(st.secrets["credenciales_seguras"])
-            with open("credentials.json", "wb") as f:
-                f.write(decoded)
-        else:
-            st.error("⚠️ Error: No encontré 'credenciales_seguras' en los Secrets.")
-            st.stop()
-    except Exception as e:
-        st.error(f"Error crítico creando credenciales: {e}")
-        st.stop()
+error_credenciales = asegurar_credenciales(st.secrets)
+if error_credenciales:
+    st.error(error_credenciales)
+    st.stop()
+
+# --- Hogar (familia) ---
+# ?hogar=<id> elige la familia de hogares.toml; si tiene clave se pide aquí. La familia
+# abierta y su clave quedan en la sesión (del lado del servidor) para las otras páginas
+hogar_id = st.query_params.get("hogar") or st.session_state.get("hogar")
+hogar = abrir_hogar(hogar_id, st.session_state.get("clave_hogar"))
+if hogar is None:
+    if "clave_hogar" in st.session_state: st.error("⚠️ Família ou senha inválida.")
+    with st.form("entrar"):
+        hogar_id = st.text_input("Família", value=hogar_id or "")
+        clave = st.text_input("Senha", type="password")
+        if st.form_submit_button("Entrar"):
+            st.session_state["hogar"], st.session_state["clave_hogar"] = hogar_id.strip(), clave
+            st.query_params["hogar"] = hogar_id.strip()
+            st.rerun()
+    st.stop()
+st.session_state["hogar"] = hogar.id
 
 # ==============================================================================
-# 3. CÓDIGO DEL BOT DE TELEGRAM (EJECUCIÓN EN FONDO)
+# 3. BOT DE TELEGRAM (EN UN HILO DEL MISMO PROCESO)
 # ==============================================================================
-try:
-    TOKEN = st.secrets["TOKEN_TELEGRAM"]
-except:
-    st.warning("⚠️ Falta el TOKEN_TELEGRAM en los Secrets.")
-    TOKEN = "TOKEN_DUMMY"
-
-bot = telebot.TeleBot(TOKEN)
-datos_temporales = {}
-NOMBRE_HOJA = "Finanzas_Familia"
-TAB_REGISTROS = "Registros"
-
-# --- Funciones Auxiliares del Bot ---
-def conectar_sheet_bot(nombre_tab):
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
-    client = gspread.authorize(creds)
-    return client.open(NOMBRE_HOJA).worksheet(nombre_tab)
-
-def limpiar_numero_bot(valor):
-    if isinstance(valor, (int, float)): return float(valor)
-    valor_str = str(valor).strip().replace('R$', '').strip()
-    if not valor_str: return 0.0
-    if ',' in valor_str: valor_str = valor_str.replace('.', '').replace(',', '.')
-    try: return float(valor_str)
-    except: return 0.0
-
-def calcular_primer_mes_pago_bot(fecha_compra, nombre_banco):
-    nombre_banco = str(nombre_banco).lower().strip()
-    
-    # Lógica para PIX (Pago inmediato)
-    if nombre_banco == 'pix':
-        return fecha_compra
-
-    dia_corte = TARJETAS_CONFIG.get(nombre_banco, 1)
-    if fecha_compra.day > dia_corte:
-        return fecha_compra + relativedelta(months=1)
-    return fecha_compra
-
-# --- Menús del Bot ---
-@bot.message_handler(commands=['start', 'help'])
-@bot.message_handler(func=lambda m: m.text.lower() in ['oi', 'hola', 'olá'])
-def menu_principal(message):
-    markup = types.InlineKeyboardMarkup(row_width=2)
-    markup.add(types.InlineKeyboardButton("Registrar Gasto", callback_data="menu_gasto"),
-               types.InlineKeyboardButton("Ver Relatório", callback_data="menu_reporte"))
-    bot.reply_to(message, "Olá! O que vamos fazer?", reply_markup=markup)
-
-@bot.callback_query_handler(func=lambda call: True)
-def callback_handler(call):
-    chat_id = call.message.chat.id
-    
-    if call.data == "menu_reporte":
-        bot.answer_callback_query(call.id, "Gerando...")
-        generar_reporte_bot(call.message)
-
-    elif call.data == "menu_salir":
-        # NUEVO: Opción Salir
-        bot.answer_callback_query(call.id, "Fechado")
-        bot.send_message(chat_id, "👋 Sessão encerrada. Digite *Oi* quando quiser voltar!", parse_mode="Markdown")
-        datos_temporales.pop(chat_id, None) # Limpiar memoria para evitar errores
-        
-    elif call.data == "menu_gasto":
-        datos_temporales[chat_id] = {}
-        msg = bot.send_message(chat_id, "Digite o Valor (Ex: 50,00):")
-        bot.register_next_step_handler(msg, paso_recibir_monto)
-        
-    elif call.data.startswith("tipo_"):
-        tipo = call.data.split("_")[1]
-        
-        # Manejo de PIX
-        if tipo == 'pix':
-            datos_temporales[chat_id]['tipo'] = 'pix'
-            datos_temporales[chat_id]['cuotas'] = 1
-            datos_temporales[chat_id]['banco'] = 'PIX'
-            mostrar_menu_personas(chat_id) 
-        elif tipo == 'parcelado':
-            datos_temporales[chat_id]['tipo'] = 'parcelado'
-            msg = bot.send_message(chat_id, "Quantas Parcelas?")
-            bot.register_next_step_handler(msg, paso_recibir_cuotas)
-        else: # Avista Credito
-            datos_temporales[chat_id]['tipo'] = 'avista'
-            datos_temporales[chat_id]['cuotas'] = 1
-            mostrar_menu_bancos(chat_id)
-            
-    elif call.data.startswith("banco_"):
-        datos_temporales[chat_id]['banco'] = call.data.split("_")[1]
-        mostrar_menu_personas(chat_id)
-        
-    elif call.data.startswith("quien_"):
-        datos_temporales[chat_id]['quien'] = call.data.split("_")[1]
-        mostrar_menu_categorias(chat_id)
-        
-    elif call.data.startswith("cat_"):
-        cat = call.data.split("_")[1]
-        if cat == "Outros":
-            msg = bot.send_message(chat_id, "O que é especificamente?")
-            bot.register_next_step_handler(msg, lambda m: [datos_temporales[chat_id].update({'categoria': m.text.title()}), guardar_gasto_final(chat_id)])
-        else:
-            datos_temporales[chat_id]['categoria'] = cat
-            guardar_gasto_final(chat_id)
-
-def paso_recibir_monto(message):
+# Streamlit Cloud corre un solo proceso, así que el dashboard hospeda al bot.
+# cache_resource: se importa y arranca una vez por proceso, no en cada rerun.
+def secreto_activado(nombre, defecto):
+    """Booleano de st.secrets: en TOML puede venir como true/false o como texto ("false")."""
+    valor = st.secrets.get(nombre, defecto)
+    if isinstance(valor, str): return valor.strip().lower() in ("1", "true", "yes", "on", "sim")
+    return bool(valor)
+
+@st.cache_resource
+def iniciar_bot_en_segundo_plano():
     try:
-        monto = limpiar_numero_bot(message.text)
-        if monto == 0: raise ValueError
-        datos_temporales[message.chat.id]['monto'] = monto
-        
-        markup = types.InlineKeyboardMarkup()
-        # Botón PIX
-        markup.add(types.InlineKeyboardButton("💠 PIX", callback_data="tipo_pix")) 
-        markup.add(types.InlineKeyboardButton("💳 Crédito À Vista", callback_data="tipo_avista"),
-                   types.InlineKeyboardButton("📅 Parcelado", callback_data="tipo_parcelado"))
-                   
-        bot.send_message(message.chat.id, f"✅ R$ {monto:,.2f}\nComo vai pagar?", reply_markup=markup)
+        if not secreto_activado("BOT_EN_DASHBOARD", True): return None # el bot corre aparte
+        os.environ.setdefault("TOKEN_TELEGRAM", st.secrets["TOKEN_TELEGRAM"])
     except:
-        msg = bot.reply_to(message, "❌ Valor inválido.")
-        bot.register_next_step_handler(msg, paso_recibir_monto)
-
-def paso_recibir_cuotas(message):
-    try:
-        cuotas = int(message.text)
-        datos_temporales[message.chat.id]['cuotas'] = cuotas
-        mostrar_menu_bancos(message.chat.id)
-    except:
-        msg = bot.reply_to(message, "❌ Use apenas números.")
-        bot.register_next_step_handler(msg, paso_recibir_cuotas)
-
-def mostrar_menu_bancos(chat_id):
-    markup = types.InlineKeyboardMarkup(row_width=2)
-    markup.add(*[types.InlineKeyboardButton(b, callback_data=f"banco_{b}") for b in LISTA_BANCOS])
-    bot.send_message(chat_id, "Qual Banco?", reply_markup=markup)
-
-def mostrar_menu_personas(chat_id):
-    markup = types.InlineKeyboardMarkup(row_width=2)
-    markup.add(*[types.InlineKeyboardButton(p, callback_data=f"quien_{p}") for p in LISTA_PERSONAS])
-    bot.send_message(chat_id, "Quem pagou?", reply_markup=markup)
-
-def mostrar_menu_categorias(chat_id):
-    markup = types.InlineKeyboardMarkup(row_width=3)
-    markup.add(*[types.InlineKeyboardButton(c, callback_data=f"cat_{c}") for c in LISTA_CATEGORIAS])
-    bot.send_message(chat_id, "Qual a Categoria?", reply_markup=markup)
-
-def guardar_gasto_final(chat_id):
-    datos = datos_temporales.get(chat_id)
-    bot.send_message(chat_id, "Salvando...")
-    try:
-        monto = datos['monto']
-        cuotas = datos['cuotas']
-        banco = datos['banco']
-        quien = datos['quien']
-        cat = datos['categoria']
-        
-        monto_cuota = round(monto / cuotas, 2)
-        fecha_inicio = calcular_primer_mes_pago_bot(datetime.now(), banco)
-        
-        filas = []
-        for i in range(cuotas):
-            fecha = fecha_inicio + relativedelta(months=i)
-            
-            if banco == 'PIX':
-                tipo_reg = "Debito"
-            else:
-                tipo_reg = "Credito" if cuotas > 1 else "Debito"
-
-            # ORDEN COLUMNAS: Data, Mes_Ref, Quem, Tipo, Banco, Valor, Parc, Parc_Atual, Cat, Desc
-            fila = [
-                datetime.now().strftime("%d/%m/%Y"),
-                fecha.strftime("%m-%Y"),
-                quien,
-                tipo_reg,
-                banco,
-                monto_cuota,
-                cuotas,
-                i + 1,
-                cat,
-                f"{cat} ({i+1}/{cuotas})"
-            ]
-            filas.append(fila)
-
-        sh = conectar_sheet_bot(TAB_REGISTROS)
-        for f in filas: sh.append_row(f)
-        
-        icono_banco = "💠" if banco == 'PIX' else "🏦"
-        msg = f"✅ *Salvo*\n💲 R$ {monto:,.2f}\n{icono_banco} {banco} - {quien}\n🏷️ {cat}"
-        
-        bot.send_message(chat_id, msg, parse_mode="Markdown")
-        
-        # --- NUEVO MENÚ FINAL CON 3 OPCIONES ---
-        markup = types.InlineKeyboardMarkup()
-        # Fila 1: Nuevo y Reporte
-        markup.row(types.InlineKeyboardButton("➕ Novo Gasto", callback_data="menu_gasto"),
-                   types.InlineKeyboardButton("📄 Relatório", callback_data="menu_reporte"))
-        # Fila 2: Salir
-        markup.row(types.InlineKeyboardButton("❌ Sair", callback_data="menu_salir"))
-        
-        bot.send_message(chat_id, "Mais alguma coisa?", reply_markup=markup)
-        
-    except Exception as e:
-        bot.send_message(chat_id, f"❌ Erro: {e}")
-
-def generar_reporte_bot(message):
+        st.warning("⚠️ Falta el TOKEN_TELEGRAM en los Secrets.")
+        return None
+    import bot_telegram # telebot solo se carga en este camino
     try:
-        # Reporte Avanzado (Comparativo con Presupuesto)
-        hoy = datetime.now()
-        mes_actual = hoy.strftime("%m-%Y")
-        
-        sh_regs = conectar_sheet_bot(TAB_REGISTROS)
-        sh_orc = conectar_sheet_bot("Orcamento")
-        
-        df_r = pd.DataFrame(sh_regs.get_all_records())
-        df_p = pd.DataFrame(sh_orc.get_all_records())
-
-        if df_r.empty:
-            bot.send_message(message.chat.id, "📭 Sem registros para analisar.")
-            return
-
-        if 'Valor' in df_r.columns: df_r['Valor'] = df_r['Valor'].apply(limpiar_numero_bot)
-        if 'Limite' in df_p.columns: df_p['Limite'] = df_p['Limite'].apply(limpiar_numero_bot)
-        
-        gastos_mes = df_r[df_r['Mes_Ref'] == mes_actual].copy()
-        
-        if gastos_mes.empty:
-            bot.send_message(message.chat.id, f"📅 Sem gastos registrados em {mes_actual}")
-            return
-
-        gastos_mes['Categoria'] = gastos_mes['Categoria'].str.strip().str.title()
-        gastos_por_cat = gastos_mes.groupby('Categoria')['Valor'].sum().reset_index()
-
-        if not df_p.empty:
-            df_p['Categoria'] = df_p['Categoria'].str.strip().str.title()
-            df_final = pd.merge(df_p, gastos_por_cat, on='Categoria', how='outer').fillna(0)
-        else:
-            df_final = gastos_por_cat
-            df_final['Limite'] = 0
+        bot_telegram.arrancar_en_hilo()
+    except ValueError as e: # token mal formado
+        st.warning(str(e))
+        return None
+    return bot_telegram
 
-        msg = f"📊 *Análise Mensal ({mes_actual})*\n"
-        msg += f"_(Gastos Cartão + PIX)_\n\n"
-        
-        total_gastado_mes = 0
-        df_final = df_final.sort_values(by='Valor', ascending=False)
-
-        for _, row in df_final.iterrows():
-            cat = row['Categoria']
-            gasto = float(row['Valor'])
-            limite = float(row['Limite'])
-            
-            if gasto == 0 and limite == 0: continue
-
-            total_gastado_mes += gasto
-
-            if limite > 0:
-                porcentaje = (gasto / limite) * 100
-                if porcentaje <= 80: icono = "🟢"
-                elif porcentaje <= 100: icono = "🟡"
-                else: icono = "🔴"
-                msg += f"{icono} *{cat}*\n      R$ {gasto:,.0f} / {limite:,.0f} ({porcentaje:.0f}%)\n"
-            elif gasto > 0:
-                msg += f"⚠️ *{cat}* (Sem Orçamento)\n      R$ {gasto:,.2f}\n"
-
-        msg += "\n" + "─"*20 + "\n"
-        msg += f"💰 *TOTAL GASTO:* R$ {total_gastado_mes:,.2f}"
-
-        bot.send_message(message.chat.id, msg, parse_mode="Markdown")
-
-    except Exception as e:
-        bot.send_message(message.chat.id, f"❌ Erro ao gerar relatório: {e}")
-
-# --- INICIADOR HILO (THREAD) ---
-def iniciar_bot():
-    try:
-        print("🤖 Bot iniciado...")
-        bot.infinity_polling()
-    except:
-        pass
-
-if not any(t.name == "ThreadBotTelegram" for t in threading.enumerate()):
-    t = threading.Thread(target=iniciar_bot, name="ThreadBotTelegram", daemon=True)
-    t.start()
+bot_telegram = iniciar_bot_en_segundo_plano()
 
 # ==============================================================================
 # 4. DASHBOARD WEB (VISUALIZACIÓN)
 # ==============================================================================
 
-def limpiar_numero(valor):
-    if isinstance(valor, (int, float)): return float(valor)
-    valor_str = str(valor).strip().replace('R$', '').strip()
-    if not valor_str: return 0.0
-    if ',' in valor_str:
-        valor_str = valor_str.replace('.', '').replace(',', '.')
-    try: return float(valor_str)
-    except: return 0.0
-
 # --- CONEXÃO ---
-@st.cache_data(ttl=5)
-def cargar_datos():
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
-    client = gspread.authorize(creds)
-    sheet = client.open("Finanzas_Familia")
-    
-    try:
-        vals_r = sheet.worksheet("Registros").get_all_records()
-        df_r = pd.DataFrame(vals_r)
-    except: return pd.DataFrame(), pd.DataFrame()
-
-    try:
-        vals_p = sheet.worksheet("Orcamento").get_all_records()
-        df_p = pd.DataFrame(vals_p)
-    except: return pd.DataFrame(), pd.DataFrame()
-    
-    # Estandarizar nombres
-    mapa_cols = {
-        'Monto': 'Valor', 'Monto_Total': 'Valor', 
-        'Quien': 'Quem', 'Persona': 'Quem',
-        'Descripcion': 'Descricao', 'Descripción': 'Descricao',
-        'Categoria': 'Categoria', 'Mes_Ref': 'Mes_Ref', 'Banco': 'Banco', 'Limite': 'Limite'
-    }
-    df_r.rename(columns=mapa_cols, inplace=True)
-    df_p.rename(columns=mapa_cols, inplace=True)
-
-    # Limpieza
-    if not df_r.empty:
-        if 'Valor' in df_r.columns: df_r['Valor'] = df_r['Valor'].apply(limpiar_numero)
-        for c in ['Mes_Ref', 'Banco', 'Quem', 'Categoria']:
-            if c in df_r.columns: df_r[c] = df_r[c].astype(str).str.strip()
-
-    if not df_p.empty:
-        if 'Limite' in df_p.columns: df_p['Limite'] = df_p['Limite'].apply(limpiar_numero)
-        if 'Categoria' in df_p.columns: df_p['Categoria'] = df_p['Categoria'].astype(str).str.strip()
-        
-    return df_r, df_p
+# cache_resource: todas las sesiones comparten el mismo libro tipado sin copiarlo en
+# cada rerun (cache_data lo deserializaría entero). Se trata como solo lectura.
+@st.cache_resource(max_entries=3 * len(obtener_hogares()))
+def cargar_datos(hogar_id, version):
+    # 'hogar_id' y 'version' solo sirven de clave de caché: se recarga cuando cambian los datos
+    return cargar_tablas() + (cargar_resumen_archivo(),)
+
+# Un mes archivado solo se descarga (pestaña del año) cuando se elige en el filtro
+@st.cache_resource(max_entries=4)
+def cargar_mes_archivado(hogar_id, mes, version):
+    return leer_mes_archivado(mes)
 
 # --- INÍCIO APP ---
 st.title("💰 Controle Financeiro Inteligente")
+if len(obtener_hogares()) > 1: st.caption(f"🏠 {hogar.id}")
 
+inicio_render = time.perf_counter()
 try:
-    df_gastos, df_limites = cargar_datos()
-    if df_gastos.empty:
+    version = version_datos()
+    with METRICAS.medir("dashboard.cargar_datos"):
+        df_gastos, df_limites, df_resumen = cargar_datos(hogar.id, version)
+    if df_gastos.empty and df_resumen.empty:
         st.warning("Aguardando dados... (Use o Bot para registrar)")
         st.stop()
 
@@ -406,39 +113,31 @@ try:
     # ==========================================
     
     st.subheader("💳 Faturas em Aberto (Status Atual)")
+    inicio_zona = time.perf_counter()
     
-    if 'Quem' not in df_gastos.columns: df_gastos['Quem'] = 'Geral'
+    # Un cubo por sesión: suma solo las filas nuevas de su versión sin pisar la de otra sesión
+    if f"cubo_{hogar.id}" not in st.session_state: st.session_state[f"cubo_{hogar.id}"] = CuboGastos()
+    cubo = st.session_state[f"cubo_{hogar.id}"]
+    cubo.actualizar(df_gastos, df_gastos.attrs.get('generacion'))
+    cubo.fijar_archivo(df_resumen, df_resumen.attrs.get('generacion'))
+    if bot_telegram: bot_telegram.obtener_graficos().pregenerar(version) # PNG del reporte listo para la versión nueva
     
     datos_live_pie = [] 
 
-    grupos = df_gastos.groupby(['Banco', 'Quem']).size().reset_index()
     cols = st.columns(4)
     col_idx = 0
     hoy = datetime.now()
+    idx_hoy = indice_de_fecha(hoy)
+    totales_por_mes = {} # mes_fatura -> totales por (Banco, Quem), un corte del cubo por mes
     
-    for _, row in grupos.iterrows():
-        banco_real = row['Banco']
-        quien_real = row['Quem']
+    for banco_real, quien_real in cubo.pares_banco_quien():
         banco_key = str(banco_real).lower().strip()
+        # Fatura abierta hoy = la que recibiría una compra hecha hoy (misma regla que el bot)
+        mes_fatura_abierta = indice_primer_pago(hoy, banco_real)
         
-        # PIX es Hoy
-        if banco_key == 'pix':
-            fecha_fatura = hoy
-        else:
-            # Calcular mes activo HOY (Tarjetas)
-            dia_corte = TARJETAS_CONFIG.get(banco_key, 1)
-            if hoy.day > dia_corte:
-                fecha_fatura = hoy + relativedelta(months=1)
-            else:
-                fecha_fatura = hoy
-            
-        mes_fatura_abierta = fecha_fatura.strftime("%m-%Y")
-        
-        filtro = (df_gastos['Banco'] == banco_real) & \
-                 (df_gastos['Quem'] == quien_real) & \
-                 (df_gastos['Mes_Ref'] == mes_fatura_abierta)
-        
-        total = df_gastos[filtro]['Valor'].sum()
+        if mes_fatura_abierta not in totales_por_mes:
+            totales_por_mes[mes_fatura_abierta] = cubo.por_banco_quien(mes_fatura_abierta)
+        total = totales_por_mes[mes_fatura_abierta].get((banco_real, quien_real), 0.0)
         
         if total > 0:
             datos_live_pie.append({'Banco': banco_real, 'Valor': total})
@@ -446,59 +145,82 @@ try:
         # Mostrar Tarjeta (Ocultamos PIX de las métricas de tarjetas, pero queda en el gráfico)
         if banco_key != 'pix': 
             total_str = f"R$ {total:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            vencimiento = f"{dia_corte}/{fecha_fatura.strftime('%m')}"
+            vencimiento = f"{dia_corte(banco_real)}/{mes_fatura_abierta % 12 + 1:02d}"
             
             with cols[col_idx % 4]:
                 st.metric(f"{banco_real} - {quien_real}", total_str, f"Fatura: {vencimiento}", delta_color="off")
             col_idx += 1
     
+    METRICAS.observar("dashboard.zona_faturas", time.perf_counter() - inicio_zona)
     st.divider()
 
     # ==========================================
     # 🔵 ZONA 2: ANÁLISE E PLANEJAMENTO (FILTRADO)
     # ==========================================
     
+    inicio_zona = time.perf_counter()
+    if bot_telegram:
+        with st.sidebar.expander("🤖 Status do Bot"):
+            st.json(bot_telegram.obtener_motor().estadisticas(hogar.id))
+
     st.sidebar.header("🔍 Filtros de Análise")
-    meses = sorted(df_gastos['Mes_Ref'].unique())
-    mes_actual = hoy.strftime("%m-%Y")
-    meses.sort(key=lambda x: datetime.strptime(x, "%m-%Y") if x else datetime.now())
+    n_invalidos = df_gastos.attrs.get('valores_invalidos', 0) + df_limites.attrs.get('valores_invalidos', 0)
+    if n_invalidos: st.sidebar.caption(f"⚠️ {n_invalidos} valor(es) não reconhecido(s), contados como R$ 0,00")
+    vivos = np.unique(df_gastos['Mes_Idx'].to_numpy()) if 'Mes_Idx' in df_gastos.columns else np.array([], dtype=int)
+    archivados = cubo.meses_archivados()
+    indices = np.union1d(vivos, archivados)
+    # Meses válidos en orden cronológico; los mal escritos quedan al final en su propia cubeta
+    meses = [int(i) for i in indices if i != MES_INVALIDO] + ([MES_INVALIDO] if MES_INVALIDO in indices else [])
     
-    idx = meses.index(mes_actual) if mes_actual in meses else 0
-    mes_sel = st.sidebar.selectbox("Selecionar Mês:", meses, index=idx)
+    idx = meses.index(idx_hoy) if idx_hoy in meses else 0
+    mes_sel = st.sidebar.selectbox("Selecionar Mês:", meses, index=idx, format_func=indice_a_mes)
+    mes_sel_txt = indice_a_mes(mes_sel)
     
-    df_mes = df_gastos[df_gastos['Mes_Ref'] == mes_sel].copy()
+    # Solo las columnas del extrato; sin .copy(): nadie modifica df_mes
+    cols_ver = ['Data', 'Descricao', 'Categoria', 'Banco', 'Quem', 'Valor']
+    partes = []
+    if mes_sel in vivos:
+        partes.append(df_gastos.loc[df_gastos['Mes_Idx'].to_numpy() == mes_sel, [c for c in cols_ver if c in df_gastos.columns]])
+    if mes_sel in archivados:
+        with st.spinner("Carregando mês arquivado..."):
+            df_arch = cargar_mes_archivado(hogar.id, mes_sel, version)
+        partes.append(df_arch[[c for c in cols_ver if c in df_arch.columns]])
+    df_mes = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
     
     # --- KPI's DEL MES SELECCIONADO ---
-    total_gasto_mes = df_mes['Valor'].sum() if not df_mes.empty else 0
+    total_gasto_mes = cubo.total(mes_sel)
     total_orcamento = df_limites['Limite'].sum() if not df_limites.empty else 0
     saldo = total_orcamento - total_gasto_mes
     
     k1, k2, k3 = st.columns(3)
-    k1.metric(f"Total a Pagar ({mes_sel})", f"R$ {total_gasto_mes:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+    k1.metric(f"Total a Pagar ({mes_sel_txt})", f"R$ {total_gasto_mes:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
     k2.metric("Orçamento Planejado", f"R$ {total_orcamento:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
     k3.metric("Saldo Disponível", f"R$ {saldo:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'), delta_color="normal" if saldo >=0 else "inverse")
 
-    st.markdown(f"#### 🗓️ Detalhes de: {mes_sel}")
+    st.markdown(f"#### 🗓️ Detalhes de: {mes_sel_txt}")
+    METRICAS.observar("dashboard.zona_kpis", time.perf_counter() - inicio_zona)
 
     # --- GRÁFICOS ---
+    inicio_zona = time.perf_counter()
     c1, c2 = st.columns([2, 1])
     
     with c1:
         st.subheader("📊 Gastos vs Orçamento (Mês Selecionado)")
-        if not df_mes.empty:
-            gastos_cat = df_mes.groupby('Categoria')['Valor'].sum().reset_index()
+        gastos_cat = cubo.por_categoria(mes_sel).reset_index()
+        if not gastos_cat.empty:
             df_final = pd.merge(df_limites, gastos_cat, on="Categoria", how="outer").fillna(0)
             df_final['Restante'] = df_final['Limite'] - df_final['Valor']
             df_final['Restante_Visual'] = df_final['Restante'].apply(lambda x: max(x, 0))
             df_final = df_final.sort_values(by=['Limite', 'Valor'])
 
+            import plotly.express as px
             fig = px.bar(df_final, y='Categoria', x=['Valor', 'Restante_Visual'], orientation='h',
                          color_discrete_map={'Valor': '#ff4b4b', 'Restante_Visual': '#3dd56d'}, height=500)
             
             new_names = {'Valor': 'Gasto', 'Restante_Visual': 'Disponível'}
             fig.for_each_trace(lambda t: t.update(name=new_names.get(t.name, t.name)))
             st.plotly_chart(fig, use_container_width=True)
-            df_sem_show = df_final.copy()
+            df_sem_show = df_final
         else:
             st.info("Sem dados neste mês.")
             df_sem_show = pd.DataFrame()
@@ -512,6 +234,7 @@ try:
             # Asignar colores correctos
             colores = [COLOR_MAP_BANCOS.get(str(b).lower(), COLOR_DEFAULT) for b in df_pie_show['Banco']]
             
+            import plotly.graph_objects as go
             fig = go.Figure(data=[go.Pie(
                 labels=df_pie_show['Banco'], 
                 values=df_pie_show['Valor'], 
@@ -523,7 +246,10 @@ try:
         else:
             st.info("Tudo pago! Nenhuma fatura aberta hoje.")
 
+    METRICAS.observar("dashboard.graficos", time.perf_counter() - inicio_zona)
+
     # --- TABLAS ---
+    inicio_zona = time.perf_counter()
     c3, c4 = st.columns(2)
     with c3:
         st.subheader("Orçamento vs Gastos (Mês Selecionado)")
@@ -538,14 +264,62 @@ try:
 
     with c4:
         st.subheader("📝 Extrato (Mês Selecionado)")
-        cols_ver = ['Data', 'Descricao', 'Categoria', 'Banco', 'Quem', 'Valor']
         if not df_mes.empty:
-            cols_ok = [c for c in cols_ver if c in df_mes.columns]
-            df_show = df_mes[cols_ok].copy()
-            if 'Valor' in df_show.columns: df_show['Valor'] = pd.to_numeric(df_show['Valor'], errors='coerce').fillna(0.0)
-            st.dataframe(df_show.style.format({'Valor': "R$ {:,.2f}"}), use_container_width=True)
+            st.dataframe(df_mes, use_container_width=True, column_config={
+                'Data': st.column_config.DateColumn(format="DD/MM/YYYY"),
+                'Valor': st.column_config.NumberColumn(format="R$ %.2f"),
+            })
 
-except Exception as e:
-    st.error(f"Erro: {e}")
+    METRICAS.observar("dashboard.tablas", time.perf_counter() - inicio_zona)
 
+    # ==========================================
+    # 🟣 ZONA 3: PROJEÇÃO DAS PARCELAS (PRÓXIMOS MESES)
+    # ==========================================
+    st.divider()
+    st.subheader(f"🔮 Parcelas Comprometidas (Próximos {HORIZONTE_PROYECCION} Meses)")
+    inicio_zona = time.perf_counter()
+
+    # Una proyección por versión de los datos: los reruns (y el bot) la reciben ya calculada
+    proyeccion = obtener_proyeccion().obtener(version, (df_gastos, df_limites))
+    resumen_proy = proyeccion['resumen']
+    if resumen_proy['Comprometido'].sum() == 0:
+        st.info("Nenhuma parcela futura registrada.")
+    else:
+        nombres_meses = [indice_a_mes(m) for m in resumen_proy.index]
+        dimension = st.radio("Agrupar por", ['Banco', 'Quem', 'Categoria'], horizontal=True, key="proy_dimension")
+        por_dimension = proyeccion['matriz'].T.groupby(level=dimension, observed=True).sum().T
+        por_dimension.index = nombres_meses
+        df_proy = por_dimension.rename_axis('Mes').reset_index().melt(id_vars='Mes', var_name=dimension, value_name='Valor')
+        df_proy = df_proy[df_proy['Valor'] > 0]
+
+        import plotly.express as px
+        colores = ({b: COLOR_MAP_BANCOS.get(str(b).lower(), COLOR_DEFAULT) for b in df_proy['Banco'].unique()}
+                   if dimension == 'Banco' else None)
+        fig = px.bar(df_proy, x='Mes', y='Valor', color=dimension, color_discrete_map=colores, height=450)
+        if resumen_proy['Orcamento'].iloc[0] > 0:
+            fig.add_scatter(x=nombres_meses, y=resumen_proy['Orcamento'], mode='lines', name='Orçamento',
+                            line=dict(color='#3dd56d', dash='dash'))
+        fig.update_layout(xaxis=dict(categoryorder='array', categoryarray=nombres_meses))
+        st.plotly_chart(fig, use_container_width=True)
+
+        c5, c6 = st.columns(2)
+        with c5:
+            tbl_proy = resumen_proy.rename(columns={'Orcamento': 'Orçamento', 'Estouradas': 'Categorias Estouradas'})
+            tbl_proy.index = pd.Index(nombres_meses, name='Mês')
+            st.dataframe(tbl_proy, use_container_width=True, column_config={
+                c: st.column_config.NumberColumn(format="R$ %.2f") for c in ['Comprometido', 'Estimado', 'Orçamento', 'Livre']
+            })
+            st.caption("Estimado: parcelas que ainda não estão na planilha (extratos importados até a parcela atual).")
+        with c6:
+            por_cat = proyeccion['categorias'].loc[:, lambda d: d.ne(0).any()]
+            estouradas = proyeccion['estouradas'][por_cat.columns]
+            por_cat.index = estouradas.index = pd.Index(nombres_meses, name='Mês')
+            st.dataframe(por_cat.style.format("R$ {:,.0f}").apply(
+                lambda _: np.where(estouradas, 'background-color: #ff4b4b55', ''), axis=None), use_container_width=True)
+
+    METRICAS.observar("dashboard.proyeccion", time.perf_counter() - inicio_zona)
+    METRICAS.observar("dashboard.render", time.perf_counter() - inicio_render)
 
+except Exception as e:
+    METRICAS.contar("dashboard.errores")
+    st.error(f"Erro: {e}")
@@ -0,0 +1,204 @@
+"""Archivo anual de Registros: mantiene chica la pestaña viva.
+
+Los meses cerrados (Mes_Ref anterior a los últimos MESES_ABIERTOS meses: cada fila es
+una cuota, así que en esos meses todo está pagado) se mueven a una pestaña por año
+(Registros_2024, ...) y sus totales por (Mes_Ref, Banco, Quem, Categoria) se anotan en
+Resumo_Arquivo. El dashboard y el reporte del bot leen Registros + el resumen; las
+pestañas anuales solo se descargan (y quedan en Parquet en .espejo/) cuando se pide
+un mes viejo.
+
+Se puede repetir sin duplicar nada si se cortó a mitad: a la pestaña del año solo se
+anexan las filas que todavía no están, y el resumen de cada mes tocado se rehace desde
+la pestaña del año (reemplaza al anterior, no se suma). Mientras un mes tenga filas
+vivas en Registros, los lectores no usan su resumen.
+
+Registros se reescribe con los valores sin formato que devuelve la hoja (números y fechas
+siguen siendo números y fechas). Mientras tanto el vaciado de la cola del bot y el
+importador del mismo proceso esperan (bloqueo_registros); corrido como script aparte,
+conviene hacerlo con el bot quieto.
+
+Uso (ej. una vez por mes):
+    python archivo.py --simular
+    python archivo.py --meses 12
+    python archivo.py --hogar silva   (una familia de hogares.toml; por defecto la primera)
+"""
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metricas import METRICAS
+from nucleo import (
+    TAB_REGISTROS, TAB_RESUMEN_ARCHIVO, MESES_ABIERTOS, COLUMNAS_RESUMEN, COLUMNAS_ENTERAS, MAPA_COLUMNAS,
+    MES_INVALIDO, asegurar_credenciales, fijar_hogar, obtener_gestor_sheets, obtener_espejos,
+    obtener_espejo_archivo, obtener_cache_reporte, escribir_filas_lote, es_pestana_inexistente,
+    parsear_montos, numeros_o_texto, celdas_comparables, bloqueo_registros,
+    mes_a_indice, indice_de_fecha, indices_a_mes_ref, tab_archivo,
+)
+
+TAMANO_LOTE = 2000 # filas por append_rows al copiar a las pestañas anuales
+
+def _pestana(hoja, titulo, cabecera):
+    """Pestaña existente o nueva (con cabecera)."""
+    try:
+        return hoja.worksheet(titulo)
+    except Exception as e:
+        if not es_pestana_inexistente(e): raise
+        ws = hoja.add_worksheet(title=titulo, rows=1, cols=len(cabecera))
+        escribir_filas_lote(ws, [cabecera])
+        return ws
+
+def _escribir_por_lotes(ws, filas):
+    for i in range(0, len(filas), TAMANO_LOTE):
+        escribir_filas_lote(ws, filas[i:i + TAMANO_LOTE])
+
+def _claves_filas(df):
+    """(hash de la fila, número de ocurrencia): dos filas iguales son dos claves distintas.
+    Los números se comparan por valor ('50,00' copiado como texto y 50 copiado como número)."""
+    hashes = pd.util.hash_pandas_object(celdas_comparables(df), index=False)
+    return pd.MultiIndex.from_arrays([hashes.to_numpy(), hashes.groupby(hashes).cumcount().to_numpy()])
+
+def _filas_con_numeros(df):
+    """Filas para escribir RAW con Valor y las cuotas como números: el texto '33,34' que
+    da la lectura formateada quedaría como texto en la hoja y no sumaría."""
+    df = df.astype(object)
+    for c in df.columns:
+        nombre = MAPA_COLUMNAS.get(c, c)
+        if nombre == 'Valor':
+            df[c] = numeros_o_texto(df[c])
+        elif nombre in COLUMNAS_ENTERAS:
+            df[c] = numeros_o_texto(df[c]).map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v)
+    return df.values.tolist()
+
+def _copiar_anio(hoja, anio, grupo):
+    """Anexa a la pestaña del año las filas de 'grupo' que todavía no están (las de un
+    archivado cortado a mitad ya están). Devuelve todas las filas de la pestaña."""
+    espejo = obtener_espejo_archivo(anio)
+    espejo.sincronizar(forzar=True)
+    existentes = espejo.datos()
+    ws = _pestana(hoja, tab_archivo(anio), list(grupo.columns))
+    cabecera = list(existentes.columns) or list(grupo.columns)
+    extra = [c for c in grupo.columns if c not in cabecera]
+    if extra: # columnas que Registros ganó después (ej. ID)
+        cabecera += extra
+        with METRICAS.medir("sheets.update"):
+            ws.update(values=[cabecera], range_name="A1")
+    grupo = grupo.reindex(columns=cabecera, fill_value='')
+    existentes = existentes.reindex(columns=cabecera, fill_value='')
+    nuevas = grupo[~_claves_filas(grupo).isin(_claves_filas(existentes))]
+    _escribir_por_lotes(ws, _filas_con_numeros(nuevas))
+    return pd.concat([existentes, nuevas], ignore_index=True)
+
+def _reescribir_resumen(hoja, archivadas, meses_tocados):
+    """Resumo_Arquivo con los meses tocados recalculados desde sus pestañas anuales
+    (las filas anteriores de esos meses se reemplazan). Una sola escritura."""
+    espejo = obtener_espejos()[TAB_RESUMEN_ARCHIVO]
+    espejo.sincronizar(forzar=True)
+    anterior = espejo.datos()
+    if set(COLUMNAS_RESUMEN) <= set(anterior.columns):
+        otros = anterior.loc[~mes_a_indice(anterior['Mes_Ref']).isin(meses_tocados).to_numpy(), COLUMNAS_RESUMEN]
+        filas = otros.values.tolist()
+    else:
+        filas = []
+    for df in archivadas:
+        meses = mes_a_indice(df['Mes_Ref'])
+        del_mes = meses.isin(meses_tocados).to_numpy()
+        filas += resumir(df[del_mes], meses[del_mes])
+    ws = _pestana(hoja, TAB_RESUMEN_ARCHIVO, COLUMNAS_RESUMEN)
+    with METRICAS.medir("sheets.update"):
+        ws.update(values=[COLUMNAS_RESUMEN] + filas, range_name="A1")
+    if len(anterior) > len(filas):
+        with METRICAS.medir("sheets.delete_rows"):
+            ws.delete_rows(len(filas) + 2, len(anterior) + 1)
+
+def resumir(viejas, meses):
+    """Totales de las filas archivadas por (Mes_Ref, Banco, Quem, Categoria) -> filas COLUMNAS_RESUMEN."""
+    valores, _ = parsear_montos(viejas['Valor'])
+    claves = pd.DataFrame({
+        'Mes_Idx': meses.to_numpy(),
+        'Banco': viejas['Banco'].str.strip().to_numpy(),
+        'Quem': viejas['Quem'].str.strip().to_numpy() if 'Quem' in viejas else 'Geral',
+        'Categoria': viejas['Categoria'].str.strip().to_numpy(),
+        'Valor': valores.fillna(0.0).to_numpy(),
+    })
+    totales = claves.groupby(['Mes_Idx', 'Banco', 'Quem', 'Categoria'])['Valor'].agg(['sum', 'size']).reset_index()
+    return [[m, b, q, c, round(float(v), 2), int(n)] for m, b, q, c, v, n in zip(
+        indices_a_mes_ref(totales['Mes_Idx']), totales['Banco'], totales['Quem'], totales['Categoria'],
+        totales['sum'], totales['size'])]
+
+@METRICAS.medir("archivo.archivar")
+def archivar(meses_abiertos=MESES_ABIERTOS, simular=False):
+    """Mueve los meses cerrados de Registros a las pestañas anuales. Devuelve el resumen
+    {'filas_archivadas', 'filas_vivas', 'anios', 'meses'}."""
+    with bloqueo_registros(): # nadie del proceso anexa a Registros entre la lectura y el borrado
+        return _archivar(meses_abiertos, simular)
+
+def _archivar(meses_abiertos, simular):
+    espejo = obtener_espejos()[TAB_REGISTROS]
+    espejo.sincronizar(forzar=True)
+    df = espejo.datos()
+    if df.empty or 'Mes_Ref' not in df.columns:
+        return {'filas_archivadas': 0, 'filas_vivas': len(df), 'anios': [], 'meses': 0}
+
+    meses = mes_a_indice(df['Mes_Ref'])
+    limite = indice_de_fecha(datetime.now()) - meses_abiertos
+    cerradas = ((meses != MES_INVALIDO) & (meses < limite)).to_numpy() # Mes_Ref mal escrito se queda
+    en_blanco = ~df.ne('').any(axis=1).to_numpy() # filas de un archivado anterior cortado
+    viejas, vivas = df[cerradas], df[~cerradas & ~en_blanco]
+    anios = meses[cerradas] // 12
+    resultado = {'filas_archivadas': len(viejas), 'filas_vivas': len(vivas),
+                 'anios': sorted(int(a) for a in anios.unique()), 'meses': int(meses[cerradas].nunique())}
+    if simular or (viejas.empty and len(vivas) == len(df)): return resultado
+
+    hoja = obtener_gestor_sheets().hoja()
+    cabecera = list(df.columns)
+    # 1) Copia: primero las pestañas anuales y el resumen; si algo falla aquí, Registros sigue intacta
+    if not viejas.empty:
+        archivadas = [_copiar_anio(hoja, anio, grupo) for anio, grupo in viejas.groupby(anios.to_numpy())]
+        _reescribir_resumen(hoja, archivadas, meses[cerradas].unique())
+
+    # 2) Reescribe Registros solo con las filas vivas, más las anexadas desde la lectura (ej. a
+    # mano). Se releen sin formato: escritas RAW, los números y las fechas quedan como estaban
+    ws = obtener_gestor_sheets().worksheet(TAB_REGISTROS)
+    from gspread.utils import ValueRenderOption, DateTimeOption
+    with METRICAS.medir("sheets.get_all_values"):
+        crudas = ws.get_all_values(value_render_option=ValueRenderOption.unformatted,
+                                   date_time_render_option=DateTimeOption.serial_number)[1:]
+    if len(crudas) < len(df):
+        raise RuntimeError(f"{TAB_REGISTROS} perdeu linhas durante o arquivamento; rode de novo")
+    nuevas = [crudas[i] for i in np.flatnonzero(~cerradas & ~en_blanco)] + crudas[len(df):]
+    # Una sola escritura: las filas vivas arriba y en blanco las que sobran. Si después falla
+    # el borrado, Registros solo arrastra filas vacías (el próximo archivado las descarta)
+    sobran = len(crudas) - len(nuevas)
+    with METRICAS.medir("sheets.update"):
+        ws.update(values=nuevas + [[''] * len(cabecera)] * sobran, range_name="A2")
+    with METRICAS.medir("sheets.delete_rows"):
+        ws.delete_rows(len(nuevas) + 2, len(crudas) + 1)
+
+    # 3) Espejos y cachés: Registros se relee entero (nueva generación), lo demás al consultarse
+    espejo.sincronizar(forzar=True)
+    obtener_espejos()[TAB_RESUMEN_ARCHIVO].sincronizar(forzar=True)
+    for anio in resultado['anios']: obtener_espejo_archivo(anio).sincronizar(forzar=True)
+    obtener_cache_reporte().sincronizar()
+    METRICAS.contar("archivo.filas_archivadas", len(viejas))
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses", type=int, default=MESES_ABIERTOS, help="meses que quedan en Registros")
+    parser.add_argument("--simular", action="store_true", help="solo cuenta lo que se archivaría")
+    parser.add_argument("--hogar", help="familia de hogares.toml (por defecto la primera)")
+    args = parser.parse_args()
+    if fijar_hogar(args.hogar) is None: parser.error(f"hogar desconocido: {args.hogar}")
+
+    error = asegurar_credenciales(os.environ)
+    if error: raise SystemExit(error)
+    r = archivar(args.meses, args.simular)
+    accion = "a arquivar (simulação)" if args.simular else "arquivadas"
+    print(f"✅ {r['filas_archivadas']} linhas de {r['meses']} mês(es) {accion} em {r['anios'] or '-'}; "
+          f"{r['filas_vivas']} ficam em {TAB_REGISTROS}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark de arranque de cada punto de entrada.
+
+Mide, cada vez en un proceso nuevo:
+  - import en frío de nucleo y bot_telegram (y qué librerías pesadas arrastran),
+  - primer run y rerun del dashboard (app.py) con streamlit.testing.AppTest.
+
+Con --ref se mide también otro commit (ej: el anterior a la separación) para comparar.
+
+Uso:
+    python benchmarks/arranque.py
+    python benchmarks/arranque.py --ref a7f2129 --repeticiones 5
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ['streamlit', 'pandas', 'plotly', 'matplotlib', 'telebot', 'gspread']
+
+CODIGO_IMPORT = """
+import sys, time, json
+t = time.perf_counter()
+import {modulo}
+print(json.dumps({{'segundos': time.perf_counter() - t,
+                   'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+CODIGO_DASHBOARD = """
+import logging, time, json
+logging.disable(logging.CRITICAL)
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=120)
+t = time.perf_counter(); at.run(); primero = time.perf_counter() - t
+t = time.perf_counter(); at.run(); rerun = time.perf_counter() - t
+print(json.dumps({'primer_run': primero, 'rerun': rerun}))
+"""
+
+def preparar_arbol(ref):
+    """Copia del código (actual o de un commit) en un directorio temporal limpio."""
+    destino = tempfile.mkdtemp(prefix="bench_arranque_")
+    if ref:
+        archivo = subprocess.run(["git", "archive", ref], cwd=RAIZ, check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", destino], input=archivo, check=True)
+    else:
+        for nombre in os.listdir(RAIZ):
+            if nombre.endswith(".py"): shutil.copy(os.path.join(RAIZ, nombre), destino)
+    # Secrets de mentira: el dashboard llega hasta la carga de datos sin red real
+    os.makedirs(os.path.join(destino, ".streamlit"), exist_ok=True)
+    with open(os.path.join(destino, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(f'credenciales_seguras = "{base64.b64encode(b"{}").decode()}"\n')
+        f.write('TOKEN_TELEGRAM = "0:bench"\nBOT_EN_DASHBOARD = false\n')
+    return destino
+
+def ejecutar(codigo, cwd):
+    entorno = dict(os.environ, TOKEN_TELEGRAM="0:bench", PYTHONDONTWRITEBYTECODE="1")
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=cwd, env=entorno,
+                            capture_output=True, text=True, timeout=300)
+    ultima = salida.stdout.strip().splitlines()[-1:]
+    if salida.returncode != 0 or not ultima:
+        raise RuntimeError(salida.stderr[-2000:])
+    return json.loads(ultima[0])
+
+def medir_arbol(directorio, repeticiones):
+    resultados = {}
+    for modulo in ['nucleo', 'bot_telegram']:
+        if not os.path.exists(os.path.join(directorio, f"{modulo}.py")): continue
+        corridas = [ejecutar(CODIGO_IMPORT.format(modulo=modulo, pesados=PESADOS), directorio)
+                    for _ in range(repeticiones)]
+        resultados[f"import {modulo}"] = {
+            'mediana_ms': 1000 * statistics.median(c['segundos'] for c in corridas),
+            'pesados': corridas[-1]['pesados'],
+        }
+    corridas = [ejecutar(CODIGO_DASHBOARD, directorio) for _ in range(repeticiones)]
+    for clave in ['primer_run', 'rerun']:
+        resultados[f"app.py {clave}"] = {'mediana_ms': 1000 * statistics.median(c[clave] for c in corridas)}
+    return resultados
+
+def imprimir(titulo, resultados):
+    print(f"\n== {titulo} ==")
+    for nombre, r in resultados.items():
+        extra = f"  (carga: {', '.join(r['pesados']) or '-'})" if 'pesados' in r else ""
+        print(f"{nombre:<24} {r['mediana_ms']:>9.1f} ms{extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", help="commit de git para comparar (ej: el baseline)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args()
+
+    informe = {'actual': medir_arbol(preparar_arbol(None), args.repeticiones)}
+    if args.ref:
+        informe[args.ref] = medir_arbol(preparar_arbol(args.ref), args.repeticiones)
+
+    if args.json:
+        print(json.dumps(informe, indent=2))
+    else:
+        for titulo, resultados in informe.items(): imprimir(titulo, resultados)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark offline de carga, agregación, reporte y escritura sobre el almacén falso.
+
+No necesita credenciales ni red: usa almacen_falso.AlmacenMemoria con registros
+sintéticos y, si se pide, latencia y errores 429 simulados.
+
+Uso:
+    python benchmarks/rendimiento.py
+    python benchmarks/rendimiento.py --filas 1000 100000 1000000 --latencia 0.2 --prob-cuota 0.1
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import nucleo
+from almacen_falso import PerfilRed, almacen_sintetico
+
+def cronometrar(funcion, repeticiones=1):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+def compra_de_prueba(cuotas=12):
+    hoy = datetime.now()
+    return [[hoy.strftime("%d/%m/%Y"), hoy.strftime("%m-%Y"), "Carlos", "Credito", "Nubank",
+             10.0, cuotas, i + 1, "Casa", f"Casa ({i + 1}/{cuotas})"] for i in range(cuotas)]
+
+def medir(n_filas, red, repeticiones, n_escrituras):
+    os.chdir(tempfile.mkdtemp(prefix="bench_finanzas_")) # el espejo Parquet va a un directorio limpio
+    t_gen, almacen = cronometrar(lambda: almacen_sintetico(n_filas, red))
+    nucleo.usar_almacen(almacen)
+    resultados = {'generar_datos': t_gen}
+
+    resultados['carga_fria'], (df_r, _) = cronometrar(nucleo.cargar_tablas)
+    # Memoria (deep) por cada 100k filas: espejo en texto vs libro tipado que usa el dashboard
+    por_100k = lambda df: df.memory_usage(deep=True).sum() / 2**20 * 100000 / max(len(df), 1)
+    resultados['memoria_texto_mb_100k'] = por_100k(nucleo.obtener_espejos()[nucleo.TAB_REGISTROS].datos())
+    resultados['memoria_tipada_mb_100k'] = por_100k(df_r)
+    resultados['carga_caliente'], _ = cronometrar(nucleo.cargar_tablas, repeticiones)
+
+    def agregar():
+        cubo = nucleo.CuboGastos()
+        cubo.actualizar(df_r, df_r.attrs.get('generacion'))
+        mes = nucleo.indice_de_fecha(datetime.now())
+        return cubo.total(mes), cubo.por_categoria(mes), cubo.pares_banco_quien()
+    resultados['agregado'], _ = cronometrar(agregar, repeticiones)
+
+    mes = nucleo.indice_de_fecha(datetime.now())
+    cache = nucleo.CacheReporte()
+    resultados['reporte_frio'], _ = cronometrar(lambda: cache.reporte(mes))
+    resultados['reporte_caliente'], _ = cronometrar(lambda: cache.reporte(mes), repeticiones)
+
+    compras = pd.DataFrame({'Monto': 100.0, 'Cuotas': np.resize([1, 3, 12], n_filas), 'Banco': np.resize(nucleo.LISTA_BANCOS + ['PIX'], n_filas),
+                            'Fecha': datetime.now(), 'Categoria': 'Casa'})
+    resultados['cronograma_compras'], _ = cronometrar(lambda: nucleo.cronograma_cuotas(compras), repeticiones)
+
+    espejo = nucleo.obtener_espejos()[nucleo.TAB_REGISTROS]
+    hoja = almacen.worksheet(nucleo.TAB_REGISTROS)
+    filas = compra_de_prueba()
+    def escribir():
+        marca = espejo.marca_remota()
+        respuesta = nucleo.escribir_filas_lote(hoja, filas)
+        espejo.registrar_escritura(filas, respuesta, marca)
+    tiempos, fallos = [], 0
+    for _ in range(n_escrituras):
+        inicio = time.perf_counter()
+        try: escribir()
+        except Exception: fallos += 1
+        tiempos.append(time.perf_counter() - inicio)
+    resultados['escritura_12_cuotas'] = statistics.median(tiempos)
+    resultados['escritura_filas_por_s'] = len(filas) * n_escrituras / sum(tiempos)
+    resultados['escritura_fallidas'] = fallos
+    resultados['red'] = dict(red.contadores)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por llamada a la API")
+    parser.add_argument("--latencia-por-fila", type=float, default=0.0)
+    parser.add_argument("--prob-cuota", type=float, default=0.0, help="probabilidad de 429 por llamada")
+    parser.add_argument("--pausa-reintento", type=float, default=0.01,
+                        help="backoff inicial ante 429 (el real es de %ss)" % nucleo.PAUSA_INICIAL_REINTENTO)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--escrituras", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args()
+
+    nucleo.PAUSA_INICIAL_REINTENTO = args.pausa_reintento
+    informe = {}
+    for n in args.filas:
+        red = PerfilRed(args.latencia, args.latencia_por_fila, args.prob_cuota)
+        informe[n] = medir(n, red, args.repeticiones, args.escrituras)
+
+    if args.json:
+        print(json.dumps(informe, indent=2))
+        return
+    etapas = ['carga_fria', 'carga_caliente', 'agregado', 'reporte_frio', 'reporte_caliente',
+              'cronograma_compras', 'escritura_12_cuotas']
+    print(f"{'filas':>9} " + " ".join(f"{e:>19}" for e in etapas) + f" {'filas/s escritura':>18}")
+    for n, r in informe.items():
+        print(f"{n:>9} " + " ".join(f"{1000 * r[e]:>16.1f} ms" for e in etapas)
+              + f" {r['escritura_filas_por_s']:>18.0f}")
+        print(f"{'':>9} memoria por 100k filas: {r['memoria_texto_mb_100k']:.1f} MB en texto, "
+              f"{r['memoria_tipada_mb_100k']:.1f} MB tipada")
+        print(f"{'':>9} red: {r['red']}, escrituras fallidas: {r['escritura_fallidas']}")
+
+if __name__ == "__main__":
+    main()
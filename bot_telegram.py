@@ -0,0 +1,585 @@
+"""Bot de Telegram: registro de gastos y reporte mensual.
+
+Se ejecuta solo (`python bot_telegram.py`, lee TOKEN_TELEGRAM y CREDENCIALES_SEGURAS
+del entorno) o dentro del dashboard, que lo arranca en un hilo con arrancar_en_hilo().
+Un solo poller atiende a todos los hogares (hogares.toml): cada handler corre con el
+hogar de su chat (con_hogar) y las tareas lentas heredan ese contexto.
+"""
+import contextvars
+import functools
+import os
+import threading
+import json
+import sqlite3
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import time
+import telebot
+from telebot import types
+
+from categorizador import REGEX_MONTO, interpretar_mensaje
+from cola_escritura import nuevo_id, obtener_cola, obtener_vaciador
+from graficos import obtener_graficos
+from metricas import METRICAS
+from proyeccion import obtener_proyeccion
+from nucleo import (
+    CARPETA_ESTADO,
+    asegurar_credenciales, instancia_unica, obtener_cache_reporte, hogar_actual, hogar_de_chat, usar_hogar,
+    limpiar_numero, cronograma_cuotas, filas_para_sheets,
+    indice_de_fecha, indice_a_mes, version_datos,
+)
+
+N_TRABAJADORES_BOT = 4
+MAX_TRABAJADORES_POR_HOGAR = 2 # un hogar con la hoja lenta no se queda con todo el pool
+TTL_CONVERSACION = 6 * 3600 # un gasto a medio registrar caduca a las 6h
+MAX_CONVERSACIONES_RAM = 500
+
+# Los crea crear_bot(): importar este módulo no valida el token ni abre nada (SQLite, hilos)
+bot = None
+motor = None
+conversaciones = None
+_lock_bot = threading.Lock()
+
+# --- Motor del Bot: pool de trabajadores con orden por chat ---
+class MotorBot:
+    """Pool acotado de hilos para el I/O lento (escrituras y reportes en Sheets).
+    Las tareas de un mismo chat se ejecutan en orden, una detrás de otra; chats
+    distintos avanzan en paralelo. Cada hogar ocupa a la vez como mucho max_por_hogar
+    trabajadores: sus otros chats esperan turno y, al liberarse uno, vuelven al final
+    de la cola del pool, detrás de los demás hogares. Cada tarea corre con el contexto
+    (hogar) de quien la encoló. Profundidad de cola aquí; latencias en METRICAS."""
+
+    def __init__(self, n_trabajadores=N_TRABAJADORES_BOT, max_por_hogar=MAX_TRABAJADORES_POR_HOGAR):
+        self._pool = ThreadPoolExecutor(max_workers=n_trabajadores, thread_name_prefix="MotorBot")
+        self._lock = threading.Lock()
+        self._colas = {} # chat_id -> deque de (funcion, args, contexto, instante en que se encoló)
+        self._activos = {} # hogar -> chats que se están drenando
+        self._esperando = {} # hogar -> deque de chats con tareas y sin trabajador
+        self.max_por_hogar = max_por_hogar
+        self.pendientes = 0
+        self.reinicios_poller = 0
+
+    def enviar(self, chat_id, funcion, *args):
+        hogar = hogar_actual().id
+        with self._lock:
+            self.pendientes += 1
+            tarea = (funcion, args, contextvars.copy_context(), time.perf_counter())
+            if chat_id in self._colas: # ya hay un trabajador drenando (o un turno pedido) para este chat
+                self._colas[chat_id].append(tarea)
+                return
+            self._colas[chat_id] = deque([tarea])
+            if self._activos.get(hogar, 0) >= self.max_por_hogar:
+                self._esperando.setdefault(hogar, deque()).append(chat_id)
+                return
+            self._activos[hogar] = self._activos.get(hogar, 0) + 1
+        self._pool.submit(self._drenar, chat_id, hogar)
+
+    def _drenar(self, chat_id, hogar):
+        while True:
+            with self._lock:
+                cola = self._colas[chat_id]
+                if not cola:
+                    del self._colas[chat_id]
+                    esperando = self._esperando.get(hogar)
+                    if esperando: # el turno pasa a otro chat del mismo hogar
+                        self._pool.submit(self._drenar, esperando.popleft(), hogar)
+                        if not esperando: del self._esperando[hogar]
+                    else:
+                        self._activos[hogar] -= 1
+                        if not self._activos[hogar]: del self._activos[hogar]
+                    return
+                funcion, args, contexto, encolada = cola.popleft()
+            METRICAS.observar("bot.espera_en_cola", time.perf_counter() - encolada)
+            try:
+                with METRICAS.medir(f"bot.tarea.{funcion.__name__}"):
+                    contexto.run(funcion, *args)
+            except Exception as e:
+                print(f"⚠️ Tarea {funcion.__name__} falló (chat {chat_id}): {e}")
+            finally:
+                with self._lock: self.pendientes -= 1
+
+    @staticmethod
+    def cronometrar(nombre):
+        """Decorador para medir la latencia de un handler del bot."""
+        return METRICAS.medir(f"bot.handler.{nombre}")
+
+    def estadisticas(self, hogar=None):
+        """Estado del motor y de la cola de escritura; con 'hogar', solo lo de esa familia
+        (más las latencias y reinicios del proceso, que no dicen nada de sus datos)."""
+        with self._lock:
+            por_hogar = {h: {'trabajando': self._activos.get(h, 0), 'esperando': len(self._esperando.get(h, ()))}
+                         for h in set(self._activos) | set(self._esperando)}
+            if hogar is None:
+                estado = {'en_cola': self.pendientes, 'chats_activos': len(self._colas),
+                          'reinicios_poller': self.reinicios_poller, 'hogares': por_hogar}
+            else:
+                estado = dict(por_hogar.get(hogar, {'trabajando': 0, 'esperando': 0}),
+                              reinicios_poller=self.reinicios_poller)
+        estado['cola_escritura'] = obtener_cola().resumen(hogar)
+        estado['latencias'] = METRICAS.resumen("bot.")['tiempos']
+        return estado
+
+def obtener_motor():
+    return instancia_unica('motor_bot', MotorBot, por_hogar=False)
+
+# --- Estado de Conversaciones (persistente) ---
+class EstadoConversaciones:
+    """Gasto en curso de cada chat y el paso de texto que está esperando.
+    En RAM vive un LRU acotado; todo se escribe en SQLite, así que un reinicio
+    de Streamlit retoma los registros a medio hacer. Caduca por TTL."""
+
+    def __init__(self, ruta, ttl=TTL_CONVERSACION, max_en_ram=MAX_CONVERSACIONES_RAM):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self.ttl = ttl
+        self.max_en_ram = max_en_ram
+        self._lock = threading.Lock()
+        self._ram = OrderedDict() # chat_id -> {'datos': {...}, 'paso': str|None, 'ts': float}
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS conversaciones "
+                         "(chat_id INTEGER PRIMARY KEY, datos TEXT, paso TEXT, ts REAL)")
+        self._db.commit()
+
+    def obtener(self, chat_id):
+        """Copia del registro del chat, o None si no hay o caducó."""
+        with self._lock:
+            reg = self._leer(chat_id)
+            return None if reg is None else {'datos': dict(reg['datos']), 'paso': reg['paso']}
+
+    def iniciar(self, chat_id, paso=None):
+        with self._lock:
+            self._escribir(chat_id, {'datos': {}, 'paso': paso})
+
+    def actualizar(self, chat_id, paso=None, **campos):
+        """Mezcla campos en el gasto y fija el paso esperado. Falla si la sesión no existe."""
+        with self._lock:
+            reg = self._leer(chat_id)
+            if reg is None: raise KeyError(chat_id)
+            reg['datos'].update(campos)
+            reg['paso'] = paso
+            self._escribir(chat_id, reg)
+
+    def borrar(self, chat_id):
+        with self._lock:
+            self._ram.pop(chat_id, None)
+            self._db.execute("DELETE FROM conversaciones WHERE chat_id = ?", (chat_id,))
+            self._db.commit()
+
+    def _leer(self, chat_id):
+        reg = self._ram.get(chat_id)
+        if reg is None:
+            fila = self._db.execute("SELECT datos, paso, ts FROM conversaciones WHERE chat_id = ?",
+                                    (chat_id,)).fetchone()
+            if fila: reg = {'datos': json.loads(fila[0]), 'paso': fila[1], 'ts': fila[2]}
+        if reg is None or time.time() - reg['ts'] > self.ttl:
+            return None
+        self._ram[chat_id] = reg
+        self._ram.move_to_end(chat_id)
+        self._recortar()
+        return reg
+
+    def _escribir(self, chat_id, reg):
+        reg['ts'] = time.time()
+        self._ram[chat_id] = reg
+        self._ram.move_to_end(chat_id)
+        self._recortar()
+        self._db.execute("INSERT OR REPLACE INTO conversaciones VALUES (?, ?, ?, ?)",
+                         (chat_id, json.dumps(reg['datos']), reg['paso'], reg['ts']))
+        self._db.execute("DELETE FROM conversaciones WHERE ts < ?", (reg['ts'] - self.ttl,))
+        self._db.commit()
+
+    def _recortar(self):
+        while len(self._ram) > self.max_en_ram:
+            self._ram.popitem(last=False) # sigue en SQLite, solo sale de RAM
+
+def obtener_estado_conversaciones():
+    # Global: los chat_id de Telegram no se repiten entre hogares
+    return instancia_unica('conversaciones', lambda: EstadoConversaciones(
+        os.path.join(CARPETA_ESTADO, "conversaciones.sqlite")), por_hogar=False)
+
+# --- Enrutado por hogar ---
+def con_hogar(handler):
+    """Corre el handler con el hogar del chat; los chats que no son de ningún hogar no pasan."""
+    @functools.wraps(handler)
+    def envoltura(update):
+        chat_id = (update.message if isinstance(update, types.CallbackQuery) else update).chat.id
+        hogar = hogar_de_chat(chat_id)
+        if hogar is None:
+            METRICAS.contar("bot.chats_sin_hogar")
+            bot.send_message(chat_id, f"🔒 Este chat não está cadastrado (id {chat_id}).")
+            return
+        with usar_hogar(hogar.id):
+            return handler(update)
+    return envoltura
+
+# --- Menús del Bot (se registran en crear_bot) ---
+@con_hogar
+def despachar_paso(message):
+    paso = conversaciones.obtener(message.chat.id)['paso']
+    PASOS[paso](message)
+
+@con_hogar
+@MotorBot.cronometrar("menu_principal")
+def menu_principal(message):
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(types.InlineKeyboardButton("Registrar Gasto", callback_data="menu_gasto"),
+               types.InlineKeyboardButton("Ver Relatório", callback_data="menu_reporte"))
+    markup.add(types.InlineKeyboardButton("🔮 Parcelas Futuras", callback_data="menu_projecao"))
+    bot.reply_to(message, "Olá! O que vamos fazer?", reply_markup=markup)
+
+@con_hogar
+@MotorBot.cronometrar("projecao")
+def comando_projecao(message):
+    motor.enviar(message.chat.id, generar_projecao_bot, message.chat.id)
+
+# Gasto en un solo mensaje: "50,00 mercado nubank", "300 tv 3x inter jessy"
+@con_hogar
+@MotorBot.cronometrar("registro_rapido")
+def registro_rapido(message):
+    # Interpretar usa el índice de categorías (en frío lo carga del espejo): fuera del hilo de polling
+    motor.enviar(message.chat.id, procesar_registro_rapido, message)
+
+def procesar_registro_rapido(message):
+    chat_id = message.chat.id
+    datos = interpretar_mensaje(message.text)
+    if datos is None:
+        bot.reply_to(message, "❌ Valor inválido.")
+        return
+    conversaciones.iniciar(chat_id)
+    conversaciones.actualizar(chat_id, **{k: v for k, v in datos.items() if v is not None})
+    deducido = [datos[k] for k in ('categoria', 'banco', 'quien') if datos[k]]
+    extra = f" ({datos['cuotas']}x)" if datos['cuotas'] > 1 else ""
+    bot.send_message(chat_id, f"✅ R$ {datos['monto']:,.2f}{extra}" + (f" · {' · '.join(deducido)}" if deducido else ""))
+    siguiente_paso(chat_id)
+
+@con_hogar
+@MotorBot.cronometrar("callback_handler")
+def callback_handler(call):
+    chat_id = call.message.chat.id
+    
+    # Confirmar el botón al instante; el trabajo lento va al motor
+    if call.data == "menu_reporte":
+        bot.answer_callback_query(call.id, "Gerando...")
+        motor.enviar(chat_id, generar_reporte_bot, call.message)
+        return
+    elif call.data == "menu_projecao":
+        bot.answer_callback_query(call.id, "Calculando...")
+        motor.enviar(chat_id, generar_projecao_bot, chat_id)
+        return
+    elif call.data == "menu_salir":
+        bot.answer_callback_query(call.id, "Fechado")
+    else:
+        bot.answer_callback_query(call.id)
+
+    if call.data == "menu_salir":
+        # NUEVO: Opción Salir
+        bot.send_message(chat_id, "👋 Sessão encerrada. Digite *Oi* quando quiser voltar!", parse_mode="Markdown")
+        conversaciones.borrar(chat_id) # Limpiar memoria para evitar errores
+        return
+        
+    elif call.data == "menu_gasto":
+        conversaciones.iniciar(chat_id, paso='monto')
+        bot.send_message(chat_id, "Digite o Valor (Ex: 50,00):")
+        return
+
+    # A partir de aquí los botones completan un gasto en curso
+    if conversaciones.obtener(chat_id) is None:
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("➕ Novo Gasto", callback_data="menu_gasto"))
+        bot.send_message(chat_id, "⌛ Sessão expirada. Vamos começar de novo?", reply_markup=markup)
+        return
+        
+    if call.data.startswith("tipo_"):
+        tipo = call.data.split("_")[1]
+        
+        # Manejo de PIX
+        if tipo == 'pix':
+            conversaciones.actualizar(chat_id, tipo='pix', cuotas=1, banco='PIX')
+            siguiente_paso(chat_id)
+        elif tipo == 'parcelado':
+            conversaciones.actualizar(chat_id, paso='cuotas', tipo='parcelado')
+            bot.send_message(chat_id, "Quantas Parcelas?")
+        else: # Avista Credito
+            conversaciones.actualizar(chat_id, tipo='avista', cuotas=1)
+            siguiente_paso(chat_id)
+            
+    elif call.data.startswith("banco_"):
+        conversaciones.actualizar(chat_id, banco=call.data.split("_")[1])
+        siguiente_paso(chat_id)
+        
+    elif call.data.startswith("quien_"):
+        conversaciones.actualizar(chat_id, quien=call.data.split("_")[1])
+        siguiente_paso(chat_id)
+        
+    elif call.data.startswith("cat_"):
+        cat = call.data.split("_")[1]
+        if cat == "Outros":
+            conversaciones.actualizar(chat_id, paso='categoria_otros')
+            bot.send_message(chat_id, "O que é especificamente?")
+        else:
+            conversaciones.actualizar(chat_id, categoria=cat)
+            siguiente_paso(chat_id)
+
+@MotorBot.cronometrar("paso_recibir_monto")
+def paso_recibir_monto(message):
+    try:
+        monto = limpiar_numero(message.text)
+        if monto == 0: raise ValueError
+        conversaciones.actualizar(message.chat.id, monto=monto)
+        
+        markup = types.InlineKeyboardMarkup()
+        # Botón PIX
+        markup.add(types.InlineKeyboardButton("💠 PIX", callback_data="tipo_pix")) 
+        markup.add(types.InlineKeyboardButton("💳 Crédito À Vista", callback_data="tipo_avista"),
+                   types.InlineKeyboardButton("📅 Parcelado", callback_data="tipo_parcelado"))
+                   
+        bot.send_message(message.chat.id, f"✅ R$ {monto:,.2f}\nComo vai pagar?", reply_markup=markup)
+    except:
+        bot.reply_to(message, "❌ Valor inválido.") # el paso sigue siendo 'monto'
+
+@MotorBot.cronometrar("paso_recibir_cuotas")
+def paso_recibir_cuotas(message):
+    try:
+        cuotas = int(message.text)
+        if cuotas < 1: raise ValueError
+        conversaciones.actualizar(message.chat.id, cuotas=cuotas)
+        siguiente_paso(message.chat.id)
+    except:
+        bot.reply_to(message, "❌ Use apenas números.") # el paso sigue siendo 'cuotas'
+
+@MotorBot.cronometrar("paso_recibir_categoria_otros")
+def paso_recibir_categoria_otros(message):
+    conversaciones.actualizar(message.chat.id, categoria=message.text.title()) # lo escrito, sin reinterpretar
+    guardar_gasto_final(message.chat.id)
+
+# paso esperado -> handler del texto que llega
+PASOS = {
+    'monto': paso_recibir_monto,
+    'cuotas': paso_recibir_cuotas,
+    'categoria_otros': paso_recibir_categoria_otros,
+}
+
+def siguiente_paso(chat_id):
+    """Pide lo que falta del gasto en curso (banco, quem, categoria) o lo guarda."""
+    datos = conversaciones.obtener(chat_id)['datos']
+    if not datos.get('banco'): mostrar_menu_bancos(chat_id)
+    elif not datos.get('quien'): mostrar_menu_personas(chat_id)
+    elif not datos.get('categoria'): mostrar_menu_categorias(chat_id)
+    else: guardar_gasto_final(chat_id)
+
+def mostrar_menu_bancos(chat_id):
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(*[types.InlineKeyboardButton(b, callback_data=f"banco_{b}") for b in hogar_actual().bancos])
+    bot.send_message(chat_id, "Qual Banco?", reply_markup=markup)
+
+def mostrar_menu_personas(chat_id):
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(*[types.InlineKeyboardButton(p, callback_data=f"quien_{p}") for p in hogar_actual().personas])
+    bot.send_message(chat_id, "Quem pagou?", reply_markup=markup)
+
+def mostrar_menu_categorias(chat_id):
+    markup = types.InlineKeyboardMarkup(row_width=3)
+    markup.add(*[types.InlineKeyboardButton(c, callback_data=f"cat_{c}") for c in hogar_actual().categorias])
+    bot.send_message(chat_id, "Qual a Categoria?", reply_markup=markup)
+
+def guardar_gasto_final(chat_id):
+    datos = (conversaciones.obtener(chat_id) or {}).get('datos')
+    try:
+        monto = datos['monto']
+        cuotas = datos['cuotas']
+        banco = datos['banco']
+        quien = datos['quien']
+        cat = datos['categoria']
+        
+        # Centavos repartidos entre las cuotas: la suma es exactamente el monto
+        cronograma = cronograma_cuotas([{'Monto': monto, 'Cuotas': cuotas, 'Banco': banco, 'Fecha': datetime.now(),
+                                         'Quem': quien, 'Categoria': cat, 'Descricao': datos.get('descripcion')}])
+        filas = filas_para_sheets(cronograma)
+
+        # Primero a la cola local (durable); Sheets lo recibe en segundo plano (cola_escritura.py)
+        hogar = hogar_actual().id
+        obtener_cola().encolar(nuevo_id(), hogar, chat_id, filas)
+        conversaciones.borrar(chat_id)
+        vaciador = obtener_vaciador()
+        vaciador.avisar()
+        
+        icono_banco = "💠" if banco == 'PIX' else "🏦"
+        msg = f"✅ *Salvo*\n💲 R$ {monto:,.2f}\n{icono_banco} {banco} - {quien}\n🏷️ {cat}"
+        if vaciador.con_error(hogar):
+            pendientes = obtener_cola().pendientes().get(hogar, 0)
+            msg += f"\n\n⏳ Planilha indisponível: {pendientes} gasto(s) na fila, enviados automaticamente depois."
+        
+        bot.send_message(chat_id, msg, parse_mode="Markdown")
+        
+        # --- NUEVO MENÚ FINAL CON 3 OPCIONES ---
+        markup = types.InlineKeyboardMarkup()
+        # Fila 1: Nuevo y Reporte
+        markup.row(types.InlineKeyboardButton("➕ Novo Gasto", callback_data="menu_gasto"),
+                   types.InlineKeyboardButton("📄 Relatório", callback_data="menu_reporte"))
+        # Fila 2: Salir
+        markup.row(types.InlineKeyboardButton("❌ Sair", callback_data="menu_salir"))
+        
+        bot.send_message(chat_id, "Mais alguma coisa?", reply_markup=markup)
+
+    except Exception as e:
+        METRICAS.contar("bot.errores_guardar")
+        bot.send_message(chat_id, f"❌ Erro: {e}")
+
+def generar_reporte_bot(message):
+    try:
+        # Reporte Avanzado (Comparativo con Presupuesto)
+        hoy = datetime.now()
+        mes_actual = hoy.strftime("%m-%Y")
+        gastos, limites, hay_registros = obtener_cache_reporte().reporte(indice_de_fecha(hoy))
+
+        if not hay_registros:
+            bot.send_message(message.chat.id, "📭 Sem registros para analisar.")
+            return
+        
+        if not gastos:
+            bot.send_message(message.chat.id, f"📅 Sem gastos registrados em {mes_actual}")
+            return
+
+        msg = f"📊 *Análise Mensal ({mes_actual})*\n"
+        msg += f"_(Gastos Cartão + PIX)_\n\n"
+        
+        total_gastado_mes = 0
+        categorias = sorted(set(gastos) | set(limites), key=lambda c: gastos.get(c, 0.0), reverse=True)
+
+        for cat in categorias:
+            gasto = gastos.get(cat, 0.0)
+            limite = limites.get(cat, 0.0)
+            
+            if gasto == 0 and limite == 0: continue
+
+            total_gastado_mes += gasto
+
+            if limite > 0:
+                porcentaje = (gasto / limite) * 100
+                if porcentaje <= 80: icono = "🟢"
+                elif porcentaje <= 100: icono = "🟡"
+                else: icono = "🔴"
+                msg += f"{icono} *{cat}*\n      R$ {gasto:,.0f} / {limite:,.0f} ({porcentaje:.0f}%)\n"
+            elif gasto > 0:
+                msg += f"⚠️ *{cat}* (Sem Orçamento)\n      R$ {gasto:,.2f}\n"
+
+        msg += "\n" + "─"*20 + "\n"
+        msg += f"💰 *TOTAL GASTO:* R$ {total_gastado_mes:,.2f}"
+        pendientes = obtener_cola().pendientes().get(hogar_actual().id, 0)
+        if pendientes: msg += f"\n⏳ _{pendientes} gasto(s) ainda na fila, fora deste relatório_"
+
+        bot.send_message(message.chat.id, msg, parse_mode="Markdown")
+        enviar_grafico(message.chat.id, indice_de_fecha(hoy))
+
+    except Exception as e:
+        METRICAS.contar("bot.errores_reporte")
+        bot.send_message(message.chat.id, f"❌ Erro ao gerar relatório: {e}")
+
+def generar_projecao_bot(chat_id):
+    """Parcelas ya comprometidas mes a mes frente al orçamento (la misma proyección del
+    dashboard, memorizada por versión de los datos)."""
+    try:
+        resumen = obtener_proyeccion().obtener()['resumen']
+        con_parcelas = resumen.index[resumen['Comprometido'] > 0]
+        if con_parcelas.empty:
+            bot.send_message(chat_id, "📭 Nenhuma parcela futura registrada.")
+            return
+
+        msg = f"🔮 *Parcelas Comprometidas*\n_(até {indice_a_mes(con_parcelas[-1])})_\n\n"
+        for mes, fila in resumen.loc[con_parcelas[0]:con_parcelas[-1]].iterrows():
+            if fila['Orcamento'] > 0:
+                porcentaje = (fila['Comprometido'] / fila['Orcamento']) * 100
+                if porcentaje <= 80: icono = "🟢"
+                elif porcentaje <= 100: icono = "🟡"
+                else: icono = "🔴"
+                msg += f"{icono} *{indice_a_mes(mes)}*  R$ {fila['Comprometido']:,.0f} / {fila['Orcamento']:,.0f}"
+            else:
+                msg += f"📅 *{indice_a_mes(mes)}*  R$ {fila['Comprometido']:,.0f}"
+            if fila['Estouradas']: msg += f"  ⚠️ {fila['Estouradas']:.0f} cat."
+            msg += "\n"
+
+        msg += "\n" + "─"*20 + "\n"
+        msg += f"💰 *TOTAL COMPROMETIDO:* R$ {resumen['Comprometido'].sum():,.2f}"
+        if resumen['Estimado'].sum() > 0:
+            msg += f"\n_R$ {resumen['Estimado'].sum():,.2f} de parcelas ainda fora da planilha (extratos importados)_"
+        bot.send_message(chat_id, msg, parse_mode="Markdown")
+
+    except Exception as e:
+        METRICAS.contar("bot.errores_projecao")
+        bot.send_message(chat_id, f"❌ Erro ao calcular a projeção: {e}")
+
+def enviar_grafico(chat_id, mes):
+    """Gráfico del reporte: si ya se subió a Telegram se reenvía por file_id (sin subir
+    bytes); si no, se sube el PNG de la caché y se guarda el file_id para la próxima."""
+    graficos = obtener_graficos()
+    try:
+        version = version_datos()
+        entrada = graficos.obtener(mes, version)
+        if entrada['file_id']:
+            try:
+                bot.send_photo(chat_id, entrada['file_id'])
+                METRICAS.contar("graficos.file_id_reusado")
+                return
+            except Exception as e:
+                print(f"⚠️ file_id del gráfico rechazado, se sube de nuevo: {e}")
+        enviado = bot.send_photo(chat_id, entrada['png'])
+        graficos.registrar_file_id(mes, version, enviado.photo[-1].file_id)
+    except Exception as e:
+        # El texto del reporte ya salió: sin gráfico no es un error para el usuario
+        METRICAS.contar("bot.errores_grafico")
+        print(f"⚠️ Gráfico del reporte no enviado: {e}")
+
+# --- INICIADOR HILO (THREAD) ---
+def crear_bot(token=None):
+    """TeleBot con sus handlers, el motor y el estado de conversaciones (una vez por
+    proceso). ValueError si el token no tiene el formato '<id>:<chave>' (telebot lo
+    rechaza al crear el bot)."""
+    global bot, motor, conversaciones
+    with _lock_bot:
+        if bot is not None: return bot
+        token = (token or os.environ.get("TOKEN_TELEGRAM", "")).strip()
+        if ":" not in token: raise ValueError("⚠️ Falta TOKEN_TELEGRAM (<id>:<chave>) no ambiente.")
+        motor, conversaciones = obtener_motor(), obtener_estado_conversaciones()
+        nuevo = telebot.TeleBot(token)
+        # En orden: si el chat espera un texto (monto, parcelas...), ese paso tiene prioridad
+        nuevo.register_message_handler(despachar_paso, func=lambda m: (conversaciones.obtener(m.chat.id) or {}).get('paso') in PASOS)
+        nuevo.register_message_handler(menu_principal, func=lambda m: m.text.lower() in ['oi', 'hola', 'olá'])
+        nuevo.register_message_handler(menu_principal, commands=['start', 'help'])
+        nuevo.register_message_handler(comando_projecao, commands=['projecao'])
+        nuevo.register_message_handler(registro_rapido, func=lambda m: bool(m.text) and REGEX_MONTO.match(m.text) is not None)
+        nuevo.register_callback_query_handler(callback_handler, func=lambda call: True)
+        bot = nuevo
+        return bot
+
+def iniciar_bot():
+    crear_bot()
+    # Lo que quedó en la cola de escritura (reinicio, Sheets caído) se reenvía ya
+    obtener_vaciador().arrancar()
+    # Supervisor: si el poller se cae, se registra y se relanza con backoff
+    espera = 5
+    while True:
+        try:
+            print("🤖 Bot iniciado...")
+            bot.infinity_polling(timeout=20, long_polling_timeout=20)
+        except Exception as e:
+            print(f"⚠️ Poller del bot caído: {e}")
+        motor.reinicios_poller += 1
+        METRICAS.contar("bot.reinicios_poller")
+        print(f"🔁 Reiniciando poller en {espera}s")
+        time.sleep(espera)
+        espera = min(espera * 2, 300)
+
+def arrancar_en_hilo():
+    """Arranca el poller en un hilo daemon (una sola vez por proceso). El token se valida
+    antes, en quien llama (ValueError)."""
+    crear_bot()
+    if not any(t.name == "ThreadBotTelegram" for t in threading.enumerate()):
+        t = threading.Thread(target=iniciar_bot, name="ThreadBotTelegram", daemon=True)
+        t.start()
+
+if __name__ == "__main__":
+    error = asegurar_credenciales(os.environ)
+    if error: raise SystemExit(error)
+    try: crear_bot()
+    except ValueError as e: raise SystemExit(str(e))
+    iniciar_bot()
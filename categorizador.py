@@ -0,0 +1,181 @@
+"""Categorización automática: índice de palabras (trie) aprendido de Registros.
+
+Cada palabra normalizada de las descripciones ya registradas vota por su Categoria,
+Banco y Quem. El trie guarda los votos de la palabra exacta y también los de cada
+prefijo (desde MIN_PREFIJO letras), así 'mercadinho' cae en lo aprendido de 'mercado'.
+Buscar cuesta O(largo del texto), no un recorrido del histórico. El índice se arma
+una vez y solo suma las filas nuevas del espejo (como CacheReporte).
+
+Lo usan el bot (mensaje único "50,00 mercado nubank") y el importador de extratos.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import pandas as pd
+
+from metricas import METRICAS
+from nucleo import (
+    TAB_REGISTROS, instancia_unica, obtener_espejos, limpiar_numero, hogar_actual,
+)
+
+MIN_PREFIJO = 3 # letras mínimas para aceptar un prefijo como coincidencia
+PROPORCION_PREFIJO = 0.6 # ...y al menos esta fracción de la palabra buscada ('estranha' no es 'estacionamento')
+UMBRAL_CONFIANZA = 0.6 # fracción de votos del ganador para devolver una sugerencia
+MIN_VOTOS = 2
+CAMPOS = ('Categoria', 'Banco', 'Quem')
+
+# Punto de partida antes de que haya histórico (pesan como dos registros)
+PALABRAS_CLAVE = {
+    'Alimentação': ['mercado', 'supermercado', 'padaria', 'ifood', 'restaurante', 'lanchonete', 'acougue',
+                    'hortifruti', 'pizzaria', 'feira', 'atacadao', 'assai', 'carrefour'],
+    'Transporte': ['uber', 'posto', 'gasolina', 'combustivel', 'estacionamento', 'onibus', 'metro', 'pedagio', 'taxi'],
+    'Lazer': ['cinema', 'netflix', 'spotify', 'bar', 'show', 'viagem', 'hotel', 'ingresso'],
+    'Casa': ['aluguel', 'condominio', 'luz', 'energia', 'agua', 'gas', 'internet', 'moveis', 'reforma'],
+    'Serviços': ['assinatura', 'telefone', 'celular', 'manutencao', 'lavanderia', 'cabeleireiro'],
+    'Saúde': ['farmacia', 'drogaria', 'drogasil', 'medico', 'hospital', 'dentista', 'exame', 'consulta'],
+    'Educação': ['escola', 'curso', 'livro', 'livraria', 'faculdade', 'mensalidade'],
+    'Pets': ['petshop', 'pet', 'veterinario', 'racao'],
+}
+PALABRAS_VACIAS = {'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na', 'com', 'para', 'pra', 'o', 'a',
+                   'compra', 'pagamento', 'parcela', 'parc', 'enviado', 'recebido', 'debito', 'credito'}
+
+REGEX_MONTO = re.compile(r'^\s*(?:r\$\s*)?(\d[\d.]*(?:,\d{1,2})?)(?=\s|$)', re.I)
+REGEX_CUOTAS = re.compile(r'\b(\d{1,2})\s*x\b', re.I)
+
+def normalizar(texto):
+    """Minúsculas, sin acentos ni signos; los números y '(1/3)' se descartan."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode().lower()
+    return re.sub(r'[^a-z ]+', ' ', texto)
+
+def palabras(texto):
+    return [p for p in normalizar(texto).split() if len(p) > 1 and p not in PALABRAS_VACIAS]
+
+class IndiceCategorias:
+    """Trie de letras. Cada nodo: {letra: hijo, '#': votos del prefijo, '$': votos de la
+    palabra exacta}; votos = {campo: Counter(valor -> peso)}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hogar = hogar_actual() # hay un índice por hogar (instancia_unica)
+        self._n_filas = 0
+        self._generacion = None
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._raiz = {}
+        # Nombres de bancos, personas y categorías escritos en el mensaje mandan sobre lo aprendido
+        self._nombres = {normalizar(v).strip(): (c, v) for c, valores in (
+            ('Banco', self._hogar.bancos + ['PIX']), ('Quem', self._hogar.personas),
+            ('Categoria', self._hogar.categorias)) for v in valores}
+        for categoria, claves in PALABRAS_CLAVE.items():
+            for clave in claves: self._insertar(clave, {'Categoria': categoria}, 2)
+
+    def _insertar(self, palabra, valores, peso):
+        nodo = self._raiz
+        for i, letra in enumerate(palabra, 1):
+            nodo = nodo.setdefault(letra, {})
+            if i >= MIN_PREFIJO: self._votar(nodo.setdefault('#', {}), valores, peso)
+        self._votar(nodo.setdefault('$', {}), valores, peso)
+
+    @staticmethod
+    def _votar(votos, valores, peso):
+        for campo, valor in valores.items():
+            if valor: votos.setdefault(campo, Counter())[valor] += peso
+
+    def aprender(self, descripcion, peso=1, **valores):
+        """Suma los votos de una descripción (Categoria=..., Banco=..., Quem=...)."""
+        if valores.get('Categoria') == 'Outros': valores = dict(valores, Categoria=None) # no dice nada
+        with self._lock:
+            for palabra in set(palabras(descripcion)): self._insertar(palabra, valores, peso)
+
+    def sincronizar(self):
+        """Aprende las filas nuevas de la copia local de Registros; si se reconstruyó, rehace
+        todo. No consulta la hoja: el espejo lo ponen al día el reporte, el dashboard y la
+        cola del bot (salvo que todavía no haya copia local)."""
+        espejo = obtener_espejos()[TAB_REGISTROS]
+        df, generacion = espejo.instantanea(sincronizar=False)
+        if len(df.columns) == 0: df, generacion = espejo.instantanea()
+        with self._lock:
+            if generacion != self._generacion or len(df) < self._n_filas:
+                self._reiniciar()
+                self._n_filas, self._generacion = 0, generacion
+            nuevas = df.iloc[self._n_filas:]
+            self._n_filas = len(df)
+        if nuevas.empty or 'Descricao' not in nuevas.columns: return
+        with METRICAS.medir("categorizador.aprender"):
+            columnas = ['Descricao'] + [c for c in CAMPOS if c in nuevas.columns]
+            # Las combinaciones se repiten mucho: cada una se inserta una vez con su cantidad como peso
+            combinaciones = nuevas[columnas].apply(lambda s: s.astype(str).str.strip()).value_counts()
+            for clave, peso in combinaciones.items():
+                self.aprender(clave[0], int(peso), **dict(zip(columnas[1:], clave[1:])))
+
+    def sin_nombres(self, texto):
+        """El texto sin las palabras que son nombres de banco, persona o categoría (ya van en su campo)."""
+        return " ".join(p for p in texto.split() if normalizar(p).strip() not in self._nombres)
+
+    def sugerir(self, texto):
+        """{campo: valor} con lo que se puede deducir del texto (campos sin certeza no aparecen)."""
+        votos = {c: Counter() for c in CAMPOS}
+        explicitos = {}
+        with self._lock:
+            for palabra in normalizar(texto).split():
+                if palabra in self._nombres:
+                    campo, valor = self._nombres[palabra]
+                    explicitos.setdefault(campo, valor)
+                    continue
+                if len(palabra) < 2 or palabra in PALABRAS_VACIAS: continue
+                nodo, profundidad = self._raiz, 0
+                for letra in palabra:
+                    if letra not in nodo: break
+                    nodo, profundidad = nodo[letra], profundidad + 1
+                # Palabra exacta pesa el doble que un prefijo compartido
+                if profundidad == len(palabra) and '$' in nodo: encontrados, factor = nodo['$'], 2
+                elif profundidad >= max(MIN_PREFIJO, PROPORCION_PREFIJO * len(palabra)): encontrados, factor = nodo['#'], 1
+                else: continue
+                for campo, contador in encontrados.items():
+                    for valor, peso in contador.items(): votos[campo][valor] += peso * factor
+        sugerencia = dict(explicitos)
+        for campo, contador in votos.items():
+            if campo in sugerencia or not contador: continue
+            valor, peso = contador.most_common(1)[0]
+            total = sum(contador.values())
+            if peso / total >= UMBRAL_CONFIANZA and peso >= MIN_VOTOS: sugerencia[campo] = valor
+        return sugerencia
+
+    def categorizar(self, descripciones, defecto="Outros"):
+        """Serie de descripciones -> Serie de categorías (cada descripción distinta se busca una vez)."""
+        descripciones = pd.Series(descripciones)
+        codigos, unicas = pd.factorize(descripciones.astype(str))
+        categorias = [self.sugerir(d).get('Categoria', defecto) for d in unicas]
+        return pd.Series([categorias[c] for c in codigos], index=descripciones.index, dtype=object)
+
+def obtener_categorizador():
+    indice = instancia_unica('categorizador', IndiceCategorias)
+    indice.sincronizar()
+    return indice
+
+def interpretar_mensaje(texto):
+    """'50,00 mercado nubank' -> {'monto', 'cuotas', 'tipo', 'descripcion', 'categoria', 'banco', 'quien'}.
+    Devuelve None si el texto no empieza con un monto; los campos no deducidos van en None."""
+    m = REGEX_MONTO.match(texto or "")
+    if not m: return None
+    monto = limpiar_numero(m.group(1))
+    if monto <= 0: return None
+    resto = texto[m.end():]
+    c = REGEX_CUOTAS.search(resto)
+    cuotas = max(int(c.group(1)), 1) if c else 1 # sin 'Nx' es à vista
+    if c: resto = resto[:c.start()] + resto[c.end():]
+    indice = obtener_categorizador()
+    sugerencia = indice.sugerir(resto)
+    banco = sugerencia.get('Banco')
+    return {
+        'monto': monto,
+        'cuotas': 1 if banco == 'PIX' else cuotas,
+        'tipo': 'pix' if banco == 'PIX' else ('parcelado' if cuotas > 1 else 'avista'),
+        'descripcion': indice.sin_nombres(resto).capitalize() or None,
+        'categoria': sugerencia.get('Categoria'),
+        'banco': banco,
+        'quien': sugerencia.get('Quem'),
+    }
@@ -0,0 +1,235 @@
+"""Cola de escritura (write-ahead) de los gastos del bot.
+
+Cada gasto confirmado se guarda primero en SQLite (.estado/cola_escritura.sqlite) con
+un ID propio, y recién entonces se responde al usuario: el "Salvo" es inmediato y no
+depende de Sheets. Un vaciador en segundo plano junta lo pendiente de cada hogar en
+pocos append_rows; si Sheets está lento, sin cuota o caído, reintenta con backoff, y lo
+pendiente sobrevive a reinicios (se reenvía al arrancar).
+
+Cada fila lleva el ID de su gasto en la columna 'ID' de Registros (se agrega a la
+cabecera la primera vez). Antes de reintentar un lote que ya se intentó se mira la
+hoja: los gastos cuyo ID ya está (escritura que llegó pero cuya respuesta se perdió,
+proceso caído a mitad) se dan por escritos, así el reintento nunca duplica filas.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from graficos import obtener_graficos
+from metricas import METRICAS
+from nucleo import (
+    TAB_REGISTROS, CARPETA_ESTADO, COLUMNAS_REGISTROS, COLUMNA_ID, MAPA_COLUMNAS,
+    instancia_unica, hogar_actual, usar_hogar, obtener_espejos, obtener_cache_reporte,
+    conectar_sheet_bot, escribir_filas_lote, bloqueo_registros,
+)
+
+MAX_FILAS_LOTE = 500 # filas por append_rows al vaciar
+PAUSA_AGRUPAR = 0.5 # segundos tras un aviso, para juntar gastos que llegan seguidos
+INTERVALO_REINTENTO = 15 # segundos hasta el primer reintento de un hogar con error (se duplica)
+MAX_INTERVALO_REINTENTO = 300
+N_HILOS_VACIADO = 2 # hogares que se vacían a la vez (uno con la hoja caída no frena a otro)
+
+def nuevo_id():
+    return uuid.uuid4().hex[:12]
+
+class ColaEscrituras:
+    """Gastos pendientes (sus filas de Registros) por hogar, en SQLite. Cada commit es
+    durable antes de responder al usuario."""
+
+    def __init__(self, ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS pendientes (id TEXT PRIMARY KEY, hogar TEXT, "
+                         "chat_id INTEGER, filas TEXT, creado REAL, intentos INTEGER DEFAULT 0, error TEXT)")
+        self._db.commit()
+
+    def encolar(self, gasto_id, hogar, chat_id, filas):
+        """Guarda el gasto; el mismo ID dos veces no crea dos entradas."""
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO pendientes (id, hogar, chat_id, filas, creado) VALUES (?, ?, ?, ?, ?)",
+                             (gasto_id, hogar, chat_id, json.dumps(filas), time.time()))
+            self._db.commit()
+
+    def lote(self, hogar, max_filas=MAX_FILAS_LOTE):
+        """Gastos más antiguos del hogar hasta juntar max_filas filas (al menos uno)."""
+        with self._lock:
+            cursor = self._db.execute("SELECT id, filas, intentos FROM pendientes WHERE hogar = ? ORDER BY creado", (hogar,))
+            lote, n = [], 0
+            for gasto_id, filas, intentos in cursor:
+                filas = json.loads(filas)
+                if lote and n + len(filas) > max_filas: break
+                lote.append({'id': gasto_id, 'filas': filas, 'intentos': intentos})
+                n += len(filas)
+            return lote
+
+    def marcar_intento(self, ids, error=None):
+        with self._lock:
+            self._db.executemany("UPDATE pendientes SET intentos = intentos + 1, error = ? WHERE id = ?",
+                                 [(error, i) for i in ids])
+            self._db.commit()
+
+    def anotar_error(self, ids, error):
+        with self._lock:
+            self._db.executemany("UPDATE pendientes SET error = ? WHERE id = ?", [(error, i) for i in ids])
+            self._db.commit()
+
+    def quitar(self, ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM pendientes WHERE id = ?", [(i,) for i in ids])
+            self._db.commit()
+
+    def pendientes(self):
+        """{hogar: gastos pendientes}"""
+        with self._lock:
+            return dict(self._db.execute("SELECT hogar, COUNT(*) FROM pendientes GROUP BY hogar").fetchall())
+
+    def resumen(self, hogar=None):
+        """Pendientes, filas, antigüedad y último error; de todos los hogares o solo de 'hogar'."""
+        filtro, args = ("WHERE hogar = ?", (hogar,)) if hogar is not None else ("WHERE 1", ())
+        with self._lock:
+            n, filas, viejo = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(json_array_length(filas)), 0), MIN(creado) FROM pendientes {filtro}",
+                args).fetchone()
+            ultimo_error = self._db.execute(
+                f"SELECT error FROM pendientes {filtro} AND error IS NOT NULL ORDER BY creado DESC LIMIT 1",
+                args).fetchone()
+        return {'gastos': n, 'filas': filas, 'mas_antiguo_s': round(time.time() - viejo) if viejo else 0,
+                'ultimo_error': ultimo_error[0] if ultimo_error else None}
+
+def obtener_cola():
+    # Global: cada entrada lleva su hogar
+    return instancia_unica('cola_escritura', lambda: ColaEscrituras(
+        os.path.join(CARPETA_ESTADO, "cola_escritura.sqlite")), por_hogar=False)
+
+# --- Vaciado a Sheets ---
+def _asegurar_columna_id(ws, espejo):
+    """Cabecera de Registros con la columna ID (se agrega al final la primera vez; una
+    pestaña vacía recibe la cabecera completa)."""
+    cabecera = list(espejo.datos().columns)
+    if COLUMNA_ID in cabecera: return cabecera
+    with METRICAS.medir("sheets.update"):
+        ws.update(values=[(cabecera or COLUMNAS_REGISTROS) + [COLUMNA_ID]], range_name="A1")
+    espejo.sincronizar(forzar=True)
+    return list(espejo.datos().columns)
+
+def _alinear(fila, gasto_id, cabecera):
+    # Las filas de la cola van en el orden de COLUMNAS_REGISTROS; la hoja manda el suyo,
+    # con sus nombres viejos ('Monto', 'Quien', 'Descripcion', ...)
+    valores = dict(zip(COLUMNAS_REGISTROS, fila), **{COLUMNA_ID: gasto_id})
+    return [valores.get(MAPA_COLUMNAS.get(c, c), '') for c in cabecera]
+
+@METRICAS.medir("cola.vaciar_hogar")
+def vaciar_hogar(cola):
+    """Escribe en Sheets lo pendiente del hogar activo, por lotes. Devuelve las filas
+    escritas; si Sheets falla, lo que no se escribió sigue en la cola y se relanza el error."""
+    hogar = hogar_actual().id
+    espejo = obtener_espejos()[TAB_REGISTROS]
+    escritas = 0
+    while True:
+        with bloqueo_registros(): # si archivo.py está reescribiendo Registros, espera
+            n = _escribir_lote(cola, hogar, espejo)
+        if n is None: return escritas
+        if n:
+            escritas += n
+            obtener_cache_reporte().sincronizar() # suma las cuotas nuevas a los totales del mes
+            obtener_graficos().pregenerar() # el próximo reporte ya encuentra el PNG dibujado
+
+def _escribir_lote(cola, hogar, espejo):
+    """Escribe el lote más antiguo del hogar. Devuelve las filas escritas (0 si ya estaban
+    en la hoja) o None si no queda nada. Si falla, el error queda anotado en sus gastos."""
+    lote = cola.lote(hogar)
+    if not lote: return None
+    ids = [g['id'] for g in lote]
+    try:
+        if any(g['intentos'] for g in lote):
+            # Un intento anterior pudo llegar a la hoja sin que nos enteráramos
+            espejo.sincronizar(inmediato=True)
+            df = espejo.datos()
+            en_hoja = set(df[COLUMNA_ID]) if COLUMNA_ID in df.columns else set()
+            ya_escritos = [i for i in ids if i in en_hoja]
+            if ya_escritos:
+                cola.quitar(ya_escritos)
+                METRICAS.contar("cola.ya_escritos", len(ya_escritos))
+                return 0
+        ws = conectar_sheet_bot(TAB_REGISTROS)
+        cabecera = _asegurar_columna_id(ws, espejo)
+        filas = [_alinear(f, g['id'], cabecera) for g in lote for f in g['filas']]
+        cola.marcar_intento(ids) # antes de escribir: si el proceso cae aquí, el reintento mira la hoja
+        marca = espejo.marca_remota()
+        respuesta = escribir_filas_lote(ws, filas)
+    except Exception as e:
+        cola.anotar_error(ids, str(e)[:300])
+        raise
+    cola.quitar(ids)
+    espejo.registrar_escritura(filas, respuesta, marca)
+    METRICAS.contar("cola.filas_escritas", len(filas))
+    return len(filas)
+
+class Vaciador:
+    """Hilo que vacía la cola cuando llega un gasto (avisar) y, si hay errores, cada
+    INTERVALO_REINTENTO segundos con backoff por hogar. Cada hogar se vacía en su
+    propia tarea del pool, una a la vez por hogar."""
+
+    def __init__(self, cola, n_hilos=N_HILOS_VACIADO):
+        self.cola = cola
+        self._aviso = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=n_hilos, thread_name_prefix="VaciadorCola")
+        self._en_curso = set()
+        self._espera = {} # hogar -> (instante del próximo intento, intervalo actual)
+        self._hilo = None
+
+    def arrancar(self):
+        """Arranca el hilo (una vez); lo que quedó pendiente de antes se reenvía enseguida."""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="VaciadorCola", daemon=True)
+                self._hilo.start()
+        self.avisar()
+
+    def avisar(self):
+        self._aviso.set()
+
+    def con_error(self, hogar):
+        with self._lock:
+            return hogar in self._espera
+
+    def _bucle(self):
+        while True:
+            self._aviso.wait(timeout=INTERVALO_REINTENTO)
+            self._aviso.clear()
+            time.sleep(PAUSA_AGRUPAR)
+            try:
+                self.vaciar()
+            except Exception as e:
+                print(f"⚠️ Vaciador de la cola: {e}")
+
+    def vaciar(self):
+        ahora = time.time()
+        for hogar in self.cola.pendientes():
+            with self._lock:
+                if hogar in self._en_curso or ahora < self._espera.get(hogar, (0, 0))[0]: continue
+                self._en_curso.add(hogar)
+            self._pool.submit(self._vaciar_hogar, hogar)
+
+    def _vaciar_hogar(self, hogar):
+        try:
+            with usar_hogar(hogar):
+                vaciar_hogar(self.cola)
+            with self._lock: self._espera.pop(hogar, None)
+        except Exception as e:
+            METRICAS.contar("cola.errores")
+            with self._lock:
+                intervalo = min(self._espera.get(hogar, (0, INTERVALO_REINTENTO / 2))[1] * 2, MAX_INTERVALO_REINTENTO)
+                self._espera[hogar] = (time.time() + intervalo, intervalo)
+            print(f"⚠️ Cola de '{hogar}' sin vaciar, reintento en {intervalo:.0f}s: {e}")
+        finally:
+            with self._lock: self._en_curso.discard(hogar)
+
+def obtener_vaciador():
+    return instancia_unica('vaciador_cola', lambda: Vaciador(obtener_cola()), por_hogar=False)
@@ -0,0 +1,164 @@
+"""Gráficos del reporte del bot en PNG: barras Gasto vs Orçamento del mes y torta de
+las faturas abiertas (los mismos del dashboard), dibujados con matplotlib.
+
+matplotlib corre en un proceso aparte (un solo trabajador, backend Agg): dibujar no
+frena los hilos del bot ni del dashboard, y su memoria queda fuera del proceso web.
+Cada PNG se guarda por (hogar, mes, versión de los datos) en un LRU; tras el primer envío
+se guarda también el file_id de Telegram y los siguientes envíos solo lo reenvían.
+Cuando los datos cambian (el bot guarda un gasto, el dashboard carga una versión
+nueva) se llama a pregenerar(), así el reporte casi siempre encuentra el PNG hecho.
+"""
+import io
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from metricas import METRICAS
+from nucleo import (
+    COLOR_MAP_BANCOS, COLOR_DEFAULT,
+    instancia_unica, obtener_cache_reporte, version_datos, indice_de_fecha, indice_a_mes, hogar_actual,
+)
+
+MAX_GRAFICOS = 32 # PNGs en memoria entre todos los hogares (~50 KB cada uno)
+TIEMPO_MAX_GRAFICO = 30 # segundos que el reporte espera al trabajador (el primero arranca matplotlib)
+
+# --- Dibujo (corre en el proceso trabajador) ---
+def _iniciar_trabajador():
+    import matplotlib
+    matplotlib.use("Agg") # sin pantalla: solo PNG
+
+def dibujar_reporte(datos):
+    """{'mes', 'gastos', 'limites', 'faturas', 'colores'} -> PNG (bytes).
+    Solo recibe dicts simples: no lee Sheets ni toca estado del proceso principal."""
+    import matplotlib.pyplot as plt
+
+    gastos, limites, faturas = datos['gastos'], datos['limites'], datos['faturas']
+    categorias = sorted(set(gastos) | set(limites), key=lambda c: (limites.get(c, 0.0), gastos.get(c, 0.0)))
+    categorias = [c for c in categorias if gastos.get(c, 0.0) or limites.get(c, 0.0)]
+    anchos = [3, 2] if faturas else [1]
+    fig, ejes = plt.subplots(1, len(anchos), figsize=(11 if faturas else 7, 5), gridspec_kw={'width_ratios': anchos})
+    ejes = list(ejes) if faturas else [ejes]
+
+    # Barras apiladas como en el dashboard: gasto en rojo, lo que queda del orçamento en verde
+    ax = ejes[0]
+    gasto = [gastos.get(c, 0.0) for c in categorias]
+    disponible = [max(limites.get(c, 0.0) - g, 0.0) for c, g in zip(categorias, gasto)]
+    ax.barh(categorias, gasto, color='#ff4b4b', label='Gasto')
+    ax.barh(categorias, disponible, left=gasto, color='#3dd56d', label='Disponível')
+    ax.set_title(f"Gastos vs Orçamento ({datos['mes']})")
+    ax.xaxis.set_major_formatter(lambda x, _: f"R$ {x:,.0f}")
+    ax.legend(loc='lower right')
+    ax.spines[['top', 'right']].set_visible(False)
+
+    if faturas:
+        ax = ejes[1]
+        bancos, valores = list(faturas), list(faturas.values())
+        total = sum(valores)
+        ax.pie(valores, labels=bancos, colors=[datos['colores'].get(b, COLOR_DEFAULT) for b in bancos],
+               autopct=lambda p: f"R$ {p * total / 100:,.0f}", pctdistance=0.8, wedgeprops={'width': 0.6})
+        ax.set_title("Faturas Abertas")
+
+    fig.tight_layout()
+    salida = io.BytesIO()
+    fig.savefig(salida, format='png', dpi=100)
+    plt.close(fig)
+    return salida.getvalue()
+
+# --- Caché de PNGs ---
+def datos_reporte(mes):
+    """Lo que necesita dibujar_reporte, sacado de los totales del reporte del bot."""
+    reporte = obtener_cache_reporte()
+    gastos, limites, _ = reporte.reporte(mes)
+    faturas = reporte.faturas_abiertas(datetime.now()) if mes == indice_de_fecha(datetime.now()) else {}
+    return {'mes': indice_a_mes(mes), 'gastos': gastos, 'limites': limites, 'faturas': faturas,
+            'colores': {b: COLOR_MAP_BANCOS.get(str(b).lower(), COLOR_DEFAULT) for b in faturas}}
+
+class CacheGraficos:
+    """LRU (hogar, mes, versión) -> {'png': bytes, 'file_id': str|None}. Un mismo gráfico
+    pedido varias veces mientras se dibuja espera al mismo Future. Todos los hogares
+    comparten el trabajador; el hogar de cada pedido es el del contexto actual."""
+
+    def __init__(self, maximo=MAX_GRAFICOS):
+        self._lock = threading.Lock()
+        self._maximo = maximo
+        self._pngs = OrderedDict()
+        self._en_curso = {} # (hogar, mes, versión) -> Future con los bytes del PNG
+        self._pool = None
+
+    def _trabajador(self):
+        # spawn y no fork: el proceso principal tiene hilos (bot, Streamlit)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_iniciar_trabajador)
+        return self._pool
+
+    def _guardar(self, clave, png):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+            if clave not in self._pngs: self._pngs[clave] = {'png': png, 'file_id': None}
+            self._pngs.move_to_end(clave)
+            while len(self._pngs) > self._maximo: self._pngs.popitem(last=False)
+            return self._pngs[clave]
+
+    def _terminado(self, clave, futuro, inicio):
+        if futuro.exception() is not None:
+            METRICAS.contar("graficos.errores")
+            with self._lock:
+                self._en_curso.pop(clave, None)
+                if isinstance(futuro.exception(), BrokenProcessPool): self._pool = None # se recrea al próximo pedido
+            return
+        METRICAS.observar("graficos.dibujar", time.perf_counter() - inicio)
+        self._guardar(clave, futuro.result())
+
+    def pedir(self, mes, version=None):
+        """Future con la entrada {'png', 'file_id'}: ya resuelto si está en caché."""
+        clave = (hogar_actual().id, mes, version_datos() if version is None else version)
+        with self._lock:
+            if clave in self._pngs:
+                self._pngs.move_to_end(clave)
+                METRICAS.contar("graficos.cache_aciertos")
+                listo = Future()
+                listo.set_result(self._pngs[clave])
+                return listo
+            futuro = self._en_curso.get(clave)
+        if futuro is None:
+            datos = datos_reporte(mes) # fuera del lock: puede sincronizar con Sheets
+            with self._lock:
+                futuro = self._en_curso.get(clave)
+                if futuro is None:
+                    try:
+                        futuro = self._trabajador().submit(dibujar_reporte, datos)
+                    except BrokenProcessPool: # el trabajador murió: uno nuevo
+                        self._pool = None
+                        futuro = self._trabajador().submit(dibujar_reporte, datos)
+                    self._en_curso[clave] = futuro
+                    futuro.add_done_callback(lambda f, inicio=time.perf_counter(): self._terminado(clave, f, inicio))
+        entrada = Future()
+        # El callback de 'futuro' puede correr después de despertar a quien espera: la entrada se arma aquí
+        futuro.add_done_callback(lambda f: entrada.set_exception(f.exception()) if f.exception() is not None
+                                 else entrada.set_result(self._guardar(clave, f.result())))
+        return entrada
+
+    def obtener(self, mes, version=None, timeout=TIEMPO_MAX_GRAFICO):
+        """{'png', 'file_id'} del gráfico del mes (lo dibuja si falta)."""
+        return self.pedir(mes, version).result(timeout=timeout)
+
+    def pregenerar(self, version=None):
+        """Encola el gráfico del mes actual para la versión de datos vigente (sin esperar)."""
+        try:
+            self.pedir(indice_de_fecha(datetime.now()), version)
+        except Exception as e:
+            METRICAS.contar("graficos.errores")
+            print(f"⚠️ No se pudo pregenerar el gráfico: {e}")
+
+    def registrar_file_id(self, mes, version, file_id):
+        with self._lock:
+            entrada = self._pngs.get((hogar_actual().id, mes, version))
+            if entrada is not None: entrada['file_id'] = file_id
+
+def obtener_graficos():
+    return instancia_unica('graficos', CacheGraficos, por_hogar=False)
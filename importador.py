@@ -0,0 +1,312 @@
+"""Importación masiva de extratos (CSV u OFX) de Nubank, Inter, BB y Bradesco a Registros.
+
+El archivo se lee por bloques: cada bloque se normaliza a las columnas de Registros,
+se descartan las filas que ya existen (índice de hashes) y lo nuevo se escribe en
+lotes de append_rows con pausa entre lotes, para no agotar la cuota de Sheets.
+
+Uso:
+    python importador.py extrato.csv --banco Nubank --quem Carlos
+    python importador.py extrato.ofx --banco BB --quem Jessy --simular
+    python importador.py extrato.csv --banco Inter --quem Ana --hogar silva
+Sin --categoria, cada fila toma la que sugiere categorizador.py por su descripción.
+En el dashboard: página "importar".
+"""
+import argparse
+import codecs
+import csv
+import io
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from categorizador import obtener_categorizador
+from metricas import METRICAS
+from nucleo import (
+    TAB_REGISTROS, COLUMNAS_REGISTROS,
+    asegurar_credenciales, fijar_hogar, obtener_espejos, obtener_cache_reporte, conectar_sheet_bot,
+    escribir_filas_lote, parsear_montos, indices_primer_pago, indices_a_mes_ref, filas_para_sheets,
+    bloqueo_registros,
+)
+
+TAMANO_BLOQUE = 5000 # filas del archivo en memoria a la vez
+TAMANO_LOTE = 500 # filas por append_rows
+PAUSA_ENTRE_LOTES = 1.0 # segundos; la API permite ~60 escrituras por minuto
+
+# --- Lectura del Archivo ---
+def _abrir_texto(origen):
+    """Ruta, bytes o archivo binario (st.file_uploader) -> texto. Los extratos de BB y
+    Bradesco suelen venir en latin-1; se prueba UTF-8 con los primeros 64 KB."""
+    if isinstance(origen, (bytes, bytearray)): origen = io.BytesIO(origen)
+    binario = open(origen, "rb") if isinstance(origen, (str, os.PathLike)) else origen
+    muestra = binario.read(65536)
+    binario.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8-sig")().decode(muestra) # final=False: tolera un corte a mitad de carácter
+        codificacion = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacion = "latin-1"
+    return io.TextIOWrapper(binario, encoding=codificacion, newline="")
+
+def _normalizar(texto):
+    sin_acentos = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return sin_acentos.strip().lower()
+
+def _detectar_columnas(cabecera):
+    """Nombres de columna -> {'fecha', 'descripcion', 'valor'} o {'debito', 'credito'}."""
+    columnas, libres = {}, list(cabecera)
+    def tomar(rol, condicion):
+        for c in libres:
+            if condicion(_normalizar(c)):
+                columnas[rol] = c
+                libres.remove(c)
+                return
+    tomar('fecha', lambda n: n.startswith('data') or n == 'date')
+    tomar('valor', lambda n: ('valor' in n or n == 'amount') and 'saldo' not in n)
+    tomar('debito', lambda n: n.startswith('debito'))
+    tomar('credito', lambda n: n.startswith('credito'))
+    tomar('descripcion', lambda n: any(p in n for p in ('descri', 'title', 'histor', 'lancamento', 'detalhe', 'estabelecimento')))
+    if 'fecha' not in columnas or not ('valor' in columnas or 'debito' in columnas):
+        raise ValueError(f"Formato de extrato não reconhecido (colunas: {', '.join(cabecera)})")
+    return columnas
+
+def _leer_csv(texto, tamano_bloque):
+    # Algunos bancos (Bradesco, BB) ponen líneas de título antes de la cabecera
+    lineas = [texto.readline() for _ in range(30)]
+    for i, linea in enumerate(lineas):
+        try: dialecto = csv.Sniffer().sniff(linea, delimiters=",;\t")
+        except csv.Error: continue
+        cabecera = next(csv.reader([linea], dialecto))
+        try: columnas = _detectar_columnas(cabecera)
+        except ValueError: continue
+        break
+    else:
+        raise ValueError("Cabeçalho do CSV não encontrado")
+
+    resto = io.StringIO("".join(lineas[i + 1:]))
+    for origen in (resto, texto):
+        for bloque in pd.read_csv(origen, sep=dialecto.delimiter, names=cabecera, header=None, dtype=str,
+                                  keep_default_na=False, chunksize=tamano_bloque, on_bad_lines='skip'):
+            if 'valor' in columnas:
+                montos, _ = parsear_montos(bloque[columnas['valor']].str.replace(r'\s', '', regex=True))
+            else:
+                debito, _ = parsear_montos(bloque[columnas['debito']].str.replace(r'\s', '', regex=True))
+                credito, _ = parsear_montos(bloque[columnas['credito']].str.replace(r'\s', '', regex=True)) if 'credito' in columnas else (0.0, 0)
+                montos = credito - debito.abs()
+            df = pd.DataFrame({
+                'Fecha': bloque[columnas['fecha']],
+                'Descricao': bloque[columnas['descripcion']] if 'descripcion' in columnas else '',
+                'Monto': montos.fillna(0.0),
+            })
+            # Con columnas Débito/Crédito es extrato de cuenta; con una sola columna de valor
+            # no se sabe (tarjeta: compras positivas; cuenta: negativas) y decide importar()
+            df.attrs['tarjeta'] = None if 'valor' in columnas else False
+            yield df
+
+def _leer_ofx(texto, tamano_bloque):
+    """Transacciones <STMTTRN> de un OFX (SGML o XML), leyendo el archivo por trozos."""
+    campo = lambda tag, trn: (re.search(rf'<{tag}>([^<\r\n]*)', trn, re.I) or [None, ''])[1].strip()
+    resto, bloque, tarjeta = "", [], False
+    while True:
+        trozo = texto.read(65536)
+        resto += trozo
+        tarjeta = tarjeta or 'CREDITCARDMSGSRSV1' in resto.upper()
+        partes = re.split(r'</STMTTRN>', resto, flags=re.I)
+        resto = partes.pop() # lo que queda sin cerrar sigue en el buffer
+        for trn in partes:
+            trn = trn[trn.upper().rfind('<STMTTRN>'):]
+            bloque.append({
+                'Fecha': campo('DTPOSTED', trn)[:8],
+                'Descricao': campo('MEMO', trn) or campo('NAME', trn),
+                'Monto': campo('TRNAMT', trn),
+            })
+        if len(bloque) >= tamano_bloque or (not trozo and bloque):
+            df = pd.DataFrame(bloque)
+            df['Monto'] = parsear_montos(df['Monto'])[0].fillna(0.0)
+            df.attrs['tarjeta'] = tarjeta # en OFX los gastos son negativos también en tarjeta
+            yield df
+            bloque = []
+        if not trozo: return
+
+def _por_valor_unico(serie, funcion):
+    """Aplica 'funcion' (de Series a Series) a cada valor distinto una sola vez: en un
+    extrato las fechas, los comercios y los bancos se repiten mucho."""
+    codigos, unicos = pd.factorize(serie)
+    resultado = funcion(pd.Series(unicos, dtype=object))
+    return pd.Series(resultado.to_numpy()[codigos], index=serie.index).where(codigos >= 0)
+
+def _parsear_fechas(serie):
+    """Prueba los formatos de los bancos y se queda con el que reconoce más filas."""
+    def parsear(unicas):
+        mejor = None
+        for formato in ("%d/%m/%Y", "%Y-%m-%d", "%Y%m%d", "%d/%m/%y"):
+            fechas = pd.to_datetime(unicas.str.strip(), format=formato, errors='coerce')
+            if mejor is None or fechas.notna().sum() > mejor.notna().sum(): mejor = fechas
+        return mejor
+    return pd.to_datetime(_por_valor_unico(serie, parsear))
+
+def leer_extrato(origen, formato=None, tamano_bloque=TAMANO_BLOQUE):
+    """Genera bloques (Fecha, Descricao, Monto) del extrato; formato 'csv'/'ofx' o se deduce."""
+    texto = _abrir_texto(origen)
+    if formato is None:
+        nombre = getattr(origen, 'name', origen if isinstance(origen, str) else '')
+        inicio = texto.read(2048)
+        texto.seek(0)
+        formato = 'ofx' if str(nombre).lower().endswith('.ofx') or 'OFXHEADER' in inicio.upper() or '<OFX>' in inicio.upper() else 'csv'
+    lector = _leer_ofx if formato == 'ofx' else _leer_csv
+    for bloque in lector(texto, tamano_bloque):
+        bloque['Fecha'] = _parsear_fechas(bloque['Fecha'].astype(str))
+        yield bloque.dropna(subset=['Fecha']) # líneas de saldo, totales, rodapés
+
+# --- Normalización a Registros ---
+REGEX_PARCELA = re.compile(r'(?i)(?:parc(?:ela)?\.?\s*(\d{1,2})\s*(?:/|de)\s*(\d{1,2}))|(?:\b(\d{1,2})/(\d{1,2})\s*$)')
+
+def a_registros(bloque, banco, quien, categoria=None, tarjeta=False, gastos_positivos=False):
+    """Bloque del extrato -> filas de Registros (COLUMNAS_REGISTROS), solo los gastos.
+    En los CSV de tarjeta los gastos vienen positivos (los negativos son pagos y
+    estornos); en los de cuenta y en OFX, negativos. En tarjeta el Mes_Ref es el de la
+    fatura de esa parcela (día de corte como en el bot, más Parc_Atual - 1); en cuenta, el
+    mes del movimiento.
+    categoria=None: se deduce de cada descripción (categorizador)."""
+    montos = bloque['Monto'].to_numpy(dtype=float)
+    gastos = bloque[(montos > 0) if gastos_positivos else (montos < 0)]
+    if gastos.empty: return pd.DataFrame(columns=COLUMNAS_REGISTROS)
+
+    descripciones = gastos['Descricao'].astype(str).str.strip()
+    partes = descripciones.str.extract(REGEX_PARCELA).astype(float)
+    actual = partes[0].fillna(partes[2]).fillna(1).astype(int)
+    total = partes[1].fillna(partes[3]).fillna(1).astype(int)
+    valida = (actual >= 1) & (actual <= total) & (total <= 48)
+    actual, total = actual.where(valida, 1), total.where(valida, 1)
+
+    if not categoria: categoria = obtener_categorizador().categorizar(descripciones).to_numpy()
+    fechas = gastos['Fecha']
+    # La fecha es la de la compra: la parcela k cae k-1 faturas después de la primera
+    if tarjeta: meses = indices_primer_pago(fechas, pd.Series(banco, index=gastos.index)) + (actual.to_numpy() - 1)
+    else: meses = (fechas.dt.year * 12 + fechas.dt.month - 1).to_numpy()
+    return pd.DataFrame({
+        'Data': _por_valor_unico(fechas, lambda f: pd.to_datetime(f).dt.strftime("%d/%m/%Y")),
+        'Mes_Ref': indices_a_mes_ref(meses),
+        'Quem': quien,
+        'Tipo': np.where(tarjeta & (total > 1), "Credito", "Debito"),
+        'Banco': banco,
+        'Valor': np.round(np.abs(gastos['Monto'].to_numpy(dtype=float)), 2),
+        'Parc': total,
+        'Parc_Atual': actual,
+        'Categoria': categoria,
+        'Descricao': descripciones,
+    })[COLUMNAS_REGISTROS].reset_index(drop=True)
+
+# --- Índice de Duplicados ---
+class IndiceDuplicados:
+    """Hashes de (Data, Banco, Valor en centavos, Descricao) de las filas ya registradas.
+    Cada hash lleva el número de ocurrencia: dos cafés iguales el mismo día son dos filas,
+    pero importar dos veces el mismo extrato no duplica nada."""
+
+    def __init__(self, existentes):
+        base = self._base(existentes)
+        ocurrencia = pd.Series(base).groupby(base).cumcount().to_numpy() if len(base) else np.array([], dtype=np.int64)
+        self._existentes = np.unique(self._combinar(base, ocurrencia))
+        self._vistas = pd.Series(dtype=np.int64) # hash base -> ocurrencias ya vistas en el archivo importado
+
+    @staticmethod
+    def _base(df):
+        if df.empty or not set(['Data', 'Banco', 'Valor', 'Descricao']) <= set(df.columns):
+            return np.array([], dtype=np.uint64)
+        valores, _ = parsear_montos(df['Valor'])
+        return pd.util.hash_pandas_object(pd.DataFrame({
+            'd': _por_valor_unico(df['Data'], lambda s: s.astype(str).str.strip()),
+            'b': _por_valor_unico(df['Banco'], lambda s: s.astype(str).str.strip().str.lower()),
+            'v': np.rint(valores.fillna(0.0).to_numpy() * 100).astype(np.int64),
+            't': _por_valor_unico(df['Descricao'], lambda s: s.astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)),
+        }), index=False).to_numpy()
+
+    @staticmethod
+    def _combinar(base, ocurrencia):
+        return pd.util.hash_pandas_object(pd.DataFrame({'h': base, 'n': ocurrencia}), index=False).to_numpy()
+
+    def nuevas(self, registros):
+        """Máscara de las filas de 'registros' que no están registradas todavía."""
+        base = pd.Series(self._base(registros))
+        previas = base.map(self._vistas).fillna(0).to_numpy(dtype=np.int64)
+        ocurrencia = previas + base.groupby(base).cumcount().to_numpy()
+        self._vistas = self._vistas.add(base.value_counts(), fill_value=0).astype(np.int64)
+        claves = self._combinar(base.to_numpy(), ocurrencia)
+        # _existentes está ordenado (np.unique): búsqueda binaria en vez de np.isin
+        pos = np.searchsorted(self._existentes, claves).clip(max=max(len(self._existentes) - 1, 0))
+        return ~(self._existentes[pos] == claves) if len(self._existentes) else np.ones(len(claves), dtype=bool)
+
+# --- Importación ---
+def importar(origen, banco, quien, categoria=None, formato=None, simular=False,
+             tamano_lote=TAMANO_LOTE, progreso=None):
+    """Importa el extrato a Registros. Devuelve el resumen {'lidas', 'gastos',
+    'duplicadas', 'escritas', 'lotes'}; 'progreso(resumen)' se llama tras cada lote."""
+    espejo = obtener_espejos()[TAB_REGISTROS]
+    indice = IndiceDuplicados(espejo.datos())
+    resumen = {'lidas': 0, 'gastos': 0, 'duplicadas': 0, 'escritas': 0, 'lotes': 0}
+    pendientes, tarjeta, positivos, hoja = [], None, False, None
+
+    def escribir(filas):
+        nonlocal hoja
+        if not simular:
+            if resumen['lotes']: time.sleep(PAUSA_ENTRE_LOTES)
+            hoja = hoja or conectar_sheet_bot(TAB_REGISTROS)
+            with bloqueo_registros(): # no anexar mientras archivo.py reescribe Registros
+                marca = espejo.marca_remota()
+                respuesta = escribir_filas_lote(hoja, filas)
+                espejo.registrar_escritura(filas, respuesta, marca)
+        resumen['escritas'] += len(filas)
+        resumen['lotes'] += 1
+        if progreso: progreso(dict(resumen))
+
+    with METRICAS.medir("importador.importar"):
+        for bloque in leer_extrato(origen, formato):
+            resumen['lidas'] += len(bloque)
+            if tarjeta is None and len(bloque):
+                tarjeta = bloque.attrs.get('tarjeta')
+                # CSV con una sola columna de valor: es de tarjeta si la mayoría son positivos
+                positivos = tarjeta is None and bool((bloque['Monto'] > 0).mean() > 0.5)
+                tarjeta = positivos if tarjeta is None else tarjeta
+            registros = a_registros(bloque, banco, quien, categoria, bool(tarjeta), bool(positivos))
+            nuevas = indice.nuevas(registros)
+            resumen['gastos'] += len(registros)
+            resumen['duplicadas'] += int((~nuevas).sum())
+            pendientes.extend(filas_para_sheets(registros[nuevas]))
+            while len(pendientes) >= tamano_lote:
+                escribir(pendientes[:tamano_lote])
+                del pendientes[:tamano_lote]
+        if pendientes: escribir(pendientes)
+
+    if resumen['escritas'] and not simular:
+        METRICAS.contar("importador.filas_escritas", resumen['escritas'])
+        obtener_cache_reporte().sincronizar()
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo")
+    parser.add_argument("--banco", required=True)
+    parser.add_argument("--quem", required=True)
+    parser.add_argument("--hogar", help="familia de hogares.toml (por defecto la primera)")
+    parser.add_argument("--categoria", help="por defecto se deduce de la descripción")
+    parser.add_argument("--formato", choices=['csv', 'ofx'], help="por defecto se deduce del archivo")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="filas por append_rows")
+    parser.add_argument("--simular", action="store_true", help="no escribe: solo cuenta nuevas y duplicadas")
+    args = parser.parse_args()
+    hogar = fijar_hogar(args.hogar)
+    if hogar is None: parser.error(f"hogar desconocido: {args.hogar}")
+    if args.banco not in hogar.bancos + ['PIX']: parser.error(f"--banco debe ser uno de {hogar.bancos + ['PIX']}")
+    if args.quem not in hogar.personas: parser.error(f"--quem debe ser uno de {hogar.personas}")
+
+    error = asegurar_credenciales(os.environ)
+    if error: raise SystemExit(error)
+    resumen = importar(args.archivo, args.banco, args.quem, args.categoria, args.formato, args.simular, args.lote,
+                       progreso=lambda r: print(f"  lote {r['lotes']}: {r['escritas']} linhas escritas"))
+    print(f"✅ {resumen['lidas']} linhas lidas, {resumen['gastos']} gastos, {resumen['duplicadas']} duplicados, "
+          f"{resumen['escritas']} {'a escrever (simulação)' if args.simular else 'escritos'} em {resumen['lotes']} lote(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Instrumentación del proceso: tiempos y contadores de Sheets, bot y dashboard.
+
+Uso:
+    with METRICAS.medir("sheets.append_rows"): ...
+    METRICAS.contar("sheets.errores_cuota")
+
+Se exporta como JSON (exportar_json) o en texto estilo Prometheus (exportar_prometheus);
+la página pages/diagnostico.py del dashboard muestra ambas cosas.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class Metricas:
+    def __init__(self, muestras=500):
+        self._lock = threading.Lock()
+        self._tiempos = {}    # nombre -> {'n', 'total', 'max', 'ultimo', 'recientes': deque}
+        self._contadores = {} # nombre -> int
+        self._muestras = muestras
+        self.inicio = time.time()
+
+    @contextmanager
+    def medir(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.contar(f"{nombre}.errores")
+            raise
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio)
+
+    def observar(self, nombre, segundos):
+        with self._lock:
+            t = self._tiempos.get(nombre)
+            if t is None:
+                t = self._tiempos[nombre] = {'n': 0, 'total': 0.0, 'max': 0.0, 'ultimo': 0.0,
+                                             'recientes': deque(maxlen=self._muestras)}
+            t['n'] += 1
+            t['total'] += segundos
+            t['max'] = max(t['max'], segundos)
+            t['ultimo'] = segundos
+            t['recientes'].append(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def resumen(self, prefijo=""):
+        """Dict serializable: tiempos (ms, con p50/p95 de las últimas muestras) y contadores."""
+        with self._lock:
+            tiempos = {}
+            for nombre, t in self._tiempos.items():
+                if not nombre.startswith(prefijo): continue
+                recientes = sorted(t['recientes'])
+                tiempos[nombre] = {
+                    'n': t['n'],
+                    'media_ms': 1000 * t['total'] / t['n'],
+                    'p50_ms': 1000 * recientes[len(recientes) // 2],
+                    'p95_ms': 1000 * recientes[min(len(recientes) - 1, int(len(recientes) * 0.95))],
+                    'max_ms': 1000 * t['max'],
+                    'ultimo_ms': 1000 * t['ultimo'],
+                }
+            contadores = {n: v for n, v in self._contadores.items() if n.startswith(prefijo)}
+        return {'desde': self.inicio, 'tiempos': tiempos, 'contadores': contadores}
+
+    def exportar_json(self):
+        return json.dumps(self.resumen(), indent=2, ensure_ascii=False)
+
+    def exportar_prometheus(self):
+        datos = self.resumen()
+        lineas = ["# TYPE finanzas_duracion_segundos summary"]
+        for nombre, t in sorted(datos['tiempos'].items()):
+            etiqueta = f'op="{nombre}"'
+            lineas.append(f'finanzas_duracion_segundos{{{etiqueta},quantile="0.5"}} {t["p50_ms"] / 1000:.6f}')
+            lineas.append(f'finanzas_duracion_segundos{{{etiqueta},quantile="0.95"}} {t["p95_ms"] / 1000:.6f}')
+            lineas.append(f'finanzas_duracion_segundos_sum{{{etiqueta}}} {t["media_ms"] * t["n"] / 1000:.6f}')
+            lineas.append(f'finanzas_duracion_segundos_count{{{etiqueta}}} {t["n"]}')
+        lineas.append("# TYPE finanzas_eventos_total counter")
+        for nombre, valor in sorted(datos['contadores'].items()):
+            lineas.append(f'finanzas_eventos_total{{evento="{nombre}"}} {valor}')
+        return "\n".join(lineas) + "\n"
+
+METRICAS = Metricas()
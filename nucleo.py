@@ -0,0 +1,965 @@
+"""Núcleo compartido entre el bot de Telegram (bot_telegram.py) y el dashboard (app.py).
+
+Sin Streamlit ni Telegram aquí: solo configuración, acceso a Google Sheets, espejo
+local y cálculos con pandas. gspread se importa la primera vez que se conecta.
+"""
+import pandas as pd
+import numpy as np
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import base64
+import contextvars
+import hmac
+import os
+import re
+import threading
+import time
+
+from metricas import METRICAS
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+COLOR_MAP_BANCOS = {
+    'nubank': '#820AD1', 'bb': '#FFE600', 'inter': '#FF7A00', 'bradesco': "#CC092F",
+    'pix': '#00BFA5' # Color Verde para PIX
+}
+COLOR_DEFAULT = '#808080'
+
+TARJETAS_CONFIG = {
+    "nubank": 4, "bb": 2, "inter": 6, "bradesco": 20
+}
+
+LISTA_BANCOS = ["Nubank", "Inter", "BB", "Bradesco"]
+LISTA_CATEGORIAS = ["Alimentação", "Transporte", "Lazer", "Casa", "Serviços", "Saúde", "Educação", "Pets", "Outros"]
+LISTA_PERSONAS = ["Carlos", "Jessy"]
+
+NOMBRE_HOJA = "Finanzas_Familia"
+TAB_REGISTROS = "Registros"
+TAB_ORCAMENTO = "Orcamento"
+TAB_RESUMEN_ARCHIVO = "Resumo_Arquivo" # totales de los meses archivados (archivo.py)
+MESES_ABIERTOS = 12 # meses que quedan en Registros; los anteriores se pueden archivar
+MAX_INTENTOS_ESCRITURA = 5
+PAUSA_INICIAL_REINTENTO = 2 # segundos (se duplica en cada reintento)
+CARPETA_ESTADO = ".estado"
+CARPETA_ESPEJO = ".espejo"
+INTERVALO_SYNC = 15 # segundos entre consultas del modifiedTime de la hoja
+INTERVALO_RECONCILIACION = 600 # segundos: como mucho tan seguido se relee una pestaña entera
+
+# --- Hogares: varias familias en un mismo proceso ---
+# hogares.toml (o la ruta en FINANZAS_HOGARES) registra cada familia con su hoja, sus
+# chats de Telegram, miembros y bancos con día de corte. Sin ese archivo hay un único
+# hogar con la configuración de arriba y el bot atiende a cualquier chat (como antes).
+#
+#   [silva]
+#   hoja = "Finanzas_Silva"
+#   chats = [123456789, 987654321]
+#   personas = ["Ana", "Pedro"]
+#   bancos = { Nubank = 4, Inter = 6 }       # banco = día de corte
+#   credenciales = "credentials_silva.json"  # opcional; por defecto credentials.json
+#   clave = "..."                            # senha del dashboard de la familia
+#
+# Con más de un hogar el dashboard solo abre los que tienen 'clave' (y la pide) y el bot
+# solo atiende los 'chats' de cada uno: sin eso cualquiera con la URL o el bot vería los
+# datos de otra familia. Un único hogar sin clave ni chats se abre directo y atiende a
+# cualquier chat, como antes (un despliegue por familia).
+ARCHIVO_HOGARES = "hogares.toml"
+HOGAR_POR_DEFECTO = "principal"
+
+class Hogar:
+    """Configuración de una familia. Sin 'chats' acepta cualquier chat solo si es el único hogar."""
+
+    def __init__(self, id, hoja=NOMBRE_HOJA, chats=(), personas=None, bancos=None, categorias=None,
+                 credenciales="credentials.json", clave=None):
+        self.id = id
+        self.hoja = hoja
+        self.chats = {int(c) for c in chats}
+        self.personas = list(personas or LISTA_PERSONAS)
+        bancos = bancos or {b: TARJETAS_CONFIG.get(b.lower(), 1) for b in LISTA_BANCOS}
+        self.bancos = list(bancos)
+        self.cortes = {str(b).lower().strip(): int(dia) for b, dia in bancos.items()}
+        self.categorias = list(categorias or LISTA_CATEGORIAS)
+        self.credenciales = credenciales
+        self.clave = str(clave) if clave else None
+
+def cargar_hogares(ruta=None):
+    """{id: Hogar} del TOML, en el orden del archivo: el primero es el hogar por defecto
+    (dashboard sin ?hogar=, scripts sin --hogar)."""
+    ruta = ruta or os.environ.get("FINANZAS_HOGARES", ARCHIVO_HOGARES)
+    if not os.path.exists(ruta): return {HOGAR_POR_DEFECTO: Hogar(HOGAR_POR_DEFECTO)}
+    import tomllib
+    with open(ruta, "rb") as f:
+        tabla = tomllib.load(f)
+    hogares = {str(id): Hogar(str(id), **conf) for id, conf in tabla.items()}
+    if not hogares: raise ValueError(f"{ruta} no define ningún hogar")
+    vistos = {}
+    for hogar in hogares.values():
+        for chat in hogar.chats:
+            if chat in vistos: raise ValueError(f"El chat {chat} está en '{vistos[chat]}' y en '{hogar.id}'")
+            vistos[chat] = hogar.id
+    return hogares
+
+_hogar_activo = contextvars.ContextVar("hogar_activo", default=None)
+
+def obtener_hogares():
+    return instancia_unica('hogares', cargar_hogares, por_hogar=False)
+
+def hogar_actual():
+    """Hogar del contexto actual (handler del bot, página del dashboard, script)."""
+    hogares = obtener_hogares()
+    hogar_id = _hogar_activo.get()
+    return hogares[hogar_id] if hogar_id is not None else next(iter(hogares.values()))
+
+@contextmanager
+def usar_hogar(hogar_id):
+    """Lo que corre dentro (cliente de Sheets, espejos, cachés) es del hogar indicado."""
+    if hogar_id not in obtener_hogares(): raise KeyError(f"Hogar desconocido: {hogar_id}")
+    token = _hogar_activo.set(hogar_id)
+    try:
+        yield obtener_hogares()[hogar_id]
+    finally:
+        _hogar_activo.reset(token)
+
+def fijar_hogar(hogar_id):
+    """Fija el hogar del resto del script (página de Streamlit, CLI). None = el por defecto.
+    Devuelve el Hogar, o None si el id no existe."""
+    if hogar_id is not None and hogar_id not in obtener_hogares(): return None
+    _hogar_activo.set(hogar_id)
+    return hogar_actual()
+
+def abrir_hogar(hogar_id, clave):
+    """fijar_hogar para el dashboard: solo si la clave es la del hogar (ver hogares.toml).
+    Devuelve el Hogar, o None si no existe, la clave no coincide o, habiendo varios
+    hogares, no tiene clave."""
+    hogares = obtener_hogares()
+    hogar = hogares.get(hogar_id) if hogar_id is not None else next(iter(hogares.values()))
+    if hogar is None: return None
+    if hogar.clave is None:
+        if len(hogares) > 1: return None
+    elif not hmac.compare_digest(str(clave or "").encode(), hogar.clave.encode()):
+        return None
+    return fijar_hogar(hogar.id)
+
+def hogar_de_chat(chat_id):
+    """Hogar de un chat de Telegram, o None si ningún hogar lo acepta. Un hogar sin
+    'chats' acepta cualquier chat solo si es el único (como abrir_hogar sin clave)."""
+    hogares = list(obtener_hogares().values())
+    for hogar in hogares:
+        if chat_id in hogar.chats: return hogar
+    return hogares[0] if len(hogares) == 1 and not hogares[0].chats else None
+
+# --- Credenciales ---
+def asegurar_credenciales(secretos, archivo="credentials.json"):
+    """Crea credentials.json a partir del secreto base64 'credenciales_seguras'
+    (st.secrets en la web, variables de entorno en el bot). Devuelve un error o None."""
+    if os.path.exists(archivo): return None
+    try:
+        codificado = secretos.get("credenciales_seguras") or secretos.get("CREDENCIALES_SEGURAS")
+        if not codificado:
+            return "⚠️ Error: No encontré 'credenciales_seguras' en los Secrets."
+        with open(archivo, "wb") as f:
+            f.write(base64.b64decode(codificado))
+    except Exception as e:
+        return f"Error crítico creando credenciales: {e}"
+    return None
+
+# --- Instancias únicas por proceso ---
+# El módulo se importa una sola vez (sys.modules), así que estas instancias sobreviven
+# a los reruns de Streamlit y las comparte el hilo del bot. Por defecto hay una por
+# hogar: cada familia tiene su propio cliente de Sheets (y su pool de conexiones),
+# espejos y cachés, y una hoja lenta no frena los locks de las demás.
+_instancias = {}
+_lock_instancias = threading.RLock() # las fábricas piden otras instancias
+
+def instancia_unica(nombre, fabrica, por_hogar=True):
+    clave = (hogar_actual().id, nombre) if por_hogar else nombre
+    with _lock_instancias:
+        if clave not in _instancias:
+            _instancias[clave] = fabrica()
+        return _instancias[clave]
+
+# ==============================================================================
+# GOOGLE SHEETS
+# ==============================================================================
+
+# --- Cliente Google Sheets Compartido (Bot + Web) ---
+class GestorSheets:
+    """Un único cliente gspread por proceso: sesión HTTP autorizada (pool de conexiones),
+    hojas y pestañas cacheadas, y token renovado antes de que caduque."""
+    SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+    MARGEN_TOKEN = timedelta(minutes=5)
+
+    def __init__(self, archivo_credenciales="credentials.json", nombre_hoja=NOMBRE_HOJA):
+        self.archivo_credenciales = archivo_credenciales
+        self.nombre_hoja = nombre_hoja
+        self._lock = threading.RLock()
+        self._client = None
+        self._hojas = {}  # nombre_hoja -> Spreadsheet
+        self._tabs = {}   # (nombre_hoja, tab) -> Worksheet
+
+    def cliente(self):
+        with self._lock:
+            if self._client is None:
+                import gspread # pesado (requests + google-auth): solo al conectar
+                with METRICAS.medir("sheets.autorizar"):
+                    self._client = gspread.service_account(filename=self.archivo_credenciales, scopes=self.SCOPE)
+            self._refrescar_token()
+            return self._client
+
+    def _refrescar_token(self):
+        creds = self._client.http_client.auth
+        expira = getattr(creds, 'expiry', None)
+        if not creds.valid or (expira and expira - datetime.utcnow() < self.MARGEN_TOKEN):
+            from google.auth.transport.requests import Request
+            with METRICAS.medir("sheets.refrescar_token"):
+                creds.refresh(Request())
+
+    def hoja(self, nombre_hoja=None):
+        nombre_hoja = nombre_hoja or self.nombre_hoja
+        client = self.cliente()
+        with self._lock:
+            if nombre_hoja not in self._hojas:
+                # client.open() busca por nombre en Drive: solo la primera vez
+                with METRICAS.medir("sheets.open"):
+                    self._hojas[nombre_hoja] = client.open(nombre_hoja)
+            return self._hojas[nombre_hoja]
+
+    def worksheet(self, nombre_tab, nombre_hoja=None):
+        nombre_hoja = nombre_hoja or self.nombre_hoja
+        clave = (nombre_hoja, nombre_tab)
+        with self._lock:
+            if clave not in self._tabs:
+                hoja = self.hoja(nombre_hoja)
+                with METRICAS.medir("sheets.worksheet"):
+                    self._tabs[clave] = hoja.worksheet(nombre_tab)
+            self._refrescar_token()
+            return self._tabs[clave]
+
+    def invalidar(self):
+        """Olvida hojas/pestañas cacheadas (ej: pestaña renombrada o borrada)."""
+        with self._lock:
+            self._hojas.clear()
+            self._tabs.clear()
+
+def obtener_gestor_sheets():
+    """Almacén del hogar activo. Cualquier objeto con hoja(), worksheet() e invalidar() sirve:
+    FINANZAS_ALMACEN=memoria usa el falso de almacen_falso.py (sin red, datos sintéticos)."""
+    def crear():
+        if os.environ.get("FINANZAS_ALMACEN") == "memoria":
+            from almacen_falso import almacen_sintetico
+            return almacen_sintetico(int(os.environ.get("FINANZAS_FILAS_SINTETICAS", 1000)))
+        hogar = hogar_actual()
+        return GestorSheets(hogar.credenciales, hogar.hoja)
+    return instancia_unica('gestor_sheets', crear)
+
+def usar_almacen(almacen):
+    """Cambia el almacén del hogar activo (benchmarks, pruebas) y descarta las instancias
+    construidas sobre el anterior (espejos, cachés)."""
+    with _lock_instancias:
+        _instancias.clear()
+        _instancias[(hogar_actual().id, 'gestor_sheets')] = almacen
+
+# --- Espejo Local (Parquet) de Registros y Orcamento ---
+class EspejoHoja:
+    """Copia local en Parquet de una pestaña. Antes de leer nada se consulta el
+    modifiedTime de Drive (llamada barata): si la hoja no cambió, no se descarga nada.
+    El modifiedTime es de toda la hoja, así que un cambio se mira primero desde la última
+    fila conocida: si sigue igual, solo se anexaron filas (o el cambio fue en otra
+    pestaña) y se suman las nuevas. Si no, o al arrancar con la copia del disco, o si la
+    última relectura completa tiene más de 'reconciliacion' segundos, se relee entera y se
+    compara con la local: si solo se anexaron filas (incremental) la generación no
+    cambia y los cachés suman solo las nuevas; si se editó o borró algo, el espejo se
+    reconstruye. Las escrituras propias se aplican sin releer (registrar_escritura).
+    Entre comprobaciones (intervalo) no se toca la API."""
+
+    def __init__(self, gestor, nombre_tab, incremental=True, intervalo=INTERVALO_SYNC, opcional=False,
+                 carpeta=CARPETA_ESPEJO, reconciliacion=INTERVALO_RECONCILIACION):
+        self.gestor = gestor
+        self.nombre_tab = nombre_tab
+        self.incremental = incremental
+        self.opcional = opcional # la pestaña puede no existir todavía (se sirve vacía)
+        self.intervalo = intervalo
+        self.reconciliacion = reconciliacion
+        self.carpeta = carpeta
+        self.ruta = os.path.join(carpeta, f"{nombre_tab}.parquet")
+        self.generacion = 0 # sube cada vez que el espejo se reconstruye entero
+        self._lock = threading.RLock()
+        self._df = None
+        self._ultimo_sync = 0.0
+        self._ultima_relectura = 0.0 # última vez que se releyó la pestaña entera
+        self._marca = None # modifiedTime de la hoja en la última sincronización
+
+    def version(self):
+        """Token barato que cambia con cada cambio real de datos (para claves de caché)."""
+        self.sincronizar()
+        with self._lock:
+            return (self.generacion, len(self._df))
+
+    def datos(self):
+        self.sincronizar()
+        with self._lock:
+            return self._df
+
+    def instantanea(self, sincronizar=True):
+        """(datos, generación) leídos juntos: la generación es la de esas filas.
+        sincronizar=False: la copia local tal cual, sin consultar la hoja."""
+        if sincronizar: self.sincronizar()
+        with self._lock:
+            self._cargar_disco()
+            return self._df, self.generacion
+
+    def sincronizar(self, forzar=False, inmediato=False):
+        """forzar: relee la pestaña entera. inmediato: consulta ya, sin esperar el intervalo."""
+        with self._lock:
+            self._cargar_disco()
+            if not (forzar or inmediato) and time.time() - self._ultimo_sync < self.intervalo:
+                return
+            try:
+                ws = self.gestor.worksheet(self.nombre_tab)
+                marca = self._marca_remota()
+                # _marca es None al arrancar: la copia del disco se reconcilia con la hoja
+                if forzar or len(self._df.columns) == 0 or self._marca is None:
+                    self._releer_todo(ws)
+                elif marca != self._marca:
+                    vencida = time.time() - self._ultima_relectura >= self.reconciliacion
+                    if vencida or not self._leer_nuevas(ws): self._releer_todo(ws)
+                self._marca = marca
+            except Exception as e:
+                if self.opcional and es_pestana_inexistente(e):
+                    if len(self._df.columns): self._df, self.generacion = pd.DataFrame(), self.generacion + 1
+                    self._ultimo_sync = time.time()
+                    return
+                # Sin red / sin cuota: seguimos sirviendo la copia local si existe
+                METRICAS.contar("espejo.errores_sync")
+                if es_error_cuota(e): METRICAS.contar("sheets.errores_cuota")
+                if len(self._df.columns) == 0: raise
+                print(f"⚠️ Espejo {self.nombre_tab} sin sincronizar: {e}")
+            self._ultimo_sync = time.time()
+
+    def marca_remota(self):
+        """modifiedTime actual de la hoja (None si no se pudo leer). Quien escribe lo pide
+        justo antes y se lo pasa a registrar_escritura."""
+        try: return self._marca_remota()
+        except Exception: return None
+
+    def registrar_escritura(self, filas, respuesta, marca_previa=None):
+        """Aplica al espejo las filas que el bot acaba de anexar, sin releer Sheets.
+        marca_previa: modifiedTime leído justo antes de escribir. Si no es el de la última
+        sincronización, alguien tocó la hoja entre medio: la próxima sincronización reconcilia."""
+        with self._lock:
+            self._cargar_disco()
+            rango = (respuesta or {}).get('updates', {}).get('updatedRange', '')
+            m = re.search(r'![A-Z]+(\d+)', rango)
+            # Solo si las filas quedaron justo detrás de lo que ya tenemos
+            if m and len(self._df.columns) and int(m.group(1)) == len(self._df) + 2:
+                self._anexar([[str(v) for v in f] for f in filas])
+                if marca_previa is not None and marca_previa == self._marca:
+                    # El único cambio desde la última sincronización es nuestra escritura: su
+                    # modifiedTime se adopta para no releer
+                    try:
+                        self._marca = self._marca_remota()
+                        return
+                    except Exception: self._marca = None
+            self._ultimo_sync = 0.0
+
+    def _marca_remota(self):
+        with METRICAS.medir("sheets.modified_time"):
+            return self.gestor.hoja().get_lastUpdateTime()
+
+    def _leer_nuevas(self, ws):
+        """Lee desde la última fila conocida. Si esa fila sigue igual, anexa las que vienen
+        detrás y devuelve True; si cambió o ya no está (edición o borrado) devuelve False."""
+        n = len(self._df)
+        if not self.incremental or n == 0: return False
+        from gspread.utils import rowcol_to_a1
+        ultima_col = rowcol_to_a1(1, len(self._df.columns)).rstrip('0123456789')
+        with METRICAS.medir("sheets.get"):
+            cola = self._a_frame(list(self._df.columns), ws.get(f"A{n + 1}:{ultima_col}"))
+        if cola.empty or not _mismas_celdas(cola.iloc[:1], self._df.iloc[n - 1:]): return False
+        if len(cola) > 1: self._anexar(cola.iloc[1:].values.tolist())
+        return True
+
+    def _releer_todo(self, ws):
+        with METRICAS.medir("sheets.get_all_values"):
+            valores = ws.get_all_values()
+        self._ultima_relectura = time.time()
+        cabecera = valores[0] if valores else []
+        nuevo = self._a_frame(cabecera, valores[1:])
+        n = len(self._df) if self._df is not None else 0
+        mismas_columnas = self._df is not None and list(nuevo.columns) == list(self._df.columns)
+        # Lo que anexó el bot ('33.34') vuelve de la hoja formateado ('33,34'): se compara por valor
+        previas = mismas_columnas and n <= len(nuevo) and _mismas_celdas(nuevo.iloc[:n], self._df)
+        if previas and n == len(nuevo):
+            if not nuevo.equals(self._df): # mismo contenido, solo cambia el formato del texto
+                self._df = nuevo
+                self._guardar_disco()
+            return # sin cambios: los cachés que dependen de 'generacion' siguen valiendo
+        solo_anexadas = self.incremental and 0 < n < len(nuevo) and previas
+        if not solo_anexadas:
+            self.generacion += 1 # edición o borrado: los cachés se rehacen
+            METRICAS.contar("espejo.reconstrucciones")
+        self._df = nuevo
+        self._guardar_disco()
+
+    def _anexar(self, filas):
+        nuevas = self._a_frame(list(self._df.columns), filas)
+        self._df = pd.concat([self._df, nuevas], ignore_index=True)
+        self._guardar_disco()
+
+    @staticmethod
+    def _a_frame(cabecera, filas):
+        n = len(cabecera)
+        filas = [(list(f) + [''] * n)[:n] for f in filas]
+        return pd.DataFrame(filas, columns=cabecera, dtype=str)
+
+    def _cargar_disco(self):
+        if self._df is None:
+            try: self._df = pd.read_parquet(self.ruta)
+            except Exception: self._df = pd.DataFrame()
+
+    def _guardar_disco(self):
+        os.makedirs(self.carpeta, exist_ok=True)
+        tmp = self.ruta + ".tmp"
+        self._df.to_parquet(tmp, index=False)
+        os.replace(tmp, self.ruta)
+
+def _mismas_celdas(a, b):
+    """Dos tablas de texto del mismo tamaño con el mismo contenido. Solo las filas que
+    difieren como texto se comparan por valor ('33.34' anexado por el bot y '33,34' leído
+    de la hoja son la misma celda)."""
+    distintas = (a.to_numpy() != b.to_numpy()).any(axis=1)
+    return not distintas.any() or celdas_comparables(a[distintas]).equals(celdas_comparables(b[distintas]))
+
+def numeros_o_texto(serie, comparable=False):
+    """Celda a celda: el número (float) si el texto lo es ('33,34', 'R$ 1.234,56', '33.34'),
+    si no el texto tal cual. Con comparable=True el número va como texto normalizado.
+    Cada valor distinto se mira una vez."""
+    codigos, unicos = pd.factorize(pd.Series(serie))
+    unicos = pd.Series(unicos, dtype=object).astype(str)
+    texto = unicos.str.replace('R$', '', regex=False).str.strip()
+    con_coma = texto.str.contains(',', regex=False)
+    texto = texto.mask(con_coma, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    numeros = pd.to_numeric(texto, errors='coerce')
+    valores = unicos.where(numeros.isna() | texto.eq(''), numeros.round(2).map(repr) if comparable else numeros)
+    return pd.Series(np.append(valores.to_numpy(dtype=object), '')[codigos], index=getattr(serie, 'index', None), dtype=object)
+
+def celdas_comparables(df):
+    """Texto de las celdas con los números normalizados ('33.34', '33,34' y 'R$ 33,34'
+    quedan iguales); el resto tal cual."""
+    return pd.DataFrame({i: numeros_o_texto(df.iloc[:, i], comparable=True).to_numpy() for i in range(df.shape[1])})
+
+def carpeta_espejo():
+    """Parquets del hogar activo: .espejo/<hogar>/"""
+    return os.path.join(CARPETA_ESPEJO, hogar_actual().id)
+
+def obtener_espejos():
+    def crear():
+        gestor, carpeta = obtener_gestor_sheets(), carpeta_espejo()
+        return {
+            TAB_REGISTROS: EspejoHoja(gestor, TAB_REGISTROS, carpeta=carpeta),
+            TAB_ORCAMENTO: EspejoHoja(gestor, TAB_ORCAMENTO, incremental=False, carpeta=carpeta),
+            TAB_RESUMEN_ARCHIVO: EspejoHoja(gestor, TAB_RESUMEN_ARCHIVO, incremental=False, opcional=True, carpeta=carpeta),
+        }
+    return instancia_unica('espejos', crear)
+
+def tab_archivo(anio):
+    return f"{TAB_REGISTROS}_{anio}"
+
+def obtener_espejo_archivo(anio):
+    """Espejo de la pestaña archivada de un año; se crea (y se descarga) al pedirlo."""
+    return instancia_unica(f"espejo_{tab_archivo(anio)}",
+                           lambda: EspejoHoja(obtener_gestor_sheets(), tab_archivo(anio), opcional=True,
+                                              carpeta=carpeta_espejo()))
+
+def version_datos():
+    """Token de versión de los datos: cambia cuando el bot escribe o la hoja se edita."""
+    espejos = obtener_espejos()
+    return espejos[TAB_REGISTROS].version() + espejos[TAB_ORCAMENTO].version() + espejos[TAB_RESUMEN_ARCHIVO].version()
+
+def conectar_sheet_bot(nombre_tab):
+    return obtener_gestor_sheets().worksheet(nombre_tab)
+
+def bloqueo_registros():
+    """Lock del hogar activo para escribir en Registros: el vaciado de la cola del bot y
+    el importador esperan mientras archivo.py reescribe la pestaña."""
+    return instancia_unica('bloqueo_registros', threading.RLock)
+
+def leer_tab(nombre_tab):
+    """DataFrame (texto) de la pestaña, servido desde el espejo local."""
+    return obtener_espejos()[nombre_tab].datos().copy()
+
+# ==============================================================================
+# LIMPIEZA Y CÁLCULOS
+# ==============================================================================
+@METRICAS.medir("limpieza.parsear_montos")
+def parsear_montos(serie):
+    """Convierte una columna de montos BRL ('R$ 1.234,56', '50,00', 12.5, '') a float
+    en una sola pasada vectorizada. Devuelve (serie_float, n_celdas_no_reconocidas).
+    Reglas: números nativos pasan tal cual; en texto se quita 'R$', si hay coma los
+    puntos son de miles; vacío o nulo (None, NA) -> 0.0; texto no reconocido -> 0.0
+    (y se cuenta)."""
+    serie = pd.Series(serie)
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float), 0
+
+    # Los montos se repiten mucho (cuotas iguales): se parsea cada valor distinto una vez
+    codigos, unicos = pd.factorize(serie)
+    unicos = pd.Series(unicos, dtype=object)
+
+    # get_all_records mezcla str con int/float: el .str solo va sobre las celdas de texto
+    es_texto = unicos.map(lambda v: isinstance(v, str)).astype(bool)
+    texto = unicos.where(es_texto, '').astype(str).str.replace('R$', '', regex=False).str.strip()
+    con_coma = texto.str.contains(',', regex=False)
+    texto = texto.mask(con_coma, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+
+    valores = pd.to_numeric(texto, errors='coerce')
+    vacio = es_texto & texto.eq('')
+    invalido = es_texto & ~vacio & valores.isna()
+    nativos = pd.to_numeric(unicos.where(~es_texto), errors='coerce')
+    valores = valores.where(es_texto, nativos).mask(vacio | invalido, 0.0).fillna(0.0)
+
+    tabla = np.append(valores.to_numpy(dtype=float), 0.0) # código -1 (celda nula) -> 0.0
+    n_invalidos = np.bincount(codigos[codigos >= 0], minlength=len(unicos))[invalido.to_numpy()].sum()
+    return pd.Series(tabla[codigos], index=serie.index), int(n_invalidos)
+
+def limpiar_numero(valor):
+    return float(parsear_montos([valor])[0].fillna(0.0).iloc[0])
+
+def es_error_cuota(e):
+    from gspread.exceptions import APIError
+    return isinstance(e, APIError) and getattr(e, 'code', None) == 429
+
+def es_pestana_inexistente(e):
+    from gspread.exceptions import WorksheetNotFound
+    return isinstance(e, WorksheetNotFound)
+
+def escribir_filas_lote(sh, filas):
+    """Envía todas las cuotas de una compra en UNA sola llamada (todo o nada).
+    Si Google responde 429 (cuota) se reintenta el lote completo con backoff exponencial."""
+    espera = PAUSA_INICIAL_REINTENTO
+    for intento in range(1, MAX_INTENTOS_ESCRITURA + 1):
+        try:
+            with METRICAS.medir("sheets.append_rows"):
+                return sh.append_rows(filas)
+        except Exception as e:
+            if es_error_cuota(e): METRICAS.contar("sheets.errores_cuota")
+            if not es_error_cuota(e) or intento == MAX_INTENTOS_ESCRITURA: raise
+            METRICAS.contar("sheets.reintentos")
+            print(f"⏳ Cuota de Sheets agotada, reintento {intento}/{MAX_INTENTOS_ESCRITURA} en {espera:.0f}s")
+            time.sleep(espera)
+            espera *= 2
+
+# --- Índice de Meses (Mes_Ref "%m-%Y" -> año*12 + mes-1) ---
+MES_INVALIDO = -1 # cubeta para Mes_Ref vacío o mal escrito
+
+def indice_de_fecha(fecha):
+    return fecha.year * 12 + fecha.month - 1
+
+def indice_a_mes(indice):
+    return "Sem mês" if indice == MES_INVALIDO else f"{indice % 12 + 1:02d}-{indice // 12}"
+
+def mes_a_indice(serie):
+    """Mes_Ref -> índice entero (int16, alcanza hasta el año 2730) ordenable.
+    Solo se parsea cada mes distinto una vez."""
+    codigos, unicos = pd.factorize(pd.Series(serie).astype(str).str.strip())
+    partes = pd.Series(unicos, dtype=object).str.extract(r'^(\d{1,2})-(\d{4})$').astype(float)
+    mes, anio = partes[0], partes[1]
+    indices = (anio * 12 + mes - 1).where(mes.between(1, 12), MES_INVALIDO)
+    tabla = np.append(indices.to_numpy(), MES_INVALIDO).astype(np.int16)
+    return pd.Series(tabla[codigos], index=pd.Series(serie).index)
+
+# --- Tipos Compactos del Libro de Registros ---
+# Banco/Quem/Tipo/Categoria se repiten en todas las filas: como category cada celda es
+# un código de 1 byte. 'Valor' queda en float64: en float32 las sumas pierden centavos.
+COLUMNAS_CATEGORICAS = ['Quem', 'Tipo', 'Banco', 'Categoria', 'Descricao']
+COLUMNAS_ENTERAS = ['Parc', 'Parc_Atual']
+
+def a_categoria(serie):
+    """Texto -> category (categorías ordenadas, sin espacios sobrantes)."""
+    codigos, unicos = pd.factorize(pd.Series(serie))
+    limpios = pd.Index(unicos.astype(str)).str.strip()
+    categorias = pd.Index(sorted(limpios.unique()))
+    codigos = np.where(codigos >= 0, categorias.get_indexer(limpios)[codigos], -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categorias), index=pd.Series(serie).index)
+
+def a_entero16(serie):
+    """'12', ' 3', '' -> int16 (vacío o no numérico -> 0). Cada valor distinto se parsea una vez."""
+    codigos, unicos = pd.factorize(pd.Series(serie))
+    valores = pd.to_numeric(pd.Series(unicos, dtype=object).astype(str).str.strip(), errors='coerce')
+    tabla = np.append(valores.fillna(0).clip(-32768, 32767).to_numpy(), 0).astype(np.int16)
+    return pd.Series(tabla[codigos], index=pd.Series(serie).index)
+
+def tipar_registros(df):
+    """Libro de Registros con tipos compactos: category para los textos repetidos,
+    int16 para cuotas y Mes_Idx, 'Data' como datetime64 (NaT si no es dd/mm/aaaa) y
+    Mes_Ref como category ordenada por mes. Devuelve un frame nuevo; 'df' no se toca."""
+    tipado = {}
+    for c in df.columns:
+        if c in COLUMNAS_CATEGORICAS: tipado[c] = a_categoria(df[c])
+        elif c in COLUMNAS_ENTERAS: tipado[c] = a_entero16(df[c])
+        elif c == 'Data': tipado[c] = pd.to_datetime(df[c], format="%d/%m/%Y", errors='coerce')
+        else: tipado[c] = df[c]
+    tipado = pd.DataFrame(tipado, index=df.index)
+    if 'Mes_Ref' in tipado.columns:
+        mes_ref = tipado['Mes_Ref'].astype(str).str.strip()
+        tipado['Mes_Idx'] = mes_a_indice(mes_ref)
+        orden = pd.DataFrame({'m': mes_ref, 'i': tipado['Mes_Idx']}).drop_duplicates('m').sort_values('i')['m']
+        tipado['Mes_Ref'] = pd.Categorical(mes_ref, categories=orden, ordered=True)
+    return tipado
+
+# --- Cronograma de Cuotas ---
+COLUMNAS_REGISTROS = ['Data', 'Mes_Ref', 'Quem', 'Tipo', 'Banco', 'Valor', 'Parc', 'Parc_Atual', 'Categoria', 'Descricao']
+COLUMNA_ID = 'ID' # al final de Registros: ID del gasto que escribió la cola del bot (cola_escritura.py)
+
+def indices_a_mes_ref(indices):
+    """Índices de mes -> textos Mes_Ref ("%m-%Y"), formando cada mes distinto una vez."""
+    codigos, unicos = pd.factorize(np.asarray(indices))
+    return np.array([f"{m % 12 + 1:02d}-{m // 12}" for m in unicos], dtype=object)[codigos]
+
+def dia_corte(banco):
+    return hogar_actual().cortes.get(str(banco).lower().strip(), 1)
+
+def indices_primer_pago(fechas, bancos):
+    """Mes (índice) de la primera cuota: PIX se paga en el mes de la compra; en tarjeta,
+    una compra posterior al día de corte cae en la fatura del mes siguiente."""
+    claves = bancos.astype(str).str.lower().str.strip()
+    cortes = claves.map(hogar_actual().cortes).fillna(1).to_numpy()
+    indices = (fechas.dt.year * 12 + fechas.dt.month - 1).to_numpy(dtype=np.int64)
+    return indices + ((claves != 'pix').to_numpy() & (fechas.dt.day.to_numpy() > cortes))
+
+def indice_primer_pago(fecha, banco):
+    """Versión escalar (fatura abierta hoy de un banco, primera cuota de una compra)."""
+    return int(indices_primer_pago(pd.Series([pd.Timestamp(fecha)]), pd.Series([banco]))[0])
+
+def cronograma_cuotas(compras):
+    """Filas de Registros (columnas COLUMNAS_REGISTROS) de una o muchas compras, todas
+    a la vez. 'compras': DataFrame o lista de dicts con Monto, Cuotas, Banco, Fecha y,
+    opcionales, Quem, Categoria y Descricao (por defecto la categoría).
+    Los centavos que no se reparten parejo van a las primeras cuotas, así la suma de
+    las cuotas es exactamente el monto (100,00 en 3 -> 33,34 + 33,33 + 33,33)."""
+    compras = pd.DataFrame(compras).reset_index(drop=True)
+    if compras.empty: return pd.DataFrame(columns=COLUMNAS_REGISTROS)
+    fechas = pd.to_datetime(compras['Fecha'])
+    bancos = compras['Banco'].astype(str)
+    cuotas = compras['Cuotas'].astype(np.int64).clip(lower=1).to_numpy()
+    centavos = np.rint(compras['Monto'].astype(float).to_numpy() * 100).astype(np.int64)
+
+    # Una fila por cuota: 'compra' indica de qué compra sale y 'k' el número de cuota (base 0)
+    compra = np.repeat(np.arange(len(compras)), cuotas)
+    k = np.arange(len(compra)) - np.repeat(np.cumsum(cuotas) - cuotas, cuotas)
+    parc = cuotas[compra]
+    base, resto = np.divmod(centavos, cuotas)
+    valores = (base[compra] + (k < resto[compra])) / 100
+    meses = indices_primer_pago(fechas, bancos)[compra] + k
+
+    # Los textos se forman una vez por valor distinto (fechas, sufijos '(k/n)')
+    mes_ref = indices_a_mes_ref(meses)
+    codigos, unicos = pd.factorize(fechas)
+    datas = np.asarray(unicos.strftime("%d/%m/%Y"), dtype=object)[codigos]
+    codigos, unicos = pd.factorize(parc * 1000 + k + 1)
+    sufijos = np.array([f" ({u % 1000}/{u // 1000})" for u in unicos], dtype=object)[codigos]
+    es_pix = bancos.str.lower().str.strip().eq('pix').to_numpy()
+    tipos = np.where(es_pix | (cuotas == 1), "Debito", "Credito")
+    def texto(columna, defecto):
+        return (compras[columna].fillna(defecto) if columna in compras else pd.Series(defecto, index=compras.index)).astype(str).to_numpy()
+    categorias = texto('Categoria', 'Outros')
+    descripciones = texto('Descricao', '')
+    descripciones = np.where(descripciones == '', categorias, descripciones).astype(object)
+
+    return pd.DataFrame({
+        'Data': datas[compra],
+        'Mes_Ref': mes_ref,
+        'Quem': texto('Quem', 'Geral')[compra],
+        'Tipo': tipos[compra],
+        'Banco': bancos.to_numpy()[compra],
+        'Valor': valores,
+        'Parc': parc,
+        'Parc_Atual': k + 1,
+        'Categoria': categorias[compra],
+        'Descricao': descripciones[compra] + sufijos,
+    })
+
+def filas_para_sheets(cronograma):
+    """DataFrame del cronograma -> lista de filas con tipos nativos (lo que acepta append_rows)."""
+    return [list(f) for f in zip(*(cronograma[c].tolist() for c in COLUMNAS_REGISTROS))]
+
+# --- Caché del Reporte Mensual ---
+class CacheReporte:
+    """Totales por categoría y por banco de cada mes (Mes_Idx -> {Categoria: total},
+    Mes_Idx -> {Banco: total}) y límites del orçamento. Las filas nuevas del espejo se
+    suman a los totales (incremental); si el espejo de Registros se reconstruye se rehace
+    todo, y los límites se recargan solo cuando cambia la pestaña Orcamento. Los meses
+    archivados salen del resumen, salvo que el mes tenga filas vivas (archivado cortado
+    a mitad): entonces cuentan solo las vivas, nunca las dos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totales = {}
+        self._bancos = {}
+        self._archivo = {}
+        self._limites = {}
+        self._n_filas = 0
+        self._gen_registros = None
+        self._gen_orcamento = None
+        self._gen_archivo = None
+
+    def sincronizar(self):
+        espejos = obtener_espejos()
+        df_r = espejos[TAB_REGISTROS].datos()
+        df_p = espejos[TAB_ORCAMENTO].datos()
+        with self._lock:
+            gen_r = espejos[TAB_REGISTROS].generacion
+            if gen_r != self._gen_registros or len(df_r) < self._n_filas:
+                self._totales, self._bancos, self._n_filas, self._gen_registros = {}, {}, 0, gen_r
+            if len(df_r) > self._n_filas:
+                self._sumar(df_r.iloc[self._n_filas:])
+                self._n_filas = len(df_r)
+
+            gen_p = espejos[TAB_ORCAMENTO].generacion
+            if gen_p != self._gen_orcamento:
+                self._limites = {}
+                if 'Limite' in df_p.columns and 'Categoria' in df_p.columns:
+                    limites, _ = parsear_montos(df_p['Limite'])
+                    self._limites = limites.groupby(df_p['Categoria'].str.strip().str.title()).sum().to_dict()
+                self._gen_orcamento = gen_p
+
+            gen_a = espejos[TAB_RESUMEN_ARCHIVO].version()
+            if gen_a != self._gen_archivo:
+                resumen = cargar_resumen_archivo()
+                self._archivo = {}
+                categorias = resumen['Categoria'].str.title()
+                for (mes, cat), total in resumen['Valor'].groupby([resumen['Mes_Idx'], categorias]).sum().items():
+                    self._archivo.setdefault(int(mes), {})[cat] = float(total)
+                self._gen_archivo = gen_a
+
+    def _sumar(self, nuevas):
+        nuevas = nuevas.rename(columns=MAPA_COLUMNAS) # cabeceras viejas ('Monto', ...)
+        valores, _ = parsear_montos(nuevas['Valor'])
+        meses = mes_a_indice(nuevas['Mes_Ref'])
+        categorias = nuevas['Categoria'].str.strip().str.title()
+        for (mes, cat), total in valores.groupby([meses, categorias]).sum().items():
+            por_cat = self._totales.setdefault(int(mes), {})
+            por_cat[cat] = por_cat.get(cat, 0.0) + float(total)
+        for (mes, banco), total in valores.groupby([meses, nuevas['Banco'].str.strip()]).sum().items():
+            por_banco = self._bancos.setdefault(int(mes), {})
+            por_banco[banco] = por_banco.get(banco, 0.0) + float(total)
+
+    def reporte(self, mes_idx):
+        """(gastos por categoría del mes, límites, hay_registros)."""
+        self.sincronizar()
+        with self._lock:
+            gastos = dict(self._totales[mes_idx] if mes_idx in self._totales else self._archivo.get(mes_idx, {}))
+            return gastos, dict(self._limites), self._n_filas > 0 or bool(self._archivo)
+
+    def faturas_abiertas(self, fecha):
+        """{Banco: total de la fatura abierta en 'fecha'} (misma regla que la zona 1 del
+        dashboard). Una fatura abierta nunca está archivada: basta con Registros."""
+        self.sincronizar()
+        with self._lock:
+            bancos = {b for por_banco in self._bancos.values() for b in por_banco}
+            faturas = {b: self._bancos.get(indice_primer_pago(fecha, b), {}).get(b, 0.0) for b in bancos}
+        return {b: total for b, total in sorted(faturas.items()) if total > 0}
+
+def obtener_cache_reporte():
+    return instancia_unica('cache_reporte', CacheReporte)
+
+# --- CUBO DE AGREGADOS ---
+class CuboGastos:
+    """Suma de 'Valor' por (Mes_Idx, Banco, Quem, Categoria), calculada una vez por carga.
+    KPIs, faturas abiertas, torta y gráfico de orçamento son cortes de este cubo.
+    Con la misma generación el libro tipado solo crece (LibroRegistros), así que las filas
+    nuevas se suman al cubo sin recalcular el resto. El dashboard tiene uno por sesión:
+    dos sesiones con versiones distintas no se pisan.
+    Los meses archivados entran ya sumados desde el resumen (fijar_archivo); un mes con
+    filas vivas usa solo esas (si no, un archivado cortado a mitad contaría doble)."""
+    CLAVES = ['Mes_Idx', 'Banco', 'Quem', 'Categoria']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._serie = self._vacio()
+        self._archivo = self._vacio()
+        self._generacion = None
+        self._gen_archivo = None
+        self._n_filas = 0
+
+    def _vacio(self):
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_tuples([], names=self.CLAVES))
+
+    def actualizar(self, df, generacion):
+        with self._lock:
+            if generacion != self._generacion or len(df) < self._n_filas:
+                # Espejo reconstruido: el prefijo ya no es el mismo, rehacemos desde cero
+                self._serie, self._n_filas = self._vacio(), 0
+            if len(df) > self._n_filas:
+                nuevas = df.iloc[self._n_filas:]
+                parcial = nuevas.groupby(self.CLAVES, sort=False, observed=True)['Valor'].sum()
+                self._serie = self._serie.add(parcial, fill_value=0).sort_index()
+            self._generacion, self._n_filas = generacion, len(df)
+
+    def fijar_archivo(self, resumen, generacion):
+        with self._lock:
+            if generacion == self._gen_archivo: return
+            self._archivo = resumen.groupby(self.CLAVES, observed=True)['Valor'].sum() if len(resumen) else self._vacio()
+            self._gen_archivo = generacion
+
+    def meses_archivados(self):
+        """Meses que se leen del archivo (los que ya no tienen filas vivas)."""
+        with self._lock:
+            vivos = set(self._serie.index.get_level_values('Mes_Idx'))
+            return sorted(int(m) for m in self._archivo.index.get_level_values('Mes_Idx').unique() if m not in vivos)
+
+    def _corte(self, mes):
+        with self._lock:
+            serie = self._serie if mes in self._serie.index.get_level_values('Mes_Idx') else self._archivo
+        if mes not in serie.index.get_level_values('Mes_Idx'): return self._vacio()
+        return serie.xs(mes, level='Mes_Idx', drop_level=False)
+
+    def total(self, mes):
+        return float(self._corte(mes).sum())
+
+    def por_categoria(self, mes):
+        return self._corte(mes).groupby(level='Categoria', observed=True).sum().rename('Valor')
+
+    def por_banco_quien(self, mes):
+        return self._corte(mes).groupby(level=['Banco', 'Quem'], observed=True).sum().rename('Valor')
+
+    def pares_banco_quien(self):
+        with self._lock:
+            return sorted(self._serie.index.droplevel(['Mes_Idx', 'Categoria']).unique())
+
+# --- Carga para el Dashboard ---
+MAPA_COLUMNAS = {
+    'Monto': 'Valor', 'Monto_Total': 'Valor', 
+    'Quien': 'Quem', 'Persona': 'Quem',
+    'Descripcion': 'Descricao', 'Descripción': 'Descricao',
+    'Categoria': 'Categoria', 'Mes_Ref': 'Mes_Ref', 'Banco': 'Banco', 'Limite': 'Limite'
+}
+
+def limpiar_registros(df_r):
+    """Registros (o una pestaña archivada) en texto -> libro tipado con 'Valor' en float."""
+    df_r = df_r.rename(columns=MAPA_COLUMNAS).drop(columns=[COLUMNA_ID], errors='ignore') # el dashboard no lo usa
+    if df_r.empty: return df_r
+    if 'Quem' not in df_r.columns: df_r['Quem'] = 'Geral'
+    invalidos = 0
+    if 'Valor' in df_r.columns:
+        df_r['Valor'], invalidos = parsear_montos(df_r['Valor'])
+    df_r = tipar_registros(df_r)
+    df_r.attrs['valores_invalidos'] = invalidos
+    return df_r
+
+def _unir_categorias(a, b, orden=None):
+    """Dos columnas category una detrás de otra; si b trae categorías nuevas se reordenan
+    (alfabético, o por 'orden': clave numérica de cada categoría)."""
+    unida = pd.api.types.union_categoricals([a, b], ignore_order=True)
+    if len(unida.categories) > len(a.cat.categories):
+        categorias = pd.Index(unida.categories)
+        posiciones = np.argsort(orden(categorias), kind='stable') if orden else np.argsort(categorias, kind='stable')
+        unida = unida.reorder_categories(categorias[posiciones])
+    return unida.as_ordered() if a.cat.ordered else unida
+
+def anexar_libro(libro, nuevas):
+    """Libro tipado + filas nuevas ya tipadas (mismas columnas) -> libro nuevo, igual al
+    que daría tipar todo junto. Ninguno de los dos se modifica."""
+    columnas = {}
+    for c in libro.columns:
+        if c == 'Mes_Ref' and isinstance(libro[c].dtype, pd.CategoricalDtype):
+            columnas[c] = _unir_categorias(libro[c], nuevas[c], orden=lambda m: mes_a_indice(pd.Series(m)).to_numpy())
+        elif isinstance(libro[c].dtype, pd.CategoricalDtype):
+            columnas[c] = _unir_categorias(libro[c], nuevas[c])
+        else:
+            columnas[c] = np.concatenate([libro[c].to_numpy(), nuevas[c].to_numpy()])
+    unido = pd.DataFrame(columnas, index=pd.RangeIndex(len(libro) + len(nuevas)))
+    return unido.astype({c: libro[c].dtype for c in libro.columns if not isinstance(libro[c].dtype, pd.CategoricalDtype)})
+
+class LibroRegistros:
+    """Registros tipado (limpiar_registros) de la última versión del espejo. Mientras la
+    generación no cambie el espejo solo crece: se tipan las filas nuevas y se anexan al
+    libro anterior. Si se reconstruyó, se tipa todo. Cada versión es un frame nuevo: los
+    ya entregados (cachés del dashboard) no se tocan."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._libro = None
+        self._generacion = None
+        self._n_filas = 0
+
+    def obtener(self):
+        crudo, generacion = obtener_espejos()[TAB_REGISTROS].instantanea()
+        with self._lock:
+            libro = self._libro
+            if libro is not None and generacion == self._generacion and len(crudo) == self._n_filas:
+                return libro
+            incremental = (libro is not None and generacion == self._generacion and self._n_filas < len(crudo)
+                           and len(libro.columns) > 0)
+            if incremental:
+                METRICAS.contar("libro.filas_anexadas", len(crudo) - self._n_filas)
+                nuevas = limpiar_registros(crudo.iloc[self._n_filas:].copy())
+                invalidos = libro.attrs.get('valores_invalidos', 0) + nuevas.attrs.get('valores_invalidos', 0)
+                libro = anexar_libro(libro, nuevas)
+                libro.attrs['valores_invalidos'] = invalidos
+            else:
+                libro = limpiar_registros(crudo.copy())
+            libro.attrs['generacion'] = generacion
+            self._libro, self._generacion, self._n_filas = libro, generacion, len(crudo)
+            return libro
+
+def obtener_libro_registros():
+    return instancia_unica('libro_registros', LibroRegistros)
+
+@METRICAS.medir("cargar_tablas")
+def cargar_tablas():
+    """(registros, orcamento) limpios, leídos del espejo local. Registros sale con
+    tipos compactos (ver tipar_registros) y es de solo lectura: se comparte entre
+    llamadas y entre versiones (LibroRegistros)."""
+    try:
+        df_r = obtener_libro_registros().obtener()
+        df_p = leer_tab(TAB_ORCAMENTO)
+    except Exception as e:
+        METRICAS.contar("cargar_tablas.errores")
+        print(f"⚠️ No se pudieron leer los datos: {e}")
+        return pd.DataFrame(), pd.DataFrame()
+    
+    # Estandarizar nombres
+    df_p.rename(columns=MAPA_COLUMNAS, inplace=True)
+
+    if not df_p.empty:
+        if 'Limite' in df_p.columns:
+            df_p['Limite'], df_p.attrs['valores_invalidos'] = parsear_montos(df_p['Limite'])
+        if 'Categoria' in df_p.columns: df_p['Categoria'] = df_p['Categoria'].astype(str).str.strip()
+        
+    return df_r, df_p
+
+# --- Meses Archivados (ver archivo.py) ---
+COLUMNAS_RESUMEN = ['Mes_Ref', 'Banco', 'Quem', 'Categoria', 'Valor', 'Filas']
+
+def cargar_resumen_archivo():
+    """Totales precalculados de los meses archivados: Mes_Idx, Banco, Quem, Categoria, Valor.
+    Es una pestaña chica: el dashboard y el reporte no necesitan las filas archivadas."""
+    resumen = pd.DataFrame({'Mes_Idx': pd.Series(dtype=np.int16), 'Banco': pd.Series(dtype=object), 'Quem': pd.Series(dtype=object),
+                            'Categoria': pd.Series(dtype=object), 'Valor': pd.Series(dtype=float)})
+    try:
+        espejo = obtener_espejos()[TAB_RESUMEN_ARCHIVO]
+        df = espejo.datos()
+    except Exception as e:
+        METRICAS.contar("cargar_resumen_archivo.errores")
+        print(f"⚠️ No se pudo leer el resumen del archivo: {e}")
+        return resumen
+    if not df.empty and set(COLUMNAS_RESUMEN[:5]) <= set(df.columns):
+        valores, _ = parsear_montos(df['Valor'])
+        resumen = pd.DataFrame({
+            'Mes_Idx': mes_a_indice(df['Mes_Ref']),
+            'Banco': df['Banco'].str.strip(), 'Quem': df['Quem'].str.strip(), 'Categoria': df['Categoria'].str.strip(),
+            'Valor': valores.fillna(0.0),
+        })
+        # Una clave por fila: si al reescribir el resumen falló el borrado de la cola, vale la primera
+        resumen = resumen.drop_duplicates(['Mes_Idx', 'Banco', 'Quem', 'Categoria'], keep='first')
+    resumen.attrs['generacion'] = (espejo.generacion, len(df))
+    return resumen
+
+@METRICAS.medir("leer_mes_archivado")
+def leer_mes_archivado(mes):
+    """Filas (libro tipado) de un mes archivado; la pestaña del año se descarga al pedirla."""
+    if mes == MES_INVALIDO: return pd.DataFrame()
+    df = limpiar_registros(obtener_espejo_archivo(mes // 12).datos())
+    if df.empty or 'Mes_Idx' not in df.columns: return df
+    return df[df['Mes_Idx'].to_numpy() == mes]
@@ -0,0 +1,53 @@
+import sys
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+
+from metricas import METRICAS
+from nucleo import abrir_hogar
+
+# ==============================================================================
+# DIAGNÓSTICO: TIEMPOS Y CONTADORES DEL PROCESO (metricas.py)
+# ==============================================================================
+st.set_page_config(page_title="Diagnóstico", layout="wide", page_icon="🩺")
+st.title("🩺 Diagnóstico")
+
+# La familia (y su clave) la abre el dashboard; lo del bot se muestra solo de esa familia
+hogar = abrir_hogar(st.session_state.get("hogar"), st.session_state.get("clave_hogar"))
+if hogar is None:
+    st.error("⚠️ Entre pela página principal para escolher a família.")
+    st.stop()
+
+datos = METRICAS.resumen()
+st.caption(f"Métricas desde {datetime.fromtimestamp(datos['desde']):%d/%m/%Y %H:%M:%S} (reiniciam com o processo)")
+
+st.subheader("⏱️ Tempos")
+if datos['tiempos']:
+    df_tiempos = pd.DataFrame.from_dict(datos['tiempos'], orient='index').sort_index()
+    df_tiempos.index.name = 'Operação'
+    st.dataframe(df_tiempos.style.format({c: "{:,.1f}" for c in df_tiempos.columns if c.endswith('_ms')}),
+                 use_container_width=True)
+else:
+    st.info("Nenhuma medição ainda.")
+
+st.subheader("🔢 Contadores")
+if datos['contadores']:
+    df_contadores = pd.Series(datos['contadores'], name='Total').sort_index().to_frame()
+    df_contadores.index.name = 'Evento'
+    st.dataframe(df_contadores, use_container_width=True)
+else:
+    st.info("Nenhum erro, reintento ou reinício registrado.")
+
+# El bot solo está en este proceso si el dashboard lo hospeda (BOT_EN_DASHBOARD)
+if 'bot_telegram' in sys.modules:
+    st.subheader("🤖 Bot")
+    estado = sys.modules['bot_telegram'].obtener_motor().estadisticas(hogar.id)
+    cola = estado['cola_escritura']
+    st.metric("📮 Gastos aguardando a planilha", cola['gastos'])
+    if cola['ultimo_error']: st.warning(f"Último erro ao gravar: {cola['ultimo_error']}")
+    st.json(estado)
+
+c1, c2 = st.columns(2)
+c1.download_button("⬇️ Exportar JSON", METRICAS.exportar_json(), file_name="metricas.json", mime="application/json")
+c2.download_button("⬇️ Exportar Prometheus", METRICAS.exportar_prometheus(), file_name="metricas.prom", mime="text/plain")
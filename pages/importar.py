@@ -0,0 +1,46 @@
+import streamlit as st
+
+from nucleo import asegurar_credenciales, abrir_hogar
+
+# ==============================================================================
+# IMPORTAR EXTRATOS (CSV / OFX) A REGISTROS (importador.py)
+# ==============================================================================
+st.set_page_config(page_title="Importar Extrato", layout="wide", page_icon="📥")
+st.title("📥 Importar Extrato")
+
+error_credenciales = asegurar_credenciales(st.secrets)
+if error_credenciales:
+    st.error(error_credenciales)
+    st.stop()
+# La familia (y su clave) la abre el dashboard
+hogar = abrir_hogar(st.session_state.get("hogar"), st.session_state.get("clave_hogar"))
+if hogar is None:
+    st.error("⚠️ Entre pela página principal para escolher a família.")
+    st.stop()
+
+archivo = st.file_uploader("Extrato do banco (CSV ou OFX)", type=["csv", "ofx", "txt"])
+c1, c2, c3 = st.columns(3)
+banco = c1.selectbox("Banco", hogar.bancos + ["PIX"])
+quien = c2.selectbox("Quem", hogar.personas)
+# None: el importador deduce la categoría de cada descripción (categorizador.py)
+categoria = c3.selectbox("Categoria", [None] + hogar.categorias, format_func=lambda c: c or "Automática")
+simular = st.checkbox("Só simular (não grava nada)", value=True)
+
+if archivo and st.button("Importar", type="primary"):
+    import importador # pandas/regex del importador solo se cargan en esta página
+    barra = st.progress(0.0, text="Lendo extrato...")
+    total = max(archivo.size, 1)
+    def progreso(resumen):
+        barra.progress(min(archivo.tell() / total, 1.0), text=f"{resumen['escritas']} linhas em {resumen['lotes']} lote(s)")
+    try:
+        resumen = importador.importar(archivo, banco, quien, categoria, simular=simular, progreso=progreso)
+    except Exception as e:
+        barra.empty()
+        st.error(f"Erro ao importar: {e}")
+    else:
+        barra.progress(1.0, text="Concluído")
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Linhas lidas", resumen['lidas'])
+        k2.metric("Gastos", resumen['gastos'])
+        k3.metric("Já registrados", resumen['duplicadas'])
+        k4.metric("A gravar" if simular else "Gravados", resumen['escritas'])
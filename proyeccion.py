@@ -0,0 +1,131 @@
+"""Proyección de las cuotas ya comprometidas en los próximos meses.
+
+Cada compra en cuotas deja en Registros una fila por cuota: el bot las escribe todas
+de una vez; el importador trae solo la del extrato, con Parc/Parc_Atual. En una sola
+pasada sobre el libro tipado la proyección junta:
+  - las cuotas registradas con Mes_Ref desde el mes actual, y
+  - las que todavía faltan de cada compra: desde la última cuota vista (Parc_Atual)
+    hasta Parc, una por mes y con el mismo valor.
+El resultado es una matriz meses × (Banco, Quem, Categoria) comparada con los límites
+de Orcamento. Se calcula una vez por versión de los datos (una caché por hogar); el
+dashboard y el bot leen la misma.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metricas import METRICAS
+from nucleo import MES_INVALIDO, instancia_unica, version_datos, cargar_tablas, indice_de_fecha
+
+HORIZONTE_PROYECCION = 24 # meses desde el actual (incluido)
+MAX_PROYECCIONES = 4 # versiones guardadas por hogar (el dashboard y el bot pueden ir desfasados)
+CLAVES = ['Banco', 'Quem', 'Categoria']
+# Número de cuota al final de la descripción: ' (3/10)' del bot, 'Parc 03/10' o '03/10' de los extratos
+REGEX_SUFIJO_CUOTA = r'(?i)\s*(?:\(\s*\d{1,2}\s*/\s*\d{1,2}\s*\)|parc(?:ela)?\.?\s*\d{1,2}\s*(?:/|de)\s*\d{1,2}|\b\d{1,2}/\d{1,2})\s*$'
+
+def _compras(descripciones):
+    """Código de compra por fila: la descripción sin el número de cuota ('Tv (1/3)' y
+    'Tv (2/3)' son la misma compra). Cada descripción distinta se limpia una vez."""
+    if not isinstance(descripciones.dtype, pd.CategoricalDtype): descripciones = descripciones.astype('category')
+    limpias = pd.Index(descripciones.cat.categories.astype(str)).str.replace(REGEX_SUFIJO_CUOTA, '', regex=True)
+    codigos, _ = pd.factorize(limpias.str.strip().str.lower())
+    return np.append(codigos, -1)[descripciones.cat.codes.to_numpy()]
+
+def cuotas_faltantes(df):
+    """Cuotas futuras que aún no están en Registros (Mes_Idx, Banco, Quem, Categoria, Valor).
+    Una compra son las filas con iguales Data, Banco, Quem, Parc y descripción sin el
+    número de cuota; se extiende desde su última cuota registrada."""
+    en_cuotas = df['Parc'].to_numpy() > 1
+    cuotas = df.loc[en_cuotas, ['Data', 'Parc', 'Parc_Atual', 'Mes_Idx', 'Valor'] + CLAVES].assign(
+        Compra=_compras(df.loc[en_cuotas, 'Descricao']) if 'Descricao' in df.columns else 0)
+    cuotas = cuotas[cuotas['Mes_Idx'] != MES_INVALIDO]
+    # Dos compras iguales el mismo día son dos compras: la n-ésima cuota k va con la n-ésima compra
+    compra = ['Data', 'Banco', 'Quem', 'Parc', 'Compra']
+    cuotas = cuotas.assign(Ocurrencia=cuotas.groupby(compra + ['Parc_Atual'], observed=True, dropna=False).cumcount())
+    ultimas = cuotas.sort_values('Parc_Atual', kind='stable').drop_duplicates(compra + ['Ocurrencia'], keep='last')
+    faltan = (ultimas['Parc'].to_numpy(np.int64) - ultimas['Parc_Atual'].to_numpy(np.int64)).clip(min=0)
+    ultimas, faltan = ultimas[faltan > 0], faltan[faltan > 0]
+
+    # Una fila por cuota faltante, como en cronograma_cuotas: 'fila' es la compra y 'k' cuántos meses después
+    fila = np.repeat(np.arange(len(ultimas)), faltan)
+    k = np.arange(len(fila)) - np.repeat(np.cumsum(faltan) - faltan, faltan) + 1
+    faltantes = ultimas.iloc[fila][CLAVES + ['Valor']].reset_index(drop=True)
+    faltantes.insert(0, 'Mes_Idx', ultimas['Mes_Idx'].to_numpy(np.int64)[fila] + k)
+    return faltantes
+
+@METRICAS.medir("proyeccion.calcular")
+def proyectar(df_r, df_p, inicio, horizonte=HORIZONTE_PROYECCION):
+    """Cuotas comprometidas de los meses [inicio, inicio + horizonte) frente al orçamento.
+    Devuelve un dict con:
+      'matriz': meses × (Banco, Quem, Categoria), lo comprometido;
+      'categorias': meses × Categoria, lo comprometido (columnas: las del orçamento y las con gasto);
+      'estouradas': meses × Categoria, True donde lo comprometido ya pasa el límite;
+      'resumen': por mes Comprometido, Estimado (parte de cuotas aún no registradas),
+                 Orcamento, Livre y Estouradas.
+    Los meses van como índice entero (Mes_Idx)."""
+    meses = pd.RangeIndex(inicio, inicio + horizonte, name='Mes_Idx')
+    vacio = pd.DataFrame(0.0, index=meses, columns=pd.MultiIndex.from_tuples([], names=CLAVES))
+    if df_r.empty or not {'Mes_Idx', 'Valor', 'Parc', 'Parc_Atual'} <= set(df_r.columns):
+        matriz, estimado = vacio, pd.Series(0.0, index=meses)
+    else:
+        en_rango = (df_r['Mes_Idx'].to_numpy() >= meses.start) & (df_r['Mes_Idx'].to_numpy() < meses.stop)
+        registradas = df_r.loc[en_rango, ['Mes_Idx'] + CLAVES + ['Valor']]
+        faltantes = cuotas_faltantes(df_r)
+        faltantes = faltantes[(faltantes['Mes_Idx'] >= meses.start) & (faltantes['Mes_Idx'] < meses.stop)]
+        registradas = registradas.astype({'Mes_Idx': np.int64})
+        serie = pd.concat([registradas, faltantes]).groupby(['Mes_Idx'] + CLAVES, observed=True)['Valor'].sum()
+        matriz = serie.unstack(CLAVES).reindex(meses).fillna(0.0) if len(serie) else vacio
+        matriz = matriz.loc[:, matriz.ne(0).any()]
+        estimado = faltantes.groupby('Mes_Idx')['Valor'].sum().reindex(meses, fill_value=0.0)
+
+    # Orçamento contra lo comprometido, por categoría (nombres como en el reporte del bot)
+    if not df_p.empty and {'Categoria', 'Limite'} <= set(df_p.columns):
+        limites = df_p.groupby(df_p['Categoria'].astype(str).str.strip().str.title())['Limite'].sum()
+    else:
+        limites = pd.Series(dtype=float)
+    categorias = matriz.T.groupby(matriz.columns.get_level_values('Categoria').astype(str).str.strip().str.title()).sum().T
+    columnas = limites.index.union(categorias.columns)
+    categorias = categorias.reindex(index=meses, columns=columnas, fill_value=0.0)
+    limites = limites.reindex(columnas, fill_value=0.0)
+    estouradas = categorias.gt(limites, axis=1) & limites.gt(0).to_numpy()
+
+    comprometido = categorias.sum(axis=1)
+    resumen = pd.DataFrame({
+        'Comprometido': comprometido,
+        'Estimado': estimado,
+        'Orcamento': float(limites.sum()),
+        'Livre': float(limites.sum()) - comprometido,
+        'Estouradas': estouradas.sum(axis=1),
+    }, index=meses)
+    return {'matriz': matriz, 'categorias': categorias, 'estouradas': estouradas, 'resumen': resumen}
+
+class CacheProyeccion:
+    """LRU (versión, mes actual, horizonte) -> proyección del hogar. Con la misma versión
+    el dashboard (en cada rerun) y el bot reciben la proyección ya hecha."""
+
+    def __init__(self, maximo=MAX_PROYECCIONES):
+        self._lock = threading.Lock()
+        self._maximo = maximo
+        self._memo = OrderedDict()
+
+    def obtener(self, version=None, tablas=None, horizonte=HORIZONTE_PROYECCION):
+        """Proyección desde el mes actual. 'tablas': (registros, orcamento) ya cargados
+        (el dashboard pasa los suyos); si faltan se leen del espejo local."""
+        clave = (version_datos() if version is None else version, indice_de_fecha(datetime.now()), horizonte)
+        with self._lock:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                METRICAS.contar("proyeccion.cache_aciertos")
+                return self._memo[clave]
+        df_r, df_p = tablas if tablas is not None else cargar_tablas()
+        resultado = proyectar(df_r, df_p, clave[1], horizonte)
+        with self._lock:
+            self._memo[clave] = resultado
+            while len(self._memo) > self._maximo: self._memo.popitem(last=False)
+        return resultado
+
+def obtener_proyeccion():
+    return instancia_unica('proyeccion', CacheProyeccion)
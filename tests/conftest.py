@@ -0,0 +1,5 @@
+"""Los tests importan los módulos de la raíz del repo (nucleo, archivo, ...) sin instalarlo."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,121 @@
+"""archivo.py cortado a mitad (falla al reescribir Registros) y repetido: ningún mes
+se cuenta dos veces, ni en el reporte del bot ni en el cubo del dashboard."""
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from almacen_falso import almacen_sintetico
+from archivo import archivar
+from nucleo import (
+    TAB_REGISTROS, TAB_RESUMEN_ARCHIVO, MESES_ABIERTOS, CuboGastos,
+    usar_almacen, obtener_espejos, obtener_cache_reporte, cargar_tablas, cargar_resumen_archivo,
+    parsear_montos, mes_a_indice, indice_de_fecha, tab_archivo,
+)
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # .espejo/ del test
+    almacen = almacen_sintetico(3000, semilla=1)
+    usar_almacen(almacen)
+    return almacen
+
+def totales_originales(almacen):
+    filas = almacen.worksheet(TAB_REGISTROS)._filas
+    df = pd.DataFrame(filas[1:], columns=filas[0])
+    valores, _ = parsear_montos(df['Valor'])
+    return valores.groupby(mes_a_indice(df['Mes_Ref']).to_numpy()).sum().round(2).to_dict()
+
+def totales_leidos(meses):
+    """{mes: (total del reporte del bot, total del cubo del dashboard)}"""
+    for espejo in obtener_espejos().values(): espejo.sincronizar(forzar=True)
+    df_r, _ = cargar_tablas()
+    resumen = cargar_resumen_archivo()
+    cubo = CuboGastos()
+    cubo.actualizar(df_r, df_r.attrs['generacion'])
+    cubo.fijar_archivo(resumen, resumen.attrs['generacion'])
+    reporte = obtener_cache_reporte()
+    return {m: (round(sum(reporte.reporte(m)[0].values()), 2), round(cubo.total(m), 2)) for m in meses}
+
+def comprobar(originales):
+    for mes, (bot, dashboard) in totales_leidos(originales).items():
+        assert bot == pytest.approx(originales[mes]), mes
+        assert dashboard == pytest.approx(originales[mes]), mes
+
+@pytest.mark.parametrize("metodo", ["update", "delete_rows"])
+def test_archivado_cortado_y_repetido_no_duplica(almacen, metodo, monkeypatch):
+    originales = totales_originales(almacen)
+    limite = indice_de_fecha(datetime.now()) - MESES_ABIERTOS
+    n_cerradas = sum(1 for f in almacen.worksheet(TAB_REGISTROS)._filas[1:] if mes_a_indice([f[1]])[0] < limite)
+    n_vivas = len(almacen.worksheet(TAB_REGISTROS)._filas) - 1 - n_cerradas
+    assert n_cerradas > 0
+
+    def falla(*args, **kwargs):
+        raise ConnectionError("Sheets fora do ar")
+    with monkeypatch.context() as m:
+        m.setattr(almacen.worksheet(TAB_REGISTROS), metodo, falla)
+        with pytest.raises(ConnectionError):
+            archivar()
+    comprobar(originales)
+
+    # Si falló el borrado, Registros ya quedó reescrita: el segundo archivado solo quita las filas en blanco
+    resultado = archivar()
+    assert resultado['filas_archivadas'] == (n_cerradas if metodo == "update" else 0)
+    comprobar(originales)
+    pestanas = almacen.hoja().pestanas
+    anuales = [t for t in pestanas if t.startswith(tab_archivo(''))]
+    assert sum(len(pestanas[t]._filas) - 1 for t in anuales) == n_cerradas
+    assert len(pestanas[TAB_REGISTROS]._filas) - 1 == n_vivas
+    claves = [tuple(f[:4]) for f in pestanas[TAB_RESUMEN_ARCHIVO]._filas[1:]]
+    assert len(claves) == len(set(claves))
+
+    # Otra vez: no hay nada que archivar y nada cambia
+    assert archivar()['filas_archivadas'] == 0
+    comprobar(originales)
+
+def test_reescribe_registros_sin_convertir_numeros_en_texto(almacen):
+    # Como en una hoja real: Valor y las cuotas son números, no texto
+    ws = almacen.worksheet(TAB_REGISTROS)
+    for f in ws._filas[1:]:
+        f[5], f[6], f[7] = float(f[5].replace('.', '').replace(',', '.')), int(f[6]), int(f[7])
+    originales = totales_originales_nativos(ws._filas)
+    resultado = archivar()
+    assert resultado['filas_archivadas'] > 0
+    vivas = almacen.worksheet(TAB_REGISTROS)._filas[1:]
+    assert all(type(f[5]) is float and type(f[6]) is int and type(f[7]) is int for f in vivas)
+    for anio in resultado['anios']:
+        filas = almacen.worksheet(tab_archivo(anio))._filas[1:]
+        assert all(isinstance(f[5], float) and type(f[6]) is int and type(f[7]) is int for f in filas)
+    comprobar(originales)
+
+def totales_originales_nativos(filas):
+    df = pd.DataFrame(filas[1:], columns=filas[0])
+    return df['Valor'].groupby(mes_a_indice(df['Mes_Ref']).to_numpy()).sum().round(2).to_dict()
+
+def test_el_vaciado_de_la_cola_espera_al_archivado(almacen, tmp_path, monkeypatch):
+    import cola_escritura
+    from cola_escritura import ColaEscrituras, vaciar_hogar
+    from nucleo import hogar_actual
+    monkeypatch.setattr(cola_escritura, "obtener_graficos", lambda: type("G", (), {"pregenerar": lambda self: None})())
+    cola = ColaEscrituras(str(tmp_path / "cola.sqlite"))
+    gasto = list(almacen.worksheet(TAB_REGISTROS)._filas[-1][:10])
+    gasto[9] = "Gasto do bot durante o arquivamento"
+    cola.encolar("g1", hogar_actual().id, 1, [gasto])
+
+    # El bot escribe justo cuando Registros tiene las filas sobrantes en blanco, antes del borrado
+    ws = almacen.worksheet(TAB_REGISTROS)
+    borrar, vaciado, hilos = ws.delete_rows, [], []
+    def borrar_con_bot_escribiendo(*args):
+        hilo = threading.Thread(target=lambda: vaciado.append(vaciar_hogar(cola)))
+        hilo.start()
+        hilo.join(0.5)
+        assert hilo.is_alive() # espera a que termine el archivado
+        borrar(*args)
+        hilos.append(hilo)
+    monkeypatch.setattr(ws, "delete_rows", borrar_con_bot_escribiendo)
+    archivar()
+    hilos[0].join(5)
+    assert vaciado == [1]
+    descripciones = [f[9] for f in ws._filas[1:]]
+    assert descripciones.count("Gasto do bot durante o arquivamento") == 1
@@ -0,0 +1,30 @@
+"""bot_telegram se importa sin token y sin efectos; crear_bot valida el token."""
+import importlib
+import os
+
+import pytest
+
+@pytest.fixture
+def bot_telegram(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TOKEN_TELEGRAM", raising=False)
+    import bot_telegram
+    modulo = importlib.reload(bot_telegram)
+    yield modulo
+    modulo.bot = modulo.motor = modulo.conversaciones = None
+
+def test_importar_no_crea_nada(bot_telegram):
+    assert bot_telegram.bot is None and bot_telegram.conversaciones is None
+    assert not os.path.exists(".estado")
+
+@pytest.mark.parametrize("token", ["", "TOKEN_DUMMY"])
+def test_token_invalido(bot_telegram, token):
+    with pytest.raises(ValueError):
+        bot_telegram.crear_bot(token)
+    assert bot_telegram.bot is None
+
+def test_crear_bot_registra_los_handlers(bot_telegram):
+    bot = bot_telegram.crear_bot("0:x")
+    assert bot_telegram.crear_bot() is bot # una vez por proceso
+    assert [h['function'].__name__ for h in bot.message_handlers][0] == 'despachar_paso'
+    assert len(bot.callback_query_handlers) == 1
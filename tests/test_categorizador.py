@@ -0,0 +1,40 @@
+"""Mensaje único del bot: el banco y la persona escritos van a su campo y no quedan
+repetidos en la descripción."""
+import pytest
+
+from almacen_falso import almacen_sintetico
+from categorizador import interpretar_mensaje
+from nucleo import LISTA_BANCOS, LISTA_PERSONAS, TAB_REGISTROS, usar_almacen, obtener_espejos
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    almacen = almacen_sintetico(200, semilla=3)
+    usar_almacen(almacen)
+    return almacen
+
+def test_banco_y_persona_salen_de_la_descripcion():
+    banco, persona = LISTA_BANCOS[0], LISTA_PERSONAS[0]
+    datos = interpretar_mensaje(f"50,00 mercado {banco.lower()} {persona.lower()}")
+    assert datos['banco'] == banco and datos['quien'] == persona
+    assert datos['descripcion'] == "Mercado"
+
+def test_solo_nombres_deja_la_descripcion_vacia():
+    datos = interpretar_mensaje(f"300 3x {LISTA_BANCOS[0]}")
+    assert datos['cuotas'] == 3 and datos['descripcion'] is None
+
+def test_interpretar_no_consulta_la_hoja(almacen):
+    obtener_espejos()[TAB_REGISTROS].intervalo = 0 # cualquier datos() iría a la hoja
+    interpretar_mensaje("50,00 mercado")
+    almacen.red.contadores['llamadas'] = 0
+    interpretar_mensaje("20 padaria")
+    assert almacen.red.contadores['llamadas'] == 0
+
+    # Lo que el espejo trae después (ej. al pedir el reporte) se aprende sin volver a la hoja
+    ws = almacen.worksheet(TAB_REGISTROS)
+    ws.append_rows([["01/01/2026", "01-2026", LISTA_PERSONAS[0], "Debito", LISTA_BANCOS[0], "10,00",
+                     "1", "1", "Lazer", "Kartodromo"]] * 3)
+    obtener_espejos()[TAB_REGISTROS].sincronizar(inmediato=True)
+    almacen.red.contadores['llamadas'] = 0
+    assert interpretar_mensaje("80 kartodromo")['categoria'] == "Lazer"
+    assert almacen.red.contadores['llamadas'] == 0
@@ -0,0 +1,105 @@
+"""Cola de escritura del bot: las filas llegan a Registros en las columnas que la hoja
+tenga, un reintento nunca duplica y lo pendiente sobrevive a reinicios, a la falta de
+cuota y a Sheets caído."""
+import pytest
+
+import cola_escritura
+import nucleo
+from almacen_falso import AlmacenMemoria, generar_orcamento
+from cola_escritura import ColaEscrituras, Vaciador, vaciar_hogar, INTERVALO_REINTENTO
+from nucleo import TAB_REGISTROS, TAB_ORCAMENTO, COLUMNAS_REGISTROS, COLUMNA_ID, usar_almacen, hogar_actual
+
+CABECERA_VIEJA = ['Data', 'Mes_Ref', 'Quien', 'Tipo', 'Banco', 'Monto', 'Parc', 'Parc_Atual', 'Categoria', 'Descripcion']
+
+class SinGraficos:
+    def pregenerar(self): pass
+
+@pytest.fixture
+def cola(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cola_escritura, "obtener_graficos", SinGraficos) # sin proceso de matplotlib
+    return ColaEscrituras(str(tmp_path / ".estado" / "cola.sqlite"))
+
+def usar_registros(filas):
+    almacen = AlmacenMemoria()
+    almacen.crear_hoja(hogar_actual().hoja, {TAB_REGISTROS: filas, TAB_ORCAMENTO: generar_orcamento(0)})
+    usar_almacen(almacen)
+    return almacen.worksheet(TAB_REGISTROS)
+
+def gasto(descripcion, valor=25.5):
+    return ['10/10/2026', '10-2026', 'Carlos', 'Debito', 'Nubank', valor, 1, 1, 'Lazer', descripcion]
+
+def test_cabecera_con_nombres_viejos(cola):
+    ws = usar_registros([CABECERA_VIEJA, ['01/10/2026', '10-2026', 'Jessy', 'Debito', 'Inter', '10,00', '1', '1',
+                                          'Casa', 'Luz']])
+    cola.encolar("g1", hogar_actual().id, 1, [gasto("Cinema")])
+    assert vaciar_hogar(cola) == 1
+    assert ws._filas[0] == CABECERA_VIEJA + [COLUMNA_ID]
+    fila = dict(zip(ws._filas[0], ws._filas[-1]))
+    assert (fila['Monto'], fila['Quien'], fila['Descripcion'], fila[COLUMNA_ID]) == (25.5, 'Carlos', 'Cinema', 'g1')
+
+def test_pestana_sin_cabecera(cola):
+    ws = usar_registros([])
+    cola.encolar("g1", hogar_actual().id, 1, [gasto("Cinema")])
+    assert vaciar_hogar(cola) == 1
+    assert ws._filas == [COLUMNAS_REGISTROS + [COLUMNA_ID], gasto("Cinema") + ['g1']]
+
+def test_reintento_de_una_escritura_que_llego_no_duplica(cola, monkeypatch):
+    ws = usar_registros([COLUMNAS_REGISTROS + [COLUMNA_ID]])
+    cola.encolar("g1", hogar_actual().id, 1, [gasto("Cinema", 100.0)] * 3) # compra en 3 cuotas
+
+    escribir = cola_escritura.escribir_filas_lote
+    def llega_sin_respuesta(hoja, filas):
+        escribir(hoja, filas)
+        raise ConnectionError("respuesta perdida")
+    monkeypatch.setattr(cola_escritura, "escribir_filas_lote", llega_sin_respuesta)
+    with pytest.raises(ConnectionError):
+        vaciar_hogar(cola)
+    assert cola.lote(hogar_actual().id)[0]['intentos'] == 1
+
+    monkeypatch.setattr(cola_escritura, "escribir_filas_lote", escribir)
+    assert vaciar_hogar(cola) == 0 # el ID ya estaba en la hoja: nada que escribir
+    assert cola.pendientes() == {}
+    assert [f[-1] for f in ws._filas[1:]] == ['g1'] * 3
+
+def test_la_cola_sobrevive_a_reabrir_el_sqlite(cola, tmp_path):
+    ws = usar_registros([COLUMNAS_REGISTROS + [COLUMNA_ID]])
+    cola.encolar("g1", hogar_actual().id, 1, [gasto("Cinema")])
+    cola.marcar_intento(["g1"])
+    cola._db.close() # el proceso se reinicia
+
+    reabierta = ColaEscrituras(str(tmp_path / ".estado" / "cola.sqlite"))
+    assert reabierta.pendientes() == {hogar_actual().id: 1}
+    assert reabierta.lote(hogar_actual().id) == [{'id': "g1", 'filas': [gasto("Cinema")], 'intentos': 1}]
+    assert vaciar_hogar(reabierta) == 1
+    assert len(ws._filas) == 2 and reabierta.pendientes() == {}
+
+@pytest.mark.parametrize("falla", ["cuota", "caida"])
+def test_sin_cuota_o_caida_queda_en_cola_con_backoff(cola, monkeypatch, falla):
+    ws = usar_registros([COLUMNAS_REGISTROS + [COLUMNA_ID]])
+    hogar = hogar_actual().id
+    cola.encolar("g1", hogar, 1, [gasto("Cinema")])
+    monkeypatch.setattr(nucleo, "PAUSA_INICIAL_REINTENTO", 0)
+    if falla == "cuota":
+        ws.hoja.red.prob_error_cuota = 1.0
+    else:
+        def caida(*args, **kwargs): raise ConnectionError("Sheets fora do ar")
+        monkeypatch.setattr(ws, "append_rows", caida)
+
+    vaciador = Vaciador(cola)
+    vaciador._vaciar_hogar(hogar)
+    assert vaciador.con_error(hogar) and vaciador._espera[hogar][1] == INTERVALO_REINTENTO
+    vaciador._vaciar_hogar(hogar)
+    assert vaciador._espera[hogar][1] == 2 * INTERVALO_REINTENTO # se duplica
+    assert cola.pendientes() == {hogar: 1} and len(ws._filas) == 1
+    assert ("Quota" if falla == "cuota" else "fora do ar") in cola.resumen(hogar)['ultimo_error']
+
+    # Durante el backoff vaciar() no lo intenta; cuando vuelve Sheets, se escribe
+    monkeypatch.setattr(vaciador._pool, "submit", lambda *args: pytest.fail("reintento antes de tiempo"))
+    vaciador.vaciar()
+    ws.hoja.red.prob_error_cuota = 0.0
+    monkeypatch.undo()
+    vaciador._espera[hogar] = (0, vaciador._espera[hogar][1])
+    vaciador._vaciar_hogar(hogar)
+    assert not vaciador.con_error(hogar)
+    assert cola.pendientes() == {} and ws._filas[-1][-1] == "g1"
@@ -0,0 +1,105 @@
+"""EspejoHoja: un cambio en la hoja lee solo desde la última fila conocida; ediciones y
+borrados hechos a mano se reflejan (al releer la pestaña entera), también con filas nuevas
+en el mismo intervalo y al arrancar con la copia vieja del disco."""
+import pytest
+
+from almacen_falso import almacen_sintetico
+from nucleo import TAB_REGISTROS, TAB_ORCAMENTO, EspejoHoja, usar_almacen
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    almacen = almacen_sintetico(300, semilla=2)
+    usar_almacen(almacen)
+    return almacen
+
+def editar(almacen, fila, valor):
+    """Cambia el Valor de la fila de datos 'fila' (base 0), como una edición a mano."""
+    almacen.worksheet(TAB_REGISTROS)._filas[fila + 1][5] = valor
+    almacen.hoja().tocar()
+
+def test_anexar_lee_solo_la_cola(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    generacion = espejo.generacion
+    ws = almacen.worksheet(TAB_REGISTROS)
+    ws.append_rows([ws._filas[1]])
+    leidas = almacen.red.contadores['filas_leidas']
+    espejo.sincronizar(inmediato=True)
+    assert almacen.red.contadores['filas_leidas'] - leidas == 2 # la última conocida y la nueva
+    assert len(espejo.datos()) == 301 and espejo.generacion == generacion
+
+def test_cambio_en_otra_pestana_no_relee(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    generacion = espejo.generacion
+    almacen.worksheet(TAB_ORCAMENTO)._filas[1][1] = '999'
+    almacen.hoja().tocar()
+    leidas = almacen.red.contadores['filas_leidas']
+    espejo.sincronizar(inmediato=True)
+    assert almacen.red.contadores['filas_leidas'] - leidas == 1 and espejo.generacion == generacion
+
+def test_edicion_con_filas_nuevas_en_el_mismo_intervalo(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    generacion = espejo.generacion
+    ws = almacen.worksheet(TAB_REGISTROS)
+    editar(almacen, 4, '9.999,00')
+    ws.append_rows([ws._filas[1]])
+    espejo.sincronizar(inmediato=True) # solo la cola: la edición llega con la próxima relectura
+    assert len(espejo.datos()) == 301 and espejo.generacion == generacion
+    espejo.reconciliacion = 0
+    almacen.hoja().tocar()
+    espejo.sincronizar(inmediato=True)
+    assert espejo.datos().loc[4, 'Valor'] == '9.999,00'
+    assert len(espejo.datos()) == 301 and espejo.generacion > generacion
+
+def test_borrado(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    almacen.worksheet(TAB_REGISTROS).delete_rows(10)
+    espejo.sincronizar(inmediato=True)
+    assert len(espejo.datos()) == 299
+
+def test_copia_del_disco_se_reconcilia_al_arrancar(almacen):
+    EspejoHoja(almacen, TAB_REGISTROS).datos() # deja el Parquet en .espejo/
+    editar(almacen, 7, '2,00')
+    ws = almacen.worksheet(TAB_REGISTROS)
+    ws.append_rows([ws._filas[1]]) # y el bot anexó mientras el proceso estaba parado
+    assert EspejoHoja(almacen, TAB_REGISTROS).datos().loc[7, 'Valor'] == '2,00'
+
+def test_edicion_antes_de_una_escritura_propia(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS, reconciliacion=0)
+    espejo.datos()
+    editar(almacen, 4, '9.999,00')
+    ws = almacen.worksheet(TAB_REGISTROS)
+    fila = list(ws._filas[1])
+    marca = espejo.marca_remota()
+    espejo.registrar_escritura([fila], ws.append_rows([fila]), marca)
+    assert espejo.datos().loc[4, 'Valor'] == '9.999,00'
+    assert len(espejo.datos()) == 301
+
+def test_escritura_propia_no_relee(almacen):
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    ws = almacen.worksheet(TAB_REGISTROS)
+    fila = list(ws._filas[1])
+    marca = espejo.marca_remota()
+    espejo.registrar_escritura([fila], ws.append_rows([fila]), marca)
+    leidas = almacen.red.contadores['filas_leidas']
+    espejo.sincronizar(inmediato=True)
+    assert almacen.red.contadores['filas_leidas'] == leidas and len(espejo.datos()) == 301
+
+def test_escritura_propia_formateada_por_la_hoja(almacen):
+    """El bot anexa 33.34 (RAW) y la hoja lo devuelve como '33,34': no es un cambio."""
+    espejo = EspejoHoja(almacen, TAB_REGISTROS)
+    espejo.datos()
+    generacion = espejo.generacion
+    ws = almacen.worksheet(TAB_REGISTROS)
+    fila = list(ws._filas[1])
+    fila[5] = 33.34
+    marca = espejo.marca_remota()
+    espejo.registrar_escritura([fila], ws.append_rows([fila]), marca)
+    ws._filas[-1][5] = '33,34' # como la muestra una hoja en pt-BR
+    espejo.sincronizar(forzar=True)
+    assert espejo.generacion == generacion and espejo.datos()['Valor'].iloc[-1] == '33,34'
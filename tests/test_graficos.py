@@ -0,0 +1,74 @@
+"""CacheGraficos: LRU por (hogar, mes, versión), file_id reusado, clave nueva cuando
+cambian los datos y trabajador recreado si muere."""
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pytest
+
+from almacen_falso import almacen_sintetico
+from graficos import CacheGraficos
+from nucleo import TAB_REGISTROS, usar_almacen, obtener_espejos, version_datos, indice_de_fecha
+
+MES = indice_de_fecha(datetime.now())
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    almacen = almacen_sintetico(300, semilla=5)
+    usar_almacen(almacen)
+    return almacen
+
+@pytest.fixture(scope="module")
+def trabajador():
+    """Un solo proceso de matplotlib para todos los tests (arrancarlo tarda)."""
+    pool = CacheGraficos()._trabajador()
+    yield pool
+    pool.shutdown()
+
+@pytest.fixture
+def graficos(almacen, trabajador):
+    graficos = CacheGraficos(maximo=2)
+    graficos._pool = trabajador
+    return graficos
+
+def es_png(entrada):
+    return entrada['png'].startswith(b'\x89PNG')
+
+def test_lru_descarta_el_menos_usado(graficos):
+    for mes in (MES, MES - 1): assert es_png(graficos.obtener(mes))
+    graficos.obtener(MES) # el más reciente vuelve a ser MES
+    graficos.obtener(MES - 2)
+    assert [clave[1] for clave in graficos._pngs] == [MES, MES - 2]
+
+def test_file_id_se_reusa_sin_dibujar(graficos):
+    version = version_datos()
+    graficos.obtener(MES, version)
+    graficos.registrar_file_id(MES, version, "file-123")
+    graficos._trabajador = lambda: pytest.fail("no debería dibujar de nuevo")
+    assert graficos.obtener(MES, version)['file_id'] == "file-123"
+
+def test_datos_nuevos_cambian_la_clave(graficos, almacen):
+    anterior = graficos.obtener(MES)
+    ws = almacen.worksheet(TAB_REGISTROS)
+    fila = list(ws._filas[-1])
+    fila[1], fila[5] = f"{MES % 12 + 1:02d}-{MES // 12}", "999,99"
+    ws.append_rows([fila])
+    obtener_espejos()[TAB_REGISTROS].sincronizar(inmediato=True)
+    nuevo = graficos.obtener(MES)
+    assert nuevo is not anterior and nuevo['file_id'] is None
+    assert len({clave[2] for clave in graficos._pngs}) == 2
+
+def test_trabajador_muerto_se_recrea(almacen):
+    graficos = CacheGraficos()
+    try:
+        assert es_png(graficos.obtener(MES))
+        muerto = graficos._pool
+        for proceso in muerto._processes.values(): proceso.kill()
+        try:
+            graficos.obtener(MES - 1)
+        except BrokenProcessPool:
+            pass # el pedido que estaba en el proceso muerto falla; el siguiente usa uno nuevo
+        assert es_png(graficos.obtener(MES - 2))
+        assert graficos._pool is not muerto
+    finally:
+        if graficos._pool is not None: graficos._pool.shutdown()
@@ -0,0 +1,47 @@
+"""abrir_hogar y hogar_de_chat: con varias familias el dashboard solo abre la que da su
+clave y el bot solo atiende los chats listados."""
+import pytest
+
+import nucleo
+from nucleo import abrir_hogar, cargar_hogares, hogar_de_chat
+
+@pytest.fixture
+def hogares(tmp_path, monkeypatch):
+    def usar(texto):
+        ruta = tmp_path / "hogares.toml"
+        ruta.write_text(texto, encoding="utf-8")
+        monkeypatch.setitem(nucleo._instancias, 'hogares', cargar_hogares(str(ruta)))
+    yield usar
+    nucleo._hogar_activo.set(None)
+
+def test_varios_hogares_piden_clave(hogares):
+    hogares('[silva]\nchats = [1]\nclave = "abc"\n[souza]\nchats = [2]\nclave = "xyz"\n[sem_senha]\nchats = [3]\n')
+    assert abrir_hogar("silva", "abc").id == "silva"
+    assert abrir_hogar("silva", "xyz") is None
+    assert abrir_hogar("souza", None) is None
+    assert abrir_hogar("nadie", "abc") is None
+    assert abrir_hogar("sem_senha", "") is None # con varias familias, sin clave no se abre
+
+def test_un_hogar_sin_clave_abre_directo(hogares):
+    hogares('[principal]\n')
+    assert abrir_hogar(None, None).id == "principal"
+
+def test_varios_hogares_solo_atienden_sus_chats(hogares):
+    hogares('[silva]\nchats = [1]\nclave = "abc"\n[sem_chats]\nclave = "xyz"\n')
+    assert hogar_de_chat(1).id == "silva"
+    assert hogar_de_chat(99) is None # sem_chats no acepta cualquiera habiendo otra familia
+
+def test_un_hogar_sin_chats_atiende_a_todos(hogares):
+    hogares('[principal]\n')
+    assert hogar_de_chat(99).id == "principal"
+
+def test_la_cola_se_resume_por_hogar(tmp_path):
+    from cola_escritura import ColaEscrituras
+    cola = ColaEscrituras(str(tmp_path / "cola.sqlite"))
+    cola.encolar("a", "silva", 1, [["x"], ["y"]])
+    cola.encolar("b", "souza", 2, [["z"]])
+    cola.anotar_error(["b"], "Quota exceeded")
+    assert cola.resumen("silva")['gastos'] == 1 and cola.resumen("silva")['filas'] == 2
+    assert cola.resumen("silva")['ultimo_error'] is None # el error de otra familia no se ve
+    assert cola.resumen("souza")['ultimo_error'] == "Quota exceeded"
+    assert cola.resumen()['gastos'] == 2
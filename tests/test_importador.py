@@ -0,0 +1,17 @@
+"""a_registros: Mes_Ref de las parcelas de tarjeta."""
+import pandas as pd
+
+from importador import a_registros
+from nucleo import indice_primer_pago, indices_a_mes_ref
+
+def test_parcela_de_tarjeta_cae_en_su_fatura():
+    bloque = pd.DataFrame({'Fecha': pd.to_datetime(['2026-07-10', '2026-07-10']), 'Monto': [50.0, 80.0],
+                           'Descricao': ['Loja X - Parcela 3/10', 'Padaria']})
+    filas = a_registros(bloque, 'Nubank', 'Carlos', categoria='Casa', tarjeta=True, gastos_positivos=True)
+    primera = indice_primer_pago(pd.Timestamp('2026-07-10'), 'Nubank')
+    assert list(filas['Parc_Atual']) == [3, 1]
+    assert list(filas['Mes_Ref']) == list(indices_a_mes_ref([primera + 2, primera]))
+
+def test_cuenta_usa_el_mes_del_movimiento():
+    bloque = pd.DataFrame({'Fecha': pd.to_datetime(['2026-07-10']), 'Monto': [-50.0], 'Descricao': ['Parcela 3/10']})
+    assert list(a_registros(bloque, 'Inter', 'Carlos', categoria='Casa')['Mes_Ref']) == ['07-2026']
@@ -0,0 +1,51 @@
+"""LibroRegistros tipa solo las filas nuevas y da el mismo libro que tipar todo; el cubo
+del dashboard suma esas filas sin recalcular."""
+import pandas as pd
+import pytest
+
+from almacen_falso import almacen_sintetico
+from metricas import METRICAS
+from nucleo import (
+    TAB_REGISTROS, CuboGastos, usar_almacen, obtener_espejos, obtener_libro_registros,
+    limpiar_registros,
+)
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    almacen = almacen_sintetico(500, semilla=4)
+    usar_almacen(almacen)
+    return almacen
+
+def anexar(almacen):
+    """Filas con categoría, persona, descripción y mes que el libro todavía no tiene."""
+    ws = almacen.worksheet(TAB_REGISTROS)
+    fila = list(ws._filas[1])
+    fila[1], fila[2], fila[5], fila[8], fila[9] = '01-1999', 'Zoe', '1.234,56', 'Aaa Nova', 'Coisa nova'
+    ws.append_rows([fila, list(ws._filas[2])])
+    obtener_espejos()[TAB_REGISTROS].sincronizar(inmediato=True)
+
+def test_anexar_da_el_mismo_libro_que_tipar_todo(almacen):
+    libro = obtener_libro_registros()
+    antes = libro.obtener()
+    anexadas = METRICAS.resumen()['contadores'].get('libro.filas_anexadas', 0)
+    anexar(almacen)
+    despues = libro.obtener()
+    assert METRICAS.resumen()['contadores']['libro.filas_anexadas'] - anexadas == 2
+    assert len(antes) == 500 and despues.attrs['generacion'] == antes.attrs['generacion']
+    completo = limpiar_registros(obtener_espejos()[TAB_REGISTROS].datos().copy())
+    pd.testing.assert_frame_equal(despues, completo)
+    assert libro.obtener() is despues
+
+def test_cubo_suma_solo_las_nuevas(almacen):
+    libro = obtener_libro_registros()
+    cubo = CuboGastos()
+    v1 = libro.obtener()
+    cubo.actualizar(v1, v1.attrs['generacion'])
+    anexar(almacen)
+    v2 = libro.obtener()
+    cubo.actualizar(v2, v2.attrs['generacion'])
+    nuevo = CuboGastos()
+    nuevo.actualizar(v2, v2.attrs['generacion'])
+    for mes in v2['Mes_Idx'].unique():
+        assert cubo.total(mes) == pytest.approx(nuevo.total(mes))
@@ -0,0 +1,15 @@
+"""parsear_montos con las columnas que devuelve get_all_records: texto BRL, números
+nativos sin ningún texto y nulos."""
+import pandas as pd
+
+from nucleo import parsear_montos
+
+def test_columna_object_sin_texto():
+    valores, invalidos = parsear_montos(pd.Series([12, 12.5], dtype=object))
+    assert valores.tolist() == [12.0, 12.5] and invalidos == 0
+
+def test_texto_numeros_y_nulos():
+    serie = pd.Series(['R$ 1.234,56', 7, None, pd.NA, '', 'abc', '50,00', 7], dtype=object)
+    valores, invalidos = parsear_montos(serie)
+    assert valores.tolist() == [1234.56, 7.0, 0.0, 0.0, 0.0, 0.0, 50.0, 7.0]
+    assert invalidos == 1
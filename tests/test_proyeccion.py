@@ -0,0 +1,83 @@
+"""Proyección de cuotas: las que faltan de una compra importada a medias se estiman
+desde la última vista, dos compras iguales el mismo día cuentan dos veces y las compras
+del bot (todas sus cuotas ya escritas) no se extrapolan. /projecao dice lo mismo."""
+from datetime import datetime
+
+import pytest
+
+from almacen_falso import AlmacenMemoria
+from nucleo import (
+    TAB_REGISTROS, TAB_ORCAMENTO, COLUMNAS_REGISTROS, usar_almacen, hogar_actual, cargar_tablas,
+    indice_de_fecha, indice_a_mes,
+)
+from proyeccion import cuotas_faltantes, proyectar
+
+MES = indice_de_fecha(datetime.now())
+
+def cuota(mes, actual, parc, descripcion, valor="100,00", data="05/01/2026", banco="Nubank"):
+    return [data, indice_a_mes(mes), "Carlos", "Credito", banco, valor, str(parc), str(actual), "Casa", descripcion]
+
+@pytest.fixture
+def registros(tmp_path, monkeypatch):
+    """usar(filas) -> (registros, orcamento) tipados como los ve el dashboard."""
+    monkeypatch.chdir(tmp_path)
+    def usar(filas):
+        almacen = AlmacenMemoria()
+        almacen.crear_hoja(hogar_actual().hoja, {TAB_REGISTROS: [COLUMNAS_REGISTROS] + filas,
+                                                 TAB_ORCAMENTO: [['Categoria', 'Limite'], ['Casa', '250,00']]})
+        usar_almacen(almacen)
+        return cargar_tablas()
+    return usar
+
+def importada_a_medias():
+    # El extrato trajo solo las cuotas 3 y 4 de 10 (la 4 es la de este mes)
+    return [cuota(MES - 1, 3, 10, "Loja X 03/10"), cuota(MES, 4, 10, "Loja X 04/10")]
+
+def escrita_por_el_bot():
+    return [cuota(MES + k, k + 1, 12, f"Tv ({k + 1}/12)", valor="50,00", banco="Inter") for k in range(12)]
+
+def test_compra_importada_a_medias(registros):
+    df_r, df_p = registros(importada_a_medias())
+    faltantes = cuotas_faltantes(df_r)
+    assert faltantes['Mes_Idx'].tolist() == list(range(MES + 1, MES + 7)) # cuotas 5 a 10
+    assert faltantes['Valor'].tolist() == [100.0] * 6
+
+    resumen = proyectar(df_r, df_p, MES)['resumen']
+    assert resumen.loc[MES, 'Comprometido'] == 100.0 and resumen.loc[MES, 'Estimado'] == 0.0
+    assert resumen.loc[MES + 1:MES + 6, 'Estimado'].tolist() == [100.0] * 6
+    assert resumen.loc[MES + 7:, 'Comprometido'].sum() == 0.0
+
+def test_dos_compras_iguales_el_mismo_dia(registros):
+    df_r, df_p = registros([cuota(MES, 1, 3, "Farmacia 01/03", valor="200,00")] * 2)
+    assert len(cuotas_faltantes(df_r)) == 4
+    proyeccion = proyectar(df_r, df_p, MES)
+    resumen = proyeccion['resumen']
+    assert resumen.loc[MES:MES + 2, 'Comprometido'].tolist() == [400.0] * 3
+    assert proyeccion['estouradas'].loc[MES + 1, 'Casa'] # 400 > 250 de orçamento
+
+def test_compra_del_bot_no_se_extrapola(registros):
+    df_r, df_p = registros(escrita_por_el_bot())
+    assert cuotas_faltantes(df_r).empty
+    resumen = proyectar(df_r, df_p, MES)['resumen']
+    assert resumen['Estimado'].sum() == 0.0
+    assert resumen.loc[MES:MES + 11, 'Comprometido'].tolist() == [50.0] * 12
+    assert resumen.loc[MES + 12:, 'Comprometido'].sum() == 0.0
+
+class BotFalso:
+    def __init__(self): self.mensajes = []
+    def send_message(self, chat_id, texto, **kwargs): self.mensajes.append(texto)
+
+@pytest.mark.parametrize("filas, total, estimado", [
+    (escrita_por_el_bot, "600.00", None),
+    (importada_a_medias, "700.00", "600.00"),
+])
+def test_projecao_del_bot(registros, monkeypatch, filas, total, estimado):
+    import bot_telegram
+    registros(filas())
+    bot = BotFalso()
+    monkeypatch.setattr(bot_telegram, "bot", bot)
+    bot_telegram.generar_projecao_bot(1)
+    mensaje, = bot.mensajes
+    assert f"TOTAL COMPROMETIDO:* R$ {total}" in mensaje
+    assert ("fora da planilha" in mensaje) == (estimado is not None)
+    if estimado: assert f"R$ {estimado} de parcelas" in mensaje